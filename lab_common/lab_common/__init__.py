@@ -0,0 +1,9 @@
+"""
+Helpers shared by openai-hw-labs and openai-practice-lab.
+
+Install once per lab with `pip install -r requirements.txt` (which pulls this
+package in editable mode), then import the modules directly:
+
+    from lab_common.state_store import get_store
+    from lab_common.run_scheduler import SCHEDULER
+"""
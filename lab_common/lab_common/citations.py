@@ -0,0 +1,122 @@
+"""
+Citation resolution from file ids to filenames.
+
+File metadata never changes for a given file id, so it is cached in a
+bounded in-process LRU in front of a shelve database in the project's .cache/
+directory. The database is opened under a file lock, so several processes
+(the Q&A service, notes generation) can share it. Unknown ids are fetched in
+one parallel batch, and a warm cache renders citations without any API call.
+"""
+
+import shelve
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .state_store import file_lock, project_dir
+
+
+def cited_file_id(annotation):
+    """File id of a citation annotation from either the Assistants or the Responses API."""
+    file_citation = getattr(annotation, "file_citation", None)
+    if file_citation is not None:
+        return file_citation.file_id
+    if getattr(annotation, "type", None) == "file_citation":
+        return annotation.file_id
+    return None
+
+
+class CitationResolver:
+    def __init__(self, client, cache_path=None, max_entries=1024, max_workers=8):
+        self.client = client
+        self.cache_path = Path(cache_path or project_dir() / ".cache" / "file_metadata")
+        self.lock_path = self.cache_path.with_name(self.cache_path.name + ".lock")
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _remember(self, file_id, metadata):
+        self._lru[file_id] = metadata
+        self._lru.move_to_end(file_id)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, file_id):
+        """LRU hit or None; a hit becomes the most recently used entry."""
+        with self._lock:
+            metadata = self._lru.get(file_id)
+            if metadata is not None:
+                self._lru.move_to_end(file_id)
+            return metadata
+
+    def _load_cached(self, file_ids):
+        """Warm the LRU from disk and return the ids found in neither cache."""
+        with self._lock:
+            missing = []
+            for file_id in file_ids:
+                if file_id in self._lru:
+                    self._lru.move_to_end(file_id)
+                else:
+                    missing.append(file_id)
+            if not missing:
+                return []
+            unknown = []
+            with file_lock(self.lock_path), shelve.open(str(self.cache_path)) as disk:
+                for file_id in missing:
+                    metadata = disk.get(file_id)
+                    if metadata is None:
+                        unknown.append(file_id)
+                    else:
+                        self._remember(file_id, metadata)
+            return unknown
+
+    def _fetch(self, file_id):
+        try:
+            file = self.client.files.retrieve(file_id)
+        except Exception as e:
+            print(f"⚠️  Could not resolve file {file_id}: {e}")
+            return file_id, None
+        return file_id, {"filename": file.filename, "bytes": file.bytes}
+
+    def prefetch(self, file_ids):
+        """Fetch metadata for every unknown file id in one parallel batch."""
+        unknown = self._load_cached(sorted({fid for fid in file_ids if fid}))
+        if not unknown:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unknown))) as executor:
+            fetched = list(executor.map(self._fetch, unknown))
+
+        with self._lock, file_lock(self.lock_path), shelve.open(str(self.cache_path)) as disk:
+            for file_id, metadata in fetched:
+                # Failed lookups are not cached so a transient error is retried next time
+                if metadata is not None:
+                    disk[file_id] = metadata
+                    self._remember(file_id, metadata)
+
+    def filename(self, file_id):
+        """Return the filename for a file id, falling back to the id itself."""
+        self.prefetch([file_id])
+        metadata = self._lookup(file_id)
+        return metadata["filename"] if metadata else file_id
+
+    def render(self, annotations, page_locator=None):
+        """Render file citations as 'filename, p. N' lines.
+
+        page_locator, when given, is called with (filename, annotation) and
+        returns a page number or None.
+        """
+        citations = [(a, cited_file_id(a)) for a in annotations]
+        citations = [(a, file_id) for a, file_id in citations if file_id]
+        self.prefetch([file_id for _, file_id in citations])
+
+        lines = []
+        for i, (annotation, file_id) in enumerate(citations, 1):
+            metadata = self._lookup(file_id)
+            name = metadata["filename"] if metadata else file_id
+            page = page_locator(name, annotation) if page_locator else None
+            lines.append(f"[{i}] {name}" + (f", p. {page}" if page else ""))
+        return lines
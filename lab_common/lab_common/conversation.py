@@ -0,0 +1,155 @@
+"""
+Context budget for multi-turn conversations.
+
+A session asks every question through a Q&A backend (see qna_backends in
+the hw labs), so turns take a run scheduler slot and are recorded in the run
+metrics like any other question. The session keeps the last_messages most
+recent messages itself; each turn is capped to that window, so the prompt
+stops growing once the window is full. On the Assistants backend the turns
+share one thread and runs carry max_prompt_tokens and a last_messages
+truncation_strategy; on the Responses backend the window is sent as the
+input. Messages that slide out of the window are folded into a rolling
+summary (one small chat completion, scheduled and metered as well) that is
+passed back as extra instructions, so early turns are remembered without
+being re-sent verbatim.
+
+Backends implement
+
+    ask_turn(question, conversation_id=None, history=(), summary=None, budget=None) -> Answer
+
+where conversation_id is the Answer.id of the previous turn and history the
+window of {"role", "content"} messages before this question.
+
+Sessions are persisted in the state store under "session:<name>", so a
+study session can be resumed across invocations, and on either backend.
+"""
+
+import time
+
+from .state_store import get_store
+from .prompt_layout import prompt_tokens
+from .run_metrics import METRICS
+from .run_scheduler import SCHEDULER
+
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a tutoring conversation about a document. "
+    "Merge the existing summary with the new messages into at most {words} words. "
+    "Keep the questions asked, key facts given and anything the student is confused about."
+)
+
+
+class ContextBudget:
+    """Per-run token budget and the prompt-token trend it produces."""
+
+    def __init__(self, max_prompt_tokens=6000, last_messages=8):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.last_messages = last_messages
+        self.prompt_tokens = []
+
+    def run_kwargs(self):
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "truncation_strategy": {"type": "last_messages", "last_messages": self.last_messages}
+        }
+
+    def record(self, run):
+        """Record a finished run's (or answer's) prompt tokens; returns them (None without usage)."""
+        tokens = prompt_tokens(run.usage)
+        if tokens is not None:
+            self.prompt_tokens.append(tokens)
+        return tokens
+
+    def trend(self):
+        """Average per-turn change in prompt tokens over the recorded turns."""
+        if len(self.prompt_tokens) < 2:
+            return 0.0
+        return (self.prompt_tokens[-1] - self.prompt_tokens[0]) / (len(self.prompt_tokens) - 1)
+
+    def describe(self):
+        if not self.prompt_tokens:
+            return "no turns yet"
+        last = self.prompt_tokens[-1]
+        return (f"prompt {last} tokens ({last / self.max_prompt_tokens:.0%} of budget), "
+                f"trend {self.trend():+.0f}/turn")
+
+
+def summary_instructions(summary):
+    """Instructions carrying the rolling summary; they change every few turns, so they go last."""
+    return f"Summary of the earlier conversation:\n{summary}" if summary else None
+
+
+class ConversationSession:
+    def __init__(self, backend, name="default", budget=None, store=None, summary_words=200,
+                 summary_model=SUMMARY_MODEL):
+        self.backend = backend
+        self.client = backend.client
+        self.budget = budget or ContextBudget()
+        self.summary_words = summary_words
+        self.summary_model = summary_model
+        self._store = store or get_store()
+        self._key = f"session:{name}"
+
+        state = self._store.get(self._key) or {}
+        # A conversation id only means something to the backend that issued it;
+        # sessions saved before backends were pluggable hold an Assistants thread_id
+        same_backend = state.get("backend", "assistants") == backend.name
+        self.conversation_id = (state.get("conversation_id") or state.get("thread_id")) if same_backend else None
+        self.summary = state.get("summary", "")
+        # Messages not yet folded into the summary, oldest first
+        self.messages = list(state.get("messages", []))
+        self.budget.prompt_tokens = list(state.get("prompt_tokens", []))
+
+    def _save(self):
+        self._store.set(self._key, {
+            "backend": self.backend.name,
+            "conversation_id": self.conversation_id,
+            "summary": self.summary,
+            "messages": self.messages,
+            "prompt_tokens": self.budget.prompt_tokens
+        })
+
+    def ask(self, question, model=None):
+        """Ask within the session; returns the backend's Answer."""
+        # Folding keeps self.messages within the window
+        answer = self.backend.ask_turn(question, conversation_id=self.conversation_id, history=list(self.messages),
+                                       summary=self.summary or None, budget=self.budget, model=model)
+        self.budget.record(answer)
+        self.conversation_id = answer.id
+        self.messages.append({"role": "user", "content": question})
+        if answer.completed:
+            self.messages.append({"role": "assistant", "content": answer.text})
+        try:
+            self.fold_old_messages()
+        finally:
+            self._save()
+        return answer
+
+    def fold_old_messages(self):
+        """Summarize messages that have slid out of the window."""
+        new = self.messages[:max(len(self.messages) - self.budget.last_messages, 0)]
+        if not new:
+            return False
+
+        transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in new)
+        with SCHEDULER.slot(self.backend.priority):
+            start = time.perf_counter()
+            try:
+                completion = self.client.chat.completions.create(
+                    model=self.summary_model,
+                    messages=[
+                        {"role": "system", "content": SUMMARY_PROMPT.format(words=self.summary_words)},
+                        {"role": "user", "content": f"Existing summary:\n{self.summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                    ]
+                )
+            except Exception as e:
+                METRICS.observe_exception("conversation_summary", e, self.summary_model)
+                raise
+            METRICS.observe_request("conversation_summary", self.summary_model, "completed",
+                                    time.perf_counter() - start, completion.usage)
+        self.summary = completion.choices[0].message.content.strip()
+        del self.messages[:len(new)]
+        return True
+
+    def reset(self):
+        self._store.delete(self._key)
@@ -0,0 +1,135 @@
+"""
+Resumable multipart uploads via the Uploads API.
+
+Large documents are split into parts that are read from a memory-mapped file
+and sent in parallel. Completed part ids are checkpointed next to the upload
+so an interrupted run picks up where it stopped instead of starting over.
+Checkpoints live in .uploads/ next to the state file, so a resumed upload
+finds them whichever directory the script is started from.
+
+Docs: https://platform.openai.com/docs/api-reference/uploads
+"""
+
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .state_store import get_store
+
+# Files below this size go through a single files.create request
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+# Uploads API accepts parts of up to 64 MB
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_WORKERS = 4
+CHECKPOINT_DIR_NAME = ".uploads"
+
+
+def default_checkpoint_dir():
+    return get_store().path.parent / CHECKPOINT_DIR_NAME
+
+
+def should_use_multipart(file_path, threshold=MULTIPART_THRESHOLD):
+    """Return True when a local file is large enough for a multipart upload."""
+    return os.path.getsize(file_path) >= threshold
+
+
+def _checkpoint_path(file_path, checkpoint_dir):
+    """Checkpoint file keyed by the file's absolute path, size and mtime."""
+    stat = os.stat(file_path)
+    key = f"{Path(file_path).resolve()}:{stat.st_size}:{int(stat.st_mtime)}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return Path(checkpoint_dir) / f"{digest}.json"
+
+
+def _load_checkpoint(path):
+    if not path.exists():
+        return None
+    try:
+        checkpoint = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    # Uploads expire an hour after creation; a stale id cannot be resumed
+    if checkpoint.get("expires_at") and checkpoint["expires_at"] <= time.time() + 60:
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+def upload_file_multipart(client, file_path, purpose="assistants",
+                          part_size=DEFAULT_PART_SIZE, max_workers=DEFAULT_WORKERS,
+                          checkpoint_dir=None):
+    """Upload a local file in parallel parts and return the resulting File object."""
+    file_path = Path(file_path)
+    checkpoint_dir = checkpoint_dir or default_checkpoint_dir()
+    size = file_path.stat().st_size
+    if size == 0:
+        raise ValueError(f"Cannot upload empty file: {file_path}")
+
+    checkpoint_file = _checkpoint_path(file_path, checkpoint_dir)
+    checkpoint = _load_checkpoint(checkpoint_file)
+
+    if checkpoint and checkpoint.get("part_size") == part_size:
+        print(f"♻️  Resuming upload {checkpoint['upload_id']} "
+              f"({len(checkpoint['parts'])} parts already sent)")
+    else:
+        mime_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+        upload = client.uploads.create(
+            bytes=size,
+            filename=file_path.name,
+            mime_type=mime_type,
+            purpose=purpose
+        )
+        checkpoint = {
+            "upload_id": upload.id,
+            "part_size": part_size,
+            "expires_at": upload.expires_at,
+            "parts": {}
+        }
+        _save_checkpoint(checkpoint_file, checkpoint)
+        print(f"📦 Started multipart upload: {upload.id}")
+
+    upload_id = checkpoint["upload_id"]
+    part_count = (size + part_size - 1) // part_size
+    pending = [i for i in range(part_count) if str(i) not in checkpoint["parts"]]
+    lock = threading.Lock()
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        def send_part(index):
+            start = index * part_size
+            # Only one part per worker is materialised at a time
+            part = client.uploads.parts.create(
+                upload_id=upload_id,
+                data=mm[start:start + part_size]
+            )
+            with lock:
+                checkpoint["parts"][str(index)] = part.id
+                _save_checkpoint(checkpoint_file, checkpoint)
+            return index
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(send_part, i) for i in pending]
+            for future in as_completed(futures):
+                index = future.result()
+                print(f"  ⬆️  Part {index + 1}/{part_count} uploaded")
+
+        md5 = hashlib.md5(mm).hexdigest()
+
+    part_ids = [checkpoint["parts"][str(i)] for i in range(part_count)]
+    upload = client.uploads.complete(upload_id=upload_id, part_ids=part_ids, md5=md5)
+    checkpoint_file.unlink(missing_ok=True)
+
+    print(f"✅ Multipart upload complete: {upload.file.id}")
+    return upload.file
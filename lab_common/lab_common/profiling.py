@@ -0,0 +1,249 @@
+"""
+CPU and allocation profiling for the lab entry points.
+
+Every script's main runs under run_profiled(). Code marks its main phases
+with `with phase("parse"):` blocks, which cost nothing unless profiling is on.
+
+    --profile                  full mode: a stack sampler, cProfile and
+                               tracemalloc around every phase
+    LAB_PROFILER_SAMPLE=0.05   sample mode for production: ~5% of invocations
+                               run only the stack sampler (a background thread
+                               that reads sys._current_frames() every 10 ms)
+
+Results go to .profiles/<script>-<timestamp>.*:
+    .speedscope.json   sampled stacks per phase, open at https://www.speedscope.app
+    .<phase>.pstats    cProfile stats per phase (full mode), for pstats/snakeviz
+and a per-phase summary (wall, CPU, samples, allocation peak, top functions)
+is printed when the script exits. A nested phase's time is excluded from its
+parent's cProfile stats but shown in the summary of both.
+
+Each thread has its own phase stack, so phases entered from worker threads
+(the Q&A service's pool, the load test's executor) are named from that
+thread's phases alone, and their CPU time is the thread's own. cProfile and
+tracemalloc cover the thread that started the profiler; worker-thread phases
+get wall and CPU time and their sampled stacks. Samples are kept as counts
+per distinct stack, so a long-running sampled process doesn't grow with
+uptime.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+PROFILE_DIR = Path(".profiles")
+SAMPLE_INTERVAL = 0.01
+
+_active = None
+
+
+class StackSampler(threading.Thread):
+    """Samples every other thread's stack at a fixed interval, tagged with the current phase."""
+
+    def __init__(self, profiler, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+        self.frames = {}
+        # (phase, (frame index, ... root first)) -> times seen
+        self.samples = {}
+        self._stop_event = threading.Event()
+
+    def _frame_index(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                key = (self.profiler.phase_of(thread_id), tuple(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name):
+        frames = [None] * len(self.frames)
+        for (function, filename, line), index in self.frames.items():
+            frames[index] = {"name": function, "file": filename, "line": line}
+        by_phase = {}
+        for (phase_name, stack), count in list(self.samples.items()):
+            by_phase.setdefault(phase_name, []).append((list(stack), count * self.interval))
+        profiles = [{
+            "type": "sampled",
+            "name": phase_name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weight for _, weight in stacks),
+            "samples": [stack for stack, _ in stacks],
+            "weights": [weight for _, weight in stacks]
+        } for phase_name, stacks in by_phase.items()]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "profiling.py",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+
+class Profiler:
+    def __init__(self, name, mode="full", output_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL):
+        self.name = name
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.phases = {}
+        # Phase names per thread id, outermost first
+        self._stacks = {}
+        self._owner = None
+        self._lock = threading.Lock()
+        self.sampler = StackSampler(self, interval)
+
+    def phase_of(self, thread_id):
+        return "/".join(self._stacks.get(thread_id, ())) or "(unphased)"
+
+    @property
+    def current_phase(self):
+        return self.phase_of(threading.get_ident())
+
+    def start(self):
+        self._owner = threading.get_ident()
+        if self.mode == "full":
+            tracemalloc.start()
+        self.sampler.start()
+
+    def _stats(self, path):
+        with self._lock:
+            return self.phases.setdefault(path, {"calls": 0, "wall": 0.0, "cpu": 0.0, "alloc_peak": 0,
+                                                 "profile": None})
+
+    @contextmanager
+    def phase(self, name):
+        thread_id = threading.get_ident()
+        stack = self._stacks.setdefault(thread_id, [])
+        parent = self.current_phase if stack else None
+        stack.append(name)
+        path = self.current_phase
+        stats = self._stats(path)
+
+        profile = None
+        # cProfile and tracemalloc's peak are per process; only the starting thread drives them
+        if self.mode == "full" and thread_id == self._owner:
+            # Only one cProfile can be active, so the parent pauses while a child runs
+            if parent is not None and self.phases[parent]["profile"] is not None:
+                self.phases[parent]["profile"].disable()
+            profile = stats["profile"] = stats["profile"] or cProfile.Profile()
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+            alloc_start = tracemalloc.get_traced_memory()[0]
+            profile.enable()
+
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            with self._lock:
+                stats["wall"] += wall
+                stats["cpu"] += cpu
+                stats["calls"] += 1
+            if profile is not None:
+                profile.disable()
+                peak = tracemalloc.get_traced_memory()[1] - alloc_start
+                stats["alloc_peak"] = max(stats["alloc_peak"], peak)
+            stack.pop()
+            if not stack:
+                self._stacks.pop(thread_id, None)
+            if profile is not None and parent is not None and self.phases[parent]["profile"] is not None:
+                self.phases[parent]["profile"].enable()
+
+    def finish(self):
+        self.sampler.stop()
+        if self.mode == "full":
+            tracemalloc.stop()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / f"{self.name}-{self.stamp}"
+
+        speedscope_path = base.with_name(base.name + ".speedscope.json")
+        speedscope_path.write_text(json.dumps(self.sampler.speedscope(self.name)))
+
+        samples_per_phase = {}
+        for (phase_name, _), count in self.sampler.samples.items():
+            samples_per_phase[phase_name] = samples_per_phase.get(phase_name, 0) + count
+
+        print(f"\n🔬 Profile ({self.mode}) → {speedscope_path}")
+        print(f"{'phase':<32} {'calls':>5} {'wall':>8} {'cpu':>8} {'samples':>8} {'alloc peak':>11}")
+        for path, stats in list(self.phases.items()):
+            alloc = f"{stats['alloc_peak'] / 1024:.0f} KiB" if self.mode == "full" else "-"
+            print(f"{path:<32} {stats['calls']:>5} {stats['wall']:>7.3f}s {stats['cpu']:>7.3f}s "
+                  f"{samples_per_phase.get(path, 0):>8} {alloc:>11}")
+            if stats["profile"] is not None:
+                stats_path = base.with_name(f"{base.name}.{path.replace('/', '.')}.pstats")
+                stats["profile"].dump_stats(stats_path)
+                self._print_top(stats["profile"])
+
+    @staticmethod
+    def _print_top(profile, limit=3):
+        stats = pstats.Stats(profile)
+        # Skip the phase bookkeeping itself
+        rows = [row for row in stats.stats.items()
+                if Path(row[0][0]).name not in ("profiling.py", "contextlib.py") and row[0][2] != "<built-in method builtins.next>"]
+        rows.sort(key=lambda item: item[1][3], reverse=True)
+        for (filename, line, function), (_, _, _, cumulative, _) in rows[:limit]:
+            print(f"{'':<4}{cumulative:>7.3f}s  {function} ({Path(filename).name}:{line})")
+
+
+def phase(name):
+    """Context manager marking a phase of the current script; free when profiling is off."""
+    return _active.phase(name) if _active is not None else nullcontext()
+
+
+def profiler_mode(argv=None):
+    argv = sys.argv if argv is None else argv
+    if "--profile" in argv:
+        return "full"
+    try:
+        rate = float(os.getenv("LAB_PROFILER_SAMPLE", "0"))
+    except ValueError:
+        rate = 0.0
+    return "sample" if rate > 0 and random.random() < rate else None
+
+
+def run_profiled(name, main, argv=None):
+    """Run an entry point's main, profiled when --profile or LAB_PROFILER_SAMPLE selects it."""
+    global _active
+    mode = profiler_mode(argv)
+    if argv is None and "--profile" in sys.argv:
+        # Keep the flag away from the scripts' own positional argument handling
+        sys.argv.remove("--profile")
+    if mode is None:
+        return main()
+
+    _active = Profiler(name, mode)
+    _active.start()
+    try:
+        with _active.phase("main"):
+            return main()
+    finally:
+        profiler, _active = _active, None
+        profiler.finish()
@@ -0,0 +1,100 @@
+"""
+Prompt layout for OpenAI's automatic prompt caching.
+
+The cache matches the longest prefix of a prompt seen recently (in 128-token
+steps once the prompt is over 1024 tokens), so anything that changes between
+requests has to come after everything that doesn't. For an assistant run the
+prompt starts with the assistant's instructions; passing `instructions` on
+a run replaces them and breaks the shared prefix for every run that differs.
+
+Runs therefore keep the assistant's instructions as the stable prefix and
+append their own guidance with `additional_instructions`, and anything
+specific to one question belongs in the user message at the very end.
+"""
+
+
+def run_instructions(*variations):
+    """Run kwargs that append per-run guidance after the assistant's instructions."""
+    text = "\n\n".join(v for v in variations if v)
+    return {"additional_instructions": text} if text else {}
+
+
+def _detail(usage, *names):
+    for name in names:
+        details = getattr(usage, name, None)
+        if details is None:
+            details = (getattr(usage, "model_extra", None) or {}).get(name)
+        if details is not None:
+            return details
+    return None
+
+
+def cached_tokens(usage):
+    """Cached prompt tokens from a usage object, or None when the API didn't report them.
+
+    Chat Completions report prompt_tokens_details, the Responses API
+    input_tokens_details; run usage may carry either as an extra field.
+    """
+    if usage is None:
+        return None
+    details = _detail(usage, "prompt_tokens_details", "prompt_token_details", "input_tokens_details")
+    if details is None:
+        return None
+    if isinstance(details, dict):
+        return details.get("cached_tokens")
+    return getattr(details, "cached_tokens", None)
+
+
+def prompt_tokens(usage):
+    if usage is None:
+        return None
+    value = getattr(usage, "prompt_tokens", None)
+    return value if value is not None else getattr(usage, "input_tokens", None)
+
+
+def completion_tokens(usage):
+    if usage is None:
+        return None
+    value = getattr(usage, "completion_tokens", None)
+    return value if value is not None else getattr(usage, "output_tokens", None)
+
+
+def describe_cache(usage):
+    """One-line cache report for a run's usage."""
+    prompt, cached = prompt_tokens(usage), cached_tokens(usage)
+    if prompt is None:
+        return "no usage reported"
+    if cached is None:
+        return f"{prompt} prompt tokens (cache not reported)"
+    return f"{cached}/{prompt} prompt tokens cached ({cached / prompt:.0%})" if prompt else "0 prompt tokens"
+
+
+class CacheTally:
+    """Cached vs. total prompt tokens across a batch of runs."""
+
+    def __init__(self):
+        self.prompt = 0
+        self.cached = 0
+        self.runs = 0
+        self.unreported = 0
+
+    def record(self, usage):
+        self.add(prompt_tokens(usage), cached_tokens(usage))
+
+    def add(self, prompt, cached):
+        """Count one run's token numbers (None where they weren't reported)."""
+        if prompt is None:
+            return
+        self.runs += 1
+        self.prompt += prompt
+        if cached is None:
+            self.unreported += 1
+        else:
+            self.cached += cached
+
+    def describe(self):
+        if not self.runs:
+            return "no runs"
+        rate = self.cached / self.prompt if self.prompt else 0.0
+        note = f", {self.unreported} run(s) without cache details" if self.unreported else ""
+        return f"{self.cached}/{self.prompt} prompt tokens cached ({rate:.0%}) over {self.runs} run(s){note}"
@@ -0,0 +1,269 @@
+"""
+Declarative plan/apply provisioning for the assistant, its files and vector store.
+
+The desired configuration is hashed and diffed against the remote objects
+(one parallel read for the assistant and one for the vector store). Only the
+operations that actually changed end up in the plan, and steps without
+dependencies on each other are applied in parallel. When changed files mean a
+new vector store, the store and uploads it replaces are deleted once the
+assistant points at the new one.
+
+Desired state:
+    {
+        "assistant": {...assistants.create kwargs...},
+        "files": ["../data/doc.pdf", ...],             # optional
+        "vector_store": {"name": "knowledge_base"},    # optional
+    }
+
+Recorded state (kept by the caller between runs):
+    {"assistant_id": ..., "vector_store_id": ..., "vector_store_hash": ...,
+     "files": {path: {"digest": ..., "file_id": ...}}}
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import NotFoundError
+
+from .multipart_upload import should_use_multipart, upload_file_multipart
+
+
+def config_hash(value):
+    """Stable sha256 of a JSON-serialisable value."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """sha256 of a local file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def upload_local_file(client, path):
+    """Default uploader: multipart for large files, a single request otherwise."""
+    if should_use_multipart(path):
+        return upload_file_multipart(client, path, purpose="assistants").id
+    with open(path, "rb") as f:
+        return client.files.create(file=f, purpose="assistants").id
+
+
+def _normalize_tools(tools):
+    """Compare tools by type and function name; the API fills in server-side defaults."""
+    normalized = []
+    for tool in tools or []:
+        tool = tool if isinstance(tool, dict) else tool.model_dump(exclude_none=True)
+        function = tool.get("function") or {}
+        normalized.append([tool["type"], function.get("name")])
+    return sorted(normalized)
+
+
+def _assistant_view(config, keys):
+    """Project an assistant config (dict or remote object) onto the compared fields."""
+    get = config.get if isinstance(config, dict) else lambda key: getattr(config, key, None)
+    view = {}
+    for key in keys:
+        value = get(key)
+        if key == "tools":
+            value = _normalize_tools(value)
+        elif key == "tool_resources":
+            if value is not None and not isinstance(value, dict):
+                value = value.model_dump(exclude_none=True)
+            file_search = (value or {}).get("file_search") or {}
+            value = sorted(file_search.get("vector_store_ids") or [])
+        view[key] = value
+    return view
+
+
+class Step:
+    def __init__(self, name, action, depends_on=()):
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+
+    def __repr__(self):
+        return f"Step({self.name!r}, depends_on={list(self.depends_on)})"
+
+
+class ProvisioningPlan:
+    def __init__(self, client, desired, state, max_workers=4, uploader=upload_local_file):
+        self.client = client
+        self.uploader = uploader
+        self.desired = desired
+        self.state = state
+        self.max_workers = max_workers
+        self.remote = {}
+        self.results = {}
+        self.steps = []
+        self._build()
+
+    def _read_remote(self):
+        """Fetch the recorded assistant and vector store in parallel."""
+        def retrieve(kind):
+            object_id = self.state.get(f"{kind}_id")
+            if not object_id:
+                return kind, None
+            try:
+                if kind == "assistant":
+                    return kind, self.client.beta.assistants.retrieve(object_id)
+                return kind, self.client.vector_stores.retrieve(object_id)
+            except NotFoundError:
+                return kind, None
+
+        kinds = ["assistant"] + (["vector_store"] if "vector_store" in self.desired else [])
+        with ThreadPoolExecutor(max_workers=len(kinds)) as executor:
+            self.remote.update(executor.map(retrieve, kinds))
+
+    def _build(self):
+        self._read_remote()
+        self.state.setdefault("files", {})
+
+        vector_store_step = None
+        if "vector_store" in self.desired:
+            vector_store_step = self._plan_vector_store()
+        self._plan_assistant(vector_store_step)
+        if vector_store_step:
+            self._plan_cleanup(self.remote.get("vector_store"), self.file_digests)
+
+    def _plan_vector_store(self):
+        digests = self.file_digests = {path: file_digest(path) for path in self.desired.get("files", [])}
+        desired_hash = config_hash({"store": self.desired["vector_store"],
+                                    "files": sorted(digests.values())})
+        remote_store = self.remote.get("vector_store")
+        if remote_store is not None and remote_store.status != "expired" \
+                and self.state.get("vector_store_hash") == desired_hash:
+            return None
+
+        upload_steps = []
+        reusable = self._existing_files(digests)
+        for path, digest in digests.items():
+            if path not in reusable:
+                upload_steps.append(self._add_upload_step(path, digest))
+
+        def create_vector_store(results):
+            file_ids = [self.state["files"][path]["file_id"] for path in digests]
+            vector_store = self.client.vector_stores.create(
+                file_ids=file_ids,
+                **self.desired["vector_store"]
+            )
+            self.state["vector_store_id"] = vector_store.id
+            self.state["vector_store_hash"] = desired_hash
+            return vector_store
+
+        self.steps.append(Step("vector_store", create_vector_store, depends_on=upload_steps))
+        return "vector_store"
+
+    def _plan_cleanup(self, remote_store, digests):
+        """Delete the replaced store and uploads, but only after the assistant is relinked."""
+        superseded_files = [(path, entry["file_id"]) for path, entry in self.state["files"].items()
+                            if digests.get(path) != entry.get("digest")]
+        if remote_store is None and not superseded_files:
+            return
+
+        def delete_superseded(results):
+            deletions = [(self.client.files.delete, file_id) for _, file_id in superseded_files]
+            if remote_store is not None:
+                deletions.append((self.client.vector_stores.delete, remote_store.id))
+            for delete, object_id in deletions:
+                try:
+                    delete(object_id)
+                except NotFoundError:
+                    pass
+            for path, _ in superseded_files:
+                if path not in digests:
+                    self.state["files"].pop(path, None)
+            return [object_id for _, object_id in deletions]
+
+        self.steps.append(Step("cleanup", delete_superseded, depends_on=["assistant"]))
+
+    def _existing_files(self, digests):
+        """Paths whose recorded upload matches the local content and still exists remotely."""
+        candidates = {path: self.state["files"][path]["file_id"]
+                      for path, digest in digests.items()
+                      if self.state["files"].get(path, {}).get("digest") == digest}
+        if not candidates:
+            return set()
+
+        def exists(item):
+            path, file_id = item
+            try:
+                self.client.files.retrieve(file_id)
+                return path
+            except NotFoundError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return {path for path in executor.map(exists, candidates.items()) if path}
+
+    def _add_upload_step(self, path, digest):
+        name = f"upload:{path}"
+
+        def upload(results):
+            file_id = self.uploader(self.client, path)
+            self.state["files"][path] = {"digest": digest, "file_id": file_id}
+            return file_id
+
+        self.steps.append(Step(name, upload))
+        return name
+
+    def _plan_assistant(self, vector_store_step):
+        config = dict(self.desired["assistant"])
+        remote = self.remote.get("assistant")
+
+        if "vector_store" in self.desired:
+            keys = list(config) + ["tool_resources"]
+        else:
+            keys = list(config)
+
+        def desired_config():
+            if "vector_store" not in self.desired:
+                return config
+            return {**config, "tool_resources": {
+                "file_search": {"vector_store_ids": [self.state["vector_store_id"]]}
+            }}
+
+        if remote is not None and vector_store_step is None:
+            if config_hash(_assistant_view(desired_config(), keys)) == \
+                    config_hash(_assistant_view(remote, keys)):
+                return
+
+        def apply_assistant(results):
+            if remote is not None:
+                assistant = self.client.beta.assistants.update(
+                    assistant_id=remote.id,
+                    **desired_config()
+                )
+            else:
+                assistant = self.client.beta.assistants.create(**desired_config())
+            self.state["assistant_id"] = assistant.id
+            return assistant
+
+        depends_on = [vector_store_step] if vector_store_step else []
+        self.steps.append(Step("assistant", apply_assistant, depends_on=depends_on))
+
+    def describe(self):
+        """Human-readable list of planned operations."""
+        return [step.name for step in self.steps]
+
+    def apply(self):
+        """Execute the plan in dependency waves, running each wave in parallel."""
+        pending = list(self.steps)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending:
+                ready = [s for s in pending if all(d in self.results for d in s.depends_on)]
+                if not ready:
+                    raise RuntimeError(f"Unresolvable plan dependencies: {pending}")
+                for step, result in zip(ready, executor.map(lambda s: s.action(self.results), ready)):
+                    self.results[step.name] = result
+                    print(f"  ✅ {step.name}")
+                pending = [s for s in pending if s not in ready]
+        return self.results
+
+    @property
+    def assistant(self):
+        """The assistant after apply: the updated object or the unchanged remote one."""
+        return self.results.get("assistant") or self.remote.get("assistant")
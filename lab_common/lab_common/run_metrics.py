@@ -0,0 +1,248 @@
+"""
+Prometheus metrics for assistant runs, with a per-run latency breakdown.
+
+Every run reports created_at, started_at and a terminal timestamp
+(completed_at, failed_at, ...), so the wall time we measure around a run
+splits into three phases:
+
+    queue_wait        created_at → started_at    waiting for OpenAI to pick the run up
+    execution         started_at → finished      the model and its tools working
+    client_overhead   the rest of our wall time  network, poll interval, our own code
+
+Server timestamps are whole seconds, so a single run's split is only accurate
+to about a second; the histograms are what shows where the time goes.
+
+Metrics are labelled by assistant and model and served in the Prometheus text
+format on a local /metrics endpoint when LAB_METRICS_PORT is set:
+
+    export LAB_METRICS_PORT=9464    # then run a script
+    curl localhost:9464/metrics
+"""
+
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .prompt_layout import cached_tokens, prompt_tokens, completion_tokens
+
+# Upper bounds in seconds; +Inf is implied
+PHASE_BUCKETS = [0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144]
+TERMINAL_TIMESTAMPS = ("completed_at", "failed_at", "cancelled_at", "expired_at", "incomplete_at")
+ERROR_STATUSES = ("failed", "cancelled", "expired", "incomplete")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=PHASE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = list(buckets)
+        # key -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.labels))
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labels + ("le",)
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ["+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_label_text(bucket_labels, key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total:g}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+def run_phases(run, wall=None):
+    """Split a finished run into queue_wait, execution and client_overhead seconds.
+
+    wall is the time we measured from submitting the run to having its final
+    state. Phases the run never reached are left out.
+    """
+    phases = {}
+    created, started = getattr(run, "created_at", None), getattr(run, "started_at", None)
+    finished = next((getattr(run, name, None) for name in TERMINAL_TIMESTAMPS
+                     if getattr(run, name, None) is not None), None)
+    if created is not None and started is not None:
+        phases["queue_wait"] = max(started - created, 0)
+    if started is not None and finished is not None:
+        phases["execution"] = max(finished - started, 0)
+    if wall is not None:
+        server = (finished - created) if created is not None and finished is not None else 0
+        phases["client_overhead"] = max(wall - server, 0.0)
+        phases["total"] = wall
+    return phases
+
+
+def tool_call_counts(steps):
+    """Tool calls per type in a run's steps (file_search calls only show up there)."""
+    counts = {}
+    for step in steps:
+        if step.type == "tool_calls" and step.step_details:
+            for tool_call in step.step_details.tool_calls:
+                counts[tool_call.type] = counts.get(tool_call.type, 0) + 1
+    return counts
+
+
+def count_tool_calls(client, thread_id, run_id):
+    """tool_call_counts for a finished run, or None if its steps can't be listed."""
+    try:
+        return tool_call_counts(client.beta.threads.runs.steps.list(thread_id=thread_id, run_id=run_id))
+    except Exception:
+        # Metrics never fail a run
+        return None
+
+
+class RunMetrics:
+    def __init__(self, buckets=PHASE_BUCKETS):
+        labels = ("assistant", "model")
+        self.phase_seconds = Histogram("openai_run_phase_seconds",
+                                       "Run latency by phase: queue_wait, execution, client_overhead, total",
+                                       labels + ("phase",), buckets)
+        self.runs = Counter("openai_runs_total", "Runs by final status", labels + ("status",))
+        self.tool_calls = Counter("openai_run_tool_calls_total", "Tool calls made by runs", labels + ("tool",))
+        self.tokens = Counter("openai_run_tokens_total", "Tokens used by runs", labels + ("kind",))
+        self.errors = Counter("openai_run_errors_total",
+                              "Runs that did not complete, or raised before finishing", labels + ("reason",))
+        self.scheduler_wait = Histogram("lab_scheduler_wait_seconds",
+                                        "Time runs waited for a slot in the local run scheduler", ("priority",),
+                                        buckets)
+        self.metrics = [self.phase_seconds, self.runs, self.tool_calls, self.tokens, self.errors,
+                        self.scheduler_wait]
+        self.server = None
+
+    @property
+    def enabled(self):
+        """Whether anything scrapes these metrics; callers skip extra API calls otherwise."""
+        return self.server is not None
+
+    def observe_run(self, run, wall=None, tool_calls=None):
+        """Record a run in its terminal state; tool_calls maps tool type to count."""
+        labels = {"assistant": getattr(run, "assistant_id", None) or "unknown",
+                  "model": getattr(run, "model", None) or "unknown"}
+        for name, seconds in run_phases(run, wall).items():
+            self.phase_seconds.observe(seconds, phase=name, **labels)
+        self.runs.inc(status=run.status, **labels)
+        if run.status in ERROR_STATUSES:
+            error = getattr(run, "last_error", None)
+            self.errors.inc(reason=getattr(error, "code", None) or run.status, **labels)
+        for tool, count in (tool_calls or {}).items():
+            self.tool_calls.inc(count, tool=tool, **labels)
+        if run.usage:
+            self.tokens.inc(run.usage.prompt_tokens or 0, kind="prompt", **labels)
+            self.tokens.inc(run.usage.completion_tokens or 0, kind="completion", **labels)
+            self.tokens.inc(cached_tokens(run.usage) or 0, kind="cached_prompt", **labels)
+
+    def observe_request(self, assistant, model, status, wall, usage=None, tool_calls=None):
+        """Record a single request that isn't a run (a Responses call, a chat completion).
+
+        It has no server timestamps, so only its total time is observed; assistant
+        labels what made it when there is no assistant.
+        """
+        labels = {"assistant": assistant or "unknown", "model": model or "unknown"}
+        self.phase_seconds.observe(wall, phase="total", **labels)
+        self.runs.inc(status=status, **labels)
+        if status in ERROR_STATUSES:
+            self.errors.inc(reason=status, **labels)
+        for tool, count in (tool_calls or {}).items():
+            self.tool_calls.inc(count, tool=tool, **labels)
+        if usage:
+            self.tokens.inc(prompt_tokens(usage) or 0, kind="prompt", **labels)
+            self.tokens.inc(completion_tokens(usage) or 0, kind="completion", **labels)
+            self.tokens.inc(cached_tokens(usage) or 0, kind="cached_prompt", **labels)
+
+    def observe_exception(self, assistant_id, error, model=None):
+        """Record a run that raised (API or network error) before reaching a terminal status."""
+        self.errors.inc(assistant=assistant_id, model=model or "unknown", reason=type(error).__name__)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics from a daemon thread; returns the server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True).start()
+        return self.server
+
+
+METRICS = RunMetrics()
+
+
+def serve_from_env():
+    """Start the /metrics endpoint if LAB_METRICS_PORT is set; returns the port or None."""
+    port = os.getenv("LAB_METRICS_PORT")
+    if not port or METRICS.enabled:
+        return None
+    METRICS.serve(int(port))
+    print(f"📈 Metrics on http://127.0.0.1:{port}/metrics")
+    return int(port)
@@ -0,0 +1,352 @@
+"""
+Priority scheduling for run submissions, across every lab process.
+
+Interactive questions and bulk jobs (notes generation, RAG query sweeps)
+draw from the same rate limit, whichever process they come from: the Q&A
+service, 02_generate_notes and a RAG sweep started side by side all take
+their slots from one ledger, a small JSON file kept under a file lock. At
+most `capacity` runs hold a slot at once. When a slot frees up it goes to a
+waiting class by weighted fair queuing: each grant advances the class's
+virtual time by 1/weight and the class with the lowest virtual time goes
+next, so under contention interactive gets `weight` slots for every one
+bulk gets. A class that was idle re-enters at the current virtual time
+instead of spending credit it saved up while idle.
+
+Each class also has a concurrency cap. Bulk is capped below capacity, so
+however much bulk work is queued, some slots are always left for interactive
+questions; while nothing interactive is waiting, bulk uses the rest.
+
+    with SCHEDULER.slot("bulk"):
+        run = client.beta.threads.runs.create_and_poll(...)
+
+A process with runs waiting re-checks the ledger every poll_interval, and
+slots held by a process that has exited are handed on the next time any
+process looks. A failed check is logged and retried, and a waiter looks at
+the ledger itself every GRANT_CHECK_INTERVAL, so a poller that stopped
+can't leave it waiting forever. aslot() does its ledger I/O in a worker
+thread, so the event loop never waits on the file lock. Slots are reentrant within a thread, so code that already
+holds one (a task started with submit(), say) doesn't queue a second time
+for the runs it makes.
+
+Environment (read on first use, so values from .env apply to every process):
+    LAB_SCHEDULER_CAPACITY   runs in flight across all processes (default: 8)
+    LAB_SCHEDULER_WEIGHTS    class weights, e.g. "interactive=4,bulk=1"
+    LAB_SCHEDULER_FILE       ledger location (default: one per user in the temp directory)
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import getpass
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
+
+from .run_metrics import METRICS
+from .state_store import file_lock
+
+# max_share caps a class's concurrent runs at that fraction of capacity
+PRIORITY_CLASSES = [
+    {"name": "interactive", "weight": 4, "max_share": 1.0},
+    {"name": "bulk", "weight": 1, "max_share": 0.75},
+]
+DEFAULT_CAPACITY = 8
+POLL_INTERVAL = 0.05
+# How often a waiter checks the ledger itself, in case its process's poller stopped
+GRANT_CHECK_INTERVAL = 1.0
+
+# Ledgers this thread holds a slot in
+_held = threading.local()
+
+
+def default_ledger_path():
+    if os.getenv("LAB_SCHEDULER_FILE"):
+        return Path(os.getenv("LAB_SCHEDULER_FILE"))
+    return Path(tempfile.gettempdir()) / f"lab_run_slots_{getpass.getuser()}.json"
+
+
+def configured_classes(classes=PRIORITY_CLASSES):
+    """Priority classes with weights overridden by LAB_SCHEDULER_WEIGHTS."""
+    classes = {c["name"]: dict(c) for c in classes}
+    for item in filter(None, (os.getenv("LAB_SCHEDULER_WEIGHTS") or "").split(",")):
+        name, _, weight = item.partition("=")
+        if name.strip() not in classes:
+            raise ValueError(f"LAB_SCHEDULER_WEIGHTS names an unknown class: {name.strip()}")
+        classes[name.strip()]["weight"] = float(weight)
+    return list(classes.values())
+
+
+def _alive(pid):
+    if pid == os.getpid() or os.name == "nt":
+        # Signal 0 would interrupt the process on Windows; its slots wait for it to release them
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _held_ledgers():
+    if not hasattr(_held, "ledgers"):
+        _held.ledgers = set()
+    return _held.ledgers
+
+
+class RunScheduler:
+    def __init__(self, classes=None, capacity=None, path=None, poll_interval=POLL_INTERVAL):
+        self._settings = None
+        self._arguments = (classes, capacity, path)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._ledger_lock = threading.Lock()
+        # Tickets of this process still waiting: id -> (priority, enqueued_at, grant)
+        self._waiting = {}
+        self._poller = None
+        self._executor = None
+
+    def _configure(self):
+        """Capacity, classes and ledger, resolved once the script has loaded its environment."""
+        with self._lock:
+            if self._settings is None:
+                classes, capacity, path = self._arguments
+                capacity = capacity or int(os.getenv("LAB_SCHEDULER_CAPACITY") or DEFAULT_CAPACITY)
+                self._settings = {
+                    "capacity": capacity,
+                    "classes": {c["name"]: {"weight": c["weight"],
+                                            "max_concurrency": max(int(capacity * c["max_share"]), 1)}
+                                for c in (classes or configured_classes())},
+                    "path": Path(path or default_ledger_path())
+                }
+            return self._settings
+
+    @property
+    def capacity(self):
+        return self._configure()["capacity"]
+
+    @property
+    def path(self):
+        return self._configure()["path"]
+
+    @property
+    def priorities(self):
+        return list(self._configure()["classes"])
+
+    @contextmanager
+    def _ledger(self):
+        """The shared ledger, locked for the block and written back after it."""
+        path = self.path
+        with self._ledger_lock, file_lock(path.with_name(path.name + ".lock")):
+            try:
+                ledger = json.loads(path.read_text())
+            except (FileNotFoundError, ValueError):
+                ledger = {}
+            ledger.setdefault("virtual_time", 0.0)
+            ledger.setdefault("classes", {})
+            ledger.setdefault("leases", {})
+            ledger.setdefault("waiting", [])
+            yield ledger
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            tmp_path.write_text(json.dumps(ledger))
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _reap(ledger):
+        """Drop tickets and slots of processes that have exited."""
+        alive = {}
+
+        def live(entry):
+            if entry["pid"] not in alive:
+                alive[entry["pid"]] = _alive(entry["pid"])
+            return alive[entry["pid"]]
+
+        ledger["leases"] = {ticket: lease for ticket, lease in ledger["leases"].items() if live(lease)}
+        ledger["waiting"] = [ticket for ticket in ledger["waiting"] if live(ticket)]
+
+    def _dispatch(self, ledger):
+        """Hand free slots to waiting tickets, in weighted fair order."""
+        settings = self._configure()
+        classes, leases = settings["classes"], ledger["leases"]
+        running = Counter(lease["priority"] for lease in leases.values())
+        while len(leases) < settings["capacity"]:
+            eligible = [name for name, cls in classes.items()
+                        if running[name] < cls["max_concurrency"]
+                        and any(ticket["priority"] == name for ticket in ledger["waiting"])]
+            if not eligible:
+                break
+            state = ledger["classes"]
+            name = min(eligible, key=lambda n: (state[n]["virtual_time"], -classes[n]["weight"]))
+            ticket = next(ticket for ticket in ledger["waiting"] if ticket["priority"] == name)
+            ledger["waiting"].remove(ticket)
+            leases[ticket["id"]] = {"pid": ticket["pid"], "priority": name}
+            running[name] += 1
+            ledger["virtual_time"] = state[name]["virtual_time"]
+            state[name]["virtual_time"] += 1 / classes[name]["weight"]
+            state[name]["granted"] += 1
+
+    def _sync(self, change=None):
+        """Apply change to the ledger, hand out free slots and deliver this process's grants."""
+        with self._ledger() as ledger:
+            if change:
+                change(ledger)
+            self._reap(ledger)
+            self._dispatch(ledger)
+            leased = set(ledger["leases"])
+        ready = []
+        with self._lock:
+            for ticket in [t for t in self._waiting if t in leased]:
+                priority, enqueued_at, grant = self._waiting.pop(ticket)
+                METRICS.scheduler_wait.observe(time.perf_counter() - enqueued_at, priority=priority)
+                ready.append((ticket, grant))
+            if self._waiting and (self._poller is None or not self._poller.is_alive()):
+                # Other processes release slots without telling us; keep looking while we wait
+                self._poller = threading.Thread(target=self._poll, name="run-slot-poller", daemon=True)
+                self._poller.start()
+        for ticket, grant in ready:
+            grant(ticket)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._waiting:
+                    self._poller = None
+                    return
+            try:
+                self._sync()
+            except Exception as e:
+                # The waiters would never hear of their grants; try again on the next tick
+                print(f"⚠️  Run scheduler could not check {self.path}: {e}")
+
+    def _enqueue(self, priority, grant):
+        """Queue a ticket for a slot; grant(ticket) is called once it holds one. Returns the ticket."""
+        if priority not in self._configure()["classes"]:
+            raise ValueError(f"Unknown priority class: {priority} (expected one of {', '.join(self.priorities)})")
+        ticket = uuid.uuid4().hex
+        with self._lock:
+            self._waiting[ticket] = (priority, time.perf_counter(), grant)
+
+        def add(ledger):
+            cls = ledger["classes"].setdefault(priority, {"virtual_time": 0.0, "granted": 0})
+            if not any(t["priority"] == priority for t in ledger["waiting"]):
+                cls["virtual_time"] = max(cls["virtual_time"], ledger["virtual_time"])
+            ledger["waiting"].append({"id": ticket, "pid": os.getpid(), "priority": priority})
+
+        self._sync(add)
+        return ticket
+
+    def _release(self, ticket):
+        """Give up a slot, or a ticket still waiting for one."""
+        with self._lock:
+            self._waiting.pop(ticket, None)
+
+        def remove(ledger):
+            ledger["leases"].pop(ticket, None)
+            ledger["waiting"] = [t for t in ledger["waiting"] if t["id"] != ticket]
+
+        self._sync(remove)
+
+    @contextmanager
+    def slot(self, priority="interactive"):
+        """Block until a run slot for this priority class is free, and hold it for the block."""
+        held = _held_ledgers()
+        if self.path in held:
+            yield
+            return
+        granted = threading.Event()
+        ticket = self._enqueue(priority, lambda _: granted.set())
+        try:
+            while not granted.wait(GRANT_CHECK_INTERVAL):
+                self._sync()
+        except BaseException:
+            self._release(ticket)
+            raise
+        held.add(self.path)
+        try:
+            yield
+        finally:
+            held.discard(self.path)
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, priority="interactive"):
+        """slot() for asyncio code; waits, and reads the ledger, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        enqueued = loop.run_in_executor(None, self._enqueue, priority,
+                                        lambda _: loop.call_soon_threadsafe(granted.set_result, None))
+        try:
+            # Shielded, so a caller cancelled meanwhile still gets the ticket back to release
+            ticket = await asyncio.shield(enqueued)
+        except asyncio.CancelledError:
+            enqueued.add_done_callback(
+                lambda f: f.cancelled() or f.exception() or loop.run_in_executor(None, self._release, f.result()))
+            raise
+        try:
+            # asyncio.wait leaves the grant alone when it times out or the waiter is cancelled
+            while not (await asyncio.wait({granted}, timeout=GRANT_CHECK_INTERVAL))[0]:
+                await loop.run_in_executor(None, self._sync)
+        except BaseException:
+            # Cancelled while queued, or just granted; either way the ticket is given back
+            await loop.run_in_executor(None, self._release, ticket)
+            raise
+        try:
+            yield
+        finally:
+            await loop.run_in_executor(None, self._release, ticket)
+
+    def submit(self, priority, fn, *args, **kwargs):
+        """Run fn in a pool thread once a slot is granted; returns a Future."""
+        future = Future()
+
+        def run(ticket):
+            if not future.set_running_or_notify_cancel():
+                self._release(ticket)
+                return
+            held = _held_ledgers()
+            held.add(self.path)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                held.discard(self.path)
+                self._release(ticket)
+
+        capacity = self.capacity
+        with self._lock:
+            if self._executor is None:
+                # This process never holds more than capacity slots, so a task never waits for a thread
+                self._executor = ThreadPoolExecutor(max_workers=capacity, thread_name_prefix="run-slot")
+            executor = self._executor
+        self._enqueue(priority, lambda ticket: executor.submit(run, ticket))
+        return future
+
+    def describe(self):
+        """Slots per class across all processes."""
+        classes = self._configure()["classes"]
+        with self._ledger() as ledger:
+            self._reap(ledger)
+            running = Counter(lease["priority"] for lease in ledger["leases"].values())
+            waiting = Counter(ticket["priority"] for ticket in ledger["waiting"])
+            return {name: {"running": running[name], "waiting": waiting[name],
+                           "granted": ledger["classes"].get(name, {}).get("granted", 0),
+                           "max_concurrency": cls["max_concurrency"], "weight": cls["weight"]}
+                    for name, cls in classes.items()}
+
+    def shutdown(self):
+        """Wait for submitted tasks; the scheduler can still be used afterwards."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+SCHEDULER = RunScheduler()
@@ -0,0 +1,168 @@
+"""
+Multi-process-safe local state for assistant, vector store and thread ids.
+
+State lives in one JSON file next to the project (not the current working
+directory), namespaced by profile so dev/staging/prod or parallel experiments
+don't overwrite each other. Writes take an exclusive file lock and replace
+the file atomically; reads go through an in-process cache that is refreshed
+only when the file changes on disk.
+
+Environment:
+    LAB_PROFILE      profile namespace (default: "default")
+    LAB_STATE_FILE   override the state file location
+    LAB_PROJECT_DIR  override the project the state belongs to
+"""
+
+import copy
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LEGACY_FILES = {"assistant_id": ".assistant", "last_thread_id": ".last_thread"}
+
+
+def project_dir():
+    """The lab being run: the project whose scripts/ holds the entry script, else the cwd."""
+    if os.getenv("LAB_PROJECT_DIR"):
+        return Path(os.getenv("LAB_PROJECT_DIR")).resolve()
+    main_file = getattr(sys.modules.get("__main__"), "__file__", None)
+    if main_file:
+        scripts = Path(main_file).resolve().parent
+        if scripts.name == "scripts":
+            return scripts.parent
+    return Path.cwd()
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive lock on lock_path across processes; callers add their own thread lock."""
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StateStore:
+    def __init__(self, path=None, profile=None):
+        self.path = Path(path or os.getenv("LAB_STATE_FILE") or project_dir() / ".state.json")
+        self.profile = profile or os.getenv("LAB_PROFILE", "default")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._thread_lock = threading.RLock()
+        self._cache = None
+        self._cache_stamp = None
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock across threads and processes."""
+        with self._thread_lock, file_lock(self.lock_path):
+            yield
+
+    def _stamp(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_all(self):
+        """Whole state file, served from cache unless it changed on disk."""
+        with self._thread_lock:
+            stamp = self._stamp()
+            if self._cache is None or stamp != self._cache_stamp:
+                try:
+                    self._cache = json.loads(self.path.read_text()) if stamp else {}
+                except ValueError:
+                    self._cache = {}
+                self._cache_stamp = stamp
+            return self._cache
+
+    def _write_all(self, data):
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(data, indent=2))
+        os.replace(tmp_path, self.path)
+        self._cache = data
+        self._cache_stamp = self._stamp()
+
+    def _legacy_value(self, key):
+        """Fall back to the old bare files (.assistant, .last_thread) for the default profile."""
+        if self.profile != "default" or key not in LEGACY_FILES:
+            return None
+        for base in (Path.cwd(), self.path.parent):
+            legacy = base / LEGACY_FILES[key]
+            if legacy.exists():
+                return legacy.read_text().strip() or None
+        return None
+
+    def get(self, key, default=None):
+        value = self._read_all().get(self.profile, {}).get(key)
+        if value is None:
+            value = self._legacy_value(key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.update({key: value})
+
+    def update(self, values):
+        with self._locked():
+            self._cache = None  # force a fresh read under the lock
+            data = copy.deepcopy(self._read_all())
+            data.setdefault(self.profile, {}).update(values)
+            self._write_all(data)
+
+    def delete(self, key):
+        with self._locked():
+            self._cache = None
+            data = copy.deepcopy(self._read_all())
+            removed = data.get(self.profile, {}).pop(key, None)
+            if removed is not None:
+                self._write_all(data)
+            return removed
+
+    def get_or_create(self, key, factory):
+        """Return key's value, creating it with factory() under the lock if missing.
+
+        Holding the lock while provisioning means parallel workers on one host
+        create the resource once instead of racing.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._locked():
+            self._cache = None
+            value = self.get(key)
+            if value is None:
+                value = factory()
+                data = copy.deepcopy(self._read_all())
+                data.setdefault(self.profile, {})[key] = value
+                self._write_all(data)
+            return value
+
+
+_default_store = None
+
+
+def get_store():
+    """Process-wide store for the current profile."""
+    global _default_store
+    if _default_store is None:
+        _default_store = StateStore()
+    return _default_store
@@ -1,10 +1,15 @@
 import os
 import sys
+import copy
 import requests
 from io import BytesIO
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.multipart_upload import should_use_multipart, upload_file_multipart
+from lab_common.provisioner import ProvisioningPlan
+from lab_common.state_store import get_store
+from lab_common.profiling import run_profiled
 
 # Load env variables
 load_dotenv()
@@ -18,54 +23,48 @@ if not api_key:
 client = OpenAI(api_key=api_key)
 
 def load_assistant_id():
-    """Load existing assistant ID from .assistant file if it exists."""
-    assistant_file = Path(".assistant")
-    if assistant_file.exists():
-        return assistant_file.read_text().strip()
-    return None
+    """Load existing assistant ID from the local state store if it exists."""
+    return get_store().get("assistant_id")
 
 def save_assistant_id(assistant_id):
-    with open(".assistant", "w") as f:
-        f.write(assistant_id)
-    print(f"💾 Assistant ID saved to .assistant")
+    store = get_store()
+    store.set("assistant_id", assistant_id)
+    print(f"💾 Assistant ID saved to {store.path} (profile: {store.profile})")
 
 
-def create_or_update_assistant(client):
-    """Create a new assistant or update existing one."""
+assistant_config = {
+    "name": "Study Q&A Assistant",
+    "instructions": "You are a helpful tutor. Use the attached files to answer questions. Cite sources.",
+    "model": "gpt-4o-mini",
+    "tools": [{"type": "file_search"}]
+}
+
+
+def load_provision_state():
+    """Recorded ids and content hashes from the previous bootstrap."""
+    state = copy.deepcopy(get_store().get("provision", {}))
     existing_id = load_assistant_id()
+    if existing_id:
+        state["assistant_id"] = existing_id
+    return state
 
-    assistant_config = {
-        "name": "Study Q&A Assistant",
-        "instructions": "You are a helpful tutor. Use the attached files to answer questions. Cite sources.",
-        "model": "gpt-4o-mini",
-        "tools": [{"type": "file_search"}]
-    }
 
-    try:
-        if existing_id:
-            print(f"🔄 Updating existing assistant: {existing_id}")
-            assistant = client.beta.assistants.update(
-                assistant_id=existing_id,
-                **assistant_config
-            )
-            print("✅ Assistant updated successfully!")
-        else:
-            print("🆕 Creating new assistant...")
-            assistant = client.beta.assistants.create(**assistant_config)
-            save_assistant_id(assistant.id)
-            print("✅ Assistant created successfully!")
+def print_assistant_details(assistant):
+    print(f"📋 Assistant Details:")
+    print(f"   ID: {assistant.id}")
+    print(f"   Name: {assistant.name}")
+    print(f"   Model: {assistant.model}")
+    print(f"   Tools: {[tool.type for tool in assistant.tools]}")
 
-        print(f"📋 Assistant Details:")
-        print(f"   ID: {assistant.id}")
-        print(f"   Name: {assistant.name}")
-        print(f"   Model: {assistant.model}")
-        print(f"   Tools: {[tool.type for tool in assistant.tools]}")
 
-        return assistant
+def apply_plan(plan):
+    """Print and execute a provisioning plan; a no-op plan issues no writes."""
+    if not plan.steps:
+        print("✅ Remote state already matches - nothing to do")
+        return
+    print(f"🗺️  Plan: {', '.join(plan.describe())}")
+    plan.apply()
 
-    except Exception as e:
-        print(f"❌ Error creating/updating assistant: {e}")
-        sys.exit(1)
 
 def create_file(client, file_path):
     """Upload file from local path or URL"""
@@ -77,6 +76,9 @@ def create_file(client, file_path):
             file=(file_name, file_content),
             purpose="assistants"
         )
+    elif should_use_multipart(file_path):
+        # Large scans go through the Uploads API so a dropped connection can resume
+        result = upload_file_multipart(client, file_path, purpose="assistants")
     else:
         with open(file_path, "rb") as file_content:
             result = client.files.create(
@@ -88,49 +90,42 @@ def create_file(client, file_path):
 
 
 def main():
-    # 1. Create Assistant
-    print("🧠 Creating assistant...")
-    assistant = create_or_update_assistant(client)
-    # print(f"✅ Assistant created: {assistant.id}")
-
-    # 2. Upload file (change this path or URL)
+    # Desired state: assistant + uploaded file + vector store linked to the assistant
     file_path = "../data/Cognitive_science.pdf"
-    file_id = create_file(client, file_path)
-
-    # 3. Create vector store and add the file
-    print("📚 Creating vector store...")
-    vector_store = client.vector_stores.create(
-        name="knowledge_base"
-    )
-    print(vector_store.id)
-
-    client.vector_stores.files.create(
-        vector_store_id=vector_store.id,
-        file_id=file_id
-    )
-    result = client.vector_stores.files.list(
-        vector_store_id=vector_store.id
-    )
-    print(result)
-
-    print(f"✅ File added to vector store: {vector_store.id}")
-
-    # 4. Link vector store to assistant
-    print("🔗 Linking vector store to assistant...")
-    client.beta.assistants.update(
-        assistant_id=assistant.id,
-        tool_resources={
-            "file_search": {
-                "vector_store_ids": [vector_store.id]
-            }
-        }
-    )
+    desired = {
+        "assistant": assistant_config,
+        "files": [file_path],
+        "vector_store": {"name": "knowledge_base"}
+    }
+
+    # 1. Diff against remote state (one or two reads)
+    print("🧠 Planning assistant, file and vector store...")
+    state = load_provision_state()
+    plan = ProvisioningPlan(client, desired, state, uploader=create_file)
 
+    # 2. Execute only the changed operations, independent ones in parallel
+    try:
+        apply_plan(plan)
+    except Exception as e:
+        print(f"❌ Provisioning failed: {e}")
+        sys.exit(1)
+    finally:
+        get_store().update({
+            "provision": state,
+            "vector_store_id": state.get("vector_store_id")
+        })
+
+    print_assistant_details(plan.assistant)
+    # Backends describe the assistant from this instead of retrieving it for every build-cache check
+    get_store().set("assistant_config", {"id": plan.assistant.id, "model": plan.assistant.model,
+                                         "instructions": plan.assistant.instructions})
+    print(f"📚 Vector store: {state['vector_store_id']}")
     print("✅ Assistant ready with file knowledge")
 
-    # 5. Save assistant ID
-    save_assistant_id(assistant.id)
+    # 3. Save assistant ID
+    if state["assistant_id"] != load_assistant_id():
+        save_assistant_id(state["assistant_id"])
 
 
 if __name__ == "__main__":
-    main()
+    run_profiled("00_bootstrap", main)
@@ -1,9 +1,18 @@
 import os
 import sys
-import time
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.state_store import get_store
+from lab_common.citations import CitationResolver
+from page_cache import load_page_cache, citation_page_locator
+from lab_common.conversation import ConversationSession, ContextBudget
+from lab_common.prompt_layout import describe_cache
+from model_router import ModelRouter
+from qna_backends import AssistantsBackend, ResponsesBackend, compare_backends
+from lab_common.profiling import run_profiled, phase
+from lab_common.run_metrics import serve_from_env
 
 # Load environment variables
 load_dotenv()
@@ -23,79 +32,179 @@ def get_client():
 
 
 def load_assistant_id():
-    assistant_file = Path(".assistant")
-    if not assistant_file.exists():
+    assistant_id = get_store().get("assistant_id")
+    if not assistant_id:
         print("❌ No assistant found. Please run: python scripts/00_bootstrap.py")
         sys.exit(1)
-    return assistant_file.read_text().strip()
+    return assistant_id
 
 
-def ask_pdf_question(client, assistant_id, question):
+def ask_pdf_question(client, assistant_id, question, citation_resolver=None, page_cache=None, router=None,
+                     backend=None, on_status=None, on_delta=None):
+    """Ask and print an answer with citations.
+
+    backend is an AssistantsBackend (the default) or a ResponsesBackend, chosen per call.
+    on_status replaces the printed status lines; on_delta streams the answer text to it.
+    Returns the Answer.
+    """
     print(f"\n📝 Asking: {question}")
+    citation_resolver = citation_resolver or CitationResolver(client)
+    backend = backend or AssistantsBackend(client, assistant_id)
+
+    decision = router.route(question) if router else None
+    if decision:
+        print(f"🧭 Routed to {decision['tier']} tier ({decision['model']}, score {decision['score']})")
+
+    print(f"⏳ Waiting for response ({backend.name})...")
+    with phase("answer"):
+        answer = backend.ask(
+            question,
+            model=decision["model"] if decision else None,
+            # Status lines would break up streamed text
+            on_status=on_status or (None if on_delta else lambda status: print(f"📡 Status: {status}")),
+            on_delta=on_delta
+        )
+    if decision:
+        router.record(decision, answer.latency, answer.status,
+                      citations=len(answer.annotations), answer_chars=len(answer.text or ""))
+
+    if not answer.completed:
+        print(f"❌ Run did not complete successfully: {answer.status}")
+        return answer
+
+    print(f"🧊 Prompt cache: {describe_cache(answer.usage)}")
+
+    # Print response with citations
+    if on_delta is None:
+        print(f"\n📘 Answer ({answer.latency:.2f}s):")
+        print(answer.text)
+    else:
+        # The text has already been streamed
+        print(f"\n📘 Answered in {answer.latency:.2f}s")
+
+    lines = answer_citations(answer, citation_resolver, page_cache)
+    if lines:
+        print("\n🔍 Citations (from PDF):")
+        for line in lines:
+            print(f"- {line}")
+    else:
+        print("\n⚠️ No citations found — did not reference uploaded PDF.")
+    return answer
+
+
+def answer_citations(answer, citation_resolver, page_cache=None):
+    """Rendered citations for an answer, with page numbers found locally where possible."""
+    if not answer.annotations:
+        return []
+    with phase("citations"):
+        page_locator = citation_page_locator(page_cache, answer.text)
+        return citation_resolver.render(answer.annotations, page_locator=page_locator)
+
+
+def print_backend_comparison(backends, questions):
+    """Ask each question on every backend and print latencies side by side."""
+    print("\n⚖️  Backend latency comparison")
+    names = [backend.name for backend in backends]
+    print(f"{'question':<42} " + " ".join(f"{name:>12}" for name in names))
+    totals = {name: 0.0 for name in names}
+    for row in compare_backends(backends, questions):
+        cells = []
+        for name in names:
+            result = row[name]
+            totals[name] += result["latency"]
+            cell = f"{result['latency']:.2f}s" if result["status"] == "completed" else result["status"]
+            cells.append(f"{cell:>12}")
+        print(f"{row['question'][:40]:<42} " + " ".join(cells))
+    print(f"{'total':<42} " + " ".join(f"{totals[name]:>11.2f}s" for name in names))
+
+
+def chat(backend, session_name, citation_resolver, page_cache, max_prompt_tokens=6000):
+    """Interactive study session, with a bounded prompt per turn."""
+    session = ConversationSession(backend, name=session_name,
+                                  budget=ContextBudget(max_prompt_tokens=max_prompt_tokens))
+    resumed = f", resuming {session.conversation_id}" if session.conversation_id else ""
+    print(f"💬 Session '{session_name}' on the {backend.name} backend{resumed} (empty line to quit)")
+
+    while True:
+        try:
+            question = input("\n❓ ").strip()
+        except EOFError:
+            break
+        if not question:
+            break
 
-    # Create a new thread
-    thread = client.beta.threads.create()
-
-    # Add the user question
-    client.beta.threads.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content=question
-    )
-
-    # Create and start the run
-    run = client.beta.threads.runs.create(
-        thread_id=thread.id,
-        assistant_id=assistant_id,
-        instructions="Answer using attached files. Cite sources if possible."
-    )
-
-    # Poll until completed
-    print("⏳ Waiting for response...")
-    while run.status not in ["completed", "failed", "cancelled"]:
-        time.sleep(1)
-        run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
-        print(f"📡 Status: {run.status}")
-
-    if run.status != "completed":
-        print(f"❌ Run did not complete successfully: {run.status}")
-        return
+        answer = session.ask(question)
+        if not answer.completed:
+            print(f"❌ Run did not complete successfully: {answer.status}")
+            continue
 
-    # Get and print response with citations
-    messages = client.beta.threads.messages.list(thread_id=thread.id)
-
-    for message in reversed(messages.data):
-        if message.role == "assistant":
-            print("\n📘 Answer:")
-            print(message.content[0].text.value)
-
-            annotations = message.content[0].text.annotations
-            if annotations:
-                print("\n🔍 Citations (from PDF):")
-                for ann in annotations:
-                    print(f"- {ann}")
-            else:
-                print("\n⚠️ No citations found — did not reference uploaded PDF.")
-            break
+        print(f"\n📘 {answer.text}")
+        if answer.annotations:
+            page_locator = citation_page_locator(page_cache, answer.text)
+            for line in citation_resolver.render(answer.annotations, page_locator=page_locator):
+                print(f"   - {line}")
+        print(f"📏 Turn {len(session.budget.prompt_tokens)}: {session.budget.describe()}; "
+              f"{describe_cache(answer.usage)}")
+
+    print(f"\n📈 Prompt tokens per turn: {session.budget.prompt_tokens}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ask the study assistant about the PDF.")
+    parser.add_argument("--backend", choices=["assistants", "responses"], default="assistants",
+                        help="API that answers: assistant runs, or one Responses request with file_search")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--compare", action="store_true", help="time the example questions on both backends")
+    mode.add_argument("--chat", nargs="?", const="default", metavar="SESSION",
+                      help="interactive session, resumed by name (default: %(const)s)")
+    parser.add_argument("--stream", action="store_true", help="print the example answers as they are generated")
+    return parser.parse_args(argv)
 
 
 def main():
+    args = parse_args()
     print("📚 Assistant Q&A from PDF")
     print("=" * 40)
 
     client = get_client()
     assistant_id = load_assistant_id()
     print(f"✅ Using assistant: {assistant_id}")
+    serve_from_env()
+    citation_resolver = CitationResolver(client)
+    # Local page text lets citations show page numbers without asking the model again
+    page_cache = load_page_cache()
+    # Simple lookups go to a faster model tier; tiers over the latency SLO shed load downward
+    router = ModelRouter()
+
+    questions = [
+        "How do cortisol levels correlate with anxiety and depression according to the UK Biobank study?",
+        "What machine learning models are proposed for analyzing voice, facial expression, and physiological data in the study?"
+    ]
+
+    backend = AssistantsBackend(client, assistant_id)
+    if args.backend == "responses" or args.compare:
+        vector_store_id = get_store().get("vector_store_id")
+        if not vector_store_id:
+            print("❌ No vector store found. Please run: python scripts/00_bootstrap.py")
+            sys.exit(1)
+        responses_backend = ResponsesBackend.from_assistant(client, assistant_id, vector_store_id)
+        if args.compare:
+            print_backend_comparison([backend, responses_backend], questions)
+            return
+        backend = responses_backend
+
+    if args.chat:
+        chat(backend, args.chat, citation_resolver, page_cache)
+        return
 
     # Example prompts from your homework
-    ask_pdf_question(client, assistant_id,
-                     "How do cortisol levels correlate with anxiety and depression according to the UK Biobank study?")
-
-    ask_pdf_question(client, assistant_id,
-                     "What machine learning models are proposed for analyzing voice, facial expression, and physiological data in the study?")
+    on_delta = (lambda text: print(text, end="", flush=True)) if args.stream else None
+    for question in questions:
+        ask_pdf_question(client, assistant_id, question, citation_resolver, page_cache, router, backend,
+                         on_delta=on_delta)
 
     print("\n🎯 Done! You can now verify if responses referenced chunk IDs.")
 
 
 if __name__ == "__main__":
-    main()
+    run_profiled("01_qna_assistant", main)
@@ -1,11 +1,20 @@
 import os
 import sys
 import json
-import time
+import argparse
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from pydantic import ValidationError
+from lab_common.state_store import get_store
 from note_schema import Note
+from page_cache import load_page_cache, SOURCE_PDF
+from note_dedup import colliding_slots
+from lab_common.provisioner import file_digest
+from build_cache import BuildCache
+from lab_common.prompt_layout import describe_cache
+from qna_backends import AssistantsBackend, ResponsesBackend
+from lab_common.profiling import run_profiled, phase
 
 load_dotenv()
 
@@ -17,11 +26,11 @@ def get_client():
     return OpenAI(api_key=api_key)
 
 def load_assistant_id():
-    path = Path(".assistant")
-    if not path.exists():
+    assistant_id = get_store().get("assistant_id")
+    if not assistant_id:
         print("❌ Assistant ID not found. Run 00_bootstrap.py first.")
         sys.exit(1)
-    return path.read_text().strip()
+    return assistant_id
 
 def create_summary_prompt():
     return (
@@ -34,73 +43,189 @@ def create_summary_prompt():
 
     )
 
-def create_thread_and_message(client):
-    thread = client.beta.threads.create()
-    client.beta.threads.messages.create(
-        thread_id=thread.id,
-        role="user",
-        content="Please summarize the document into 10 study notes."
-    )
-    return thread.id
-
-def run_assistant(client, assistant_id, thread_id, system_prompt):
-    run = client.beta.threads.runs.create(
-        thread_id=thread_id,
-        assistant_id=assistant_id,
-        instructions=system_prompt,
-        response_format={"type": "json_object"}
+def create_replacement_prompt(notes, slots):
+    kept = [note.heading for i, note in enumerate(notes) if i not in slots]
+    ids = [notes[i].id for i in slots]
+    return (
+        "You are a study summarizer. Some of the study notes you wrote overlap with others. "
+        f"Return exactly {len(ids)} replacement notes with ids {ids}, each covering a different topic "
+        "from the document than these existing notes and from each other: "
+        + "; ".join(kept) + ". "
+        "Respond ONLY with valid JSON matching this format: "
+        "{ \"notes\": [ { \"id\": 1, \"heading\": \"...\", \"summary\": \"...\", \"page_ref\": 3 } ] }. "
+        "Summaries are max 150 characters. Do not include Markdown or explanations."
     )
-    while run.status not in ["completed", "failed", "cancelled"]:
-        time.sleep(1)
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
 
-    if run.status != "completed":
-        raise RuntimeError(f"Run failed with status: {run.status}")
+# Next to the build cache, wherever the script is run from
+NOTES_FILE = Path(__file__).resolve().parent.parent / "exam_notes.json"
+NOTES_REQUEST = "Please summarize the document into 10 study notes."
 
-    return run
-
-def extract_response_text(client, thread_id):
-    messages = client.beta.threads.messages.list(thread_id=thread_id)
-    for message in reversed(messages.data):
-        if message.role == "assistant":
-            return message.content[0].text.value
-    raise ValueError("No assistant message found.")
+def generate_notes(backend, system_prompt):
+    """Ask the backend for the notes JSON; returns the Answer."""
+    answer = backend.ask_json(system_prompt, NOTES_REQUEST)
+    if not answer.completed:
+        raise RuntimeError(f"Run failed with status: {answer.status}")
+    return answer
 
 def parse_and_validate_notes(content):
     data = json.loads(content)
     notes = [Note(**item) for item in data["notes"]]
     return notes, data
 
-def save_notes_to_file(data, filename="exam_notes.json"):
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
-    print(f"\n📝 Notes saved to {filename}")
+def regenerate_colliding_notes(backend, previous_id, notes, data, max_rounds=2):
+    """Replace near-duplicate notes in place, asking only for the colliding slots.
+
+    Follow-ups continue the original conversation (thread or response chain).
+    Returns the notes that still collide after max_rounds (empty when all are unique).
+    """
+    for _ in range(max_rounds):
+        slots = colliding_slots(notes)
+        if not slots:
+            return []
+        print(f"♻️  Regenerating {len(slots)} near-duplicate note(s): {[notes[i].id for i in slots]}")
+        answer = backend.ask_json(create_replacement_prompt(notes, slots), "Replace the overlapping notes.",
+                                  previous_id=previous_id)
+        if not answer.completed:
+            raise RuntimeError(f"Run failed with status: {answer.status}")
+        previous_id = answer.id
+        replacements, _ = parse_and_validate_notes(answer.text)
+        by_id = {note.id: note for note in replacements}
+        for i in slots:
+            replacement = by_id.get(notes[i].id)
+            if replacement is not None:
+                notes[i] = replacement
+                data["notes"][i] = replacement.model_dump()
+    return [notes[i] for i in colliding_slots(notes)]
+
+def check_page_refs(notes, page_cache):
+    """Compare each note's page_ref with the page its text best matches locally."""
+    mismatches = []
+    for note in notes:
+        if note.page_ref is None:
+            continue
+        if not 1 <= note.page_ref <= len(page_cache):
+            mismatches.append((note, None))
+            continue
+        best_page = page_cache.best_page_for(f"{note.heading} {note.summary}")
+        if best_page is not None and best_page != note.page_ref:
+            mismatches.append((note, best_page))
+    return mismatches
+
+def knowledge_inputs(store=None):
+    """The vector store and files the notes are retrieved from, as recorded by 00_bootstrap."""
+    store = store or get_store()
+    files = store.get("provision", {}).get("files", {})
+    return {
+        "vector_store_id": store.get("vector_store_id"),
+        "file_ids": sorted(entry["file_id"] for entry in files.values())
+    }
+
+def build_inputs(backend, system_prompt, pdf_path=SOURCE_PDF, store=None):
+    """Everything that determines the notes; a change to any of it invalidates the cached build."""
+    return {
+        "document": file_digest(pdf_path),
+        "knowledge": knowledge_inputs(store),
+        "prompt": [system_prompt, NOTES_REQUEST],
+        # Backend name, model and instructions
+        **backend.describe(),
+        "schema": Note.model_json_schema()
+    }
+
+def save_notes_to_file(data, key, inputs, filename=NOTES_FILE, cache=None):
+    cache = cache or BuildCache()
+    cache.store(filename, key, data, inputs)
+    print(f"\n📝 Notes saved to {Path(filename).name} (build {key[:12]})")
+
+def select_backend(client, assistant_id, backend_name="assistants"):
+    """Assistants by default; "responses" answers in one request with file_search.
+
+    Notes are bulk work, so their runs queue behind interactive questions in the run scheduler.
+    """
+    if backend_name == "responses":
+        vector_store_id = get_store().get("vector_store_id")
+        if not vector_store_id:
+            print("❌ Vector store ID not found. Run 00_bootstrap.py first.")
+            sys.exit(1)
+        return ResponsesBackend.from_assistant(client, assistant_id, vector_store_id, priority="bulk")
+    return AssistantsBackend(client, assistant_id, priority="bulk")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate validated exam notes from the PDF.")
+    parser.add_argument("--backend", choices=["assistants", "responses"], default="assistants",
+                        help="API that writes the notes: an assistant run, or one Responses request with file_search")
+    build = parser.add_mutually_exclusive_group()
+    build.add_argument("--force", action="store_true",
+                       help="regenerate even when the notes are current, cached or pinned by --rollback")
+    build.add_argument("--rollback", action="store_true",
+                       help="restore the previous build of the notes and pin it until --force")
+    return parser.parse_args(argv)
+
 
 def main():
+    args = parse_args()
+    cache = BuildCache()
+    if args.rollback:
+        try:
+            key = cache.rollback(NOTES_FILE)
+        except KeyError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"⏪ Restored {NOTES_FILE.name} from build {key[:12]}; use --force to rebuild")
+        return
+    pinned = cache.pinned(NOTES_FILE)
+    if pinned is not None and NOTES_FILE.exists() and not args.force:
+        # A rollback stays in place until it is explicitly rebuilt
+        print(f"📌 {NOTES_FILE.name} is pinned to build {pinned[:12]} by --rollback; use --force to regenerate")
+        return
+
     client = get_client()
     assistant_id = load_assistant_id()
     system_prompt = create_summary_prompt()
-
-    print("📚 Creating thread and sending message...")
-    thread_id = create_thread_and_message(client)
-
-    print("⏳ Running assistant for structured summary...")
-    run_assistant(client, assistant_id, thread_id, system_prompt)
-
-    print("📥 Extracting response...")
-    content = extract_response_text(client, thread_id)
+    backend = select_backend(client, assistant_id, args.backend)
+
+    inputs = build_inputs(backend, system_prompt)
+    key = cache.key(inputs)
+    if not args.force:
+        if cache.is_current(NOTES_FILE, key):
+            print(f"✅ {NOTES_FILE.name} is up to date (build {key[:12]}); use --force to regenerate")
+            return
+        if cache.lookup(NOTES_FILE, key) is not None:
+            cache.restore(NOTES_FILE, key)
+            print(f"♻️  Restored {NOTES_FILE.name} from cached build {key[:12]}")
+            return
+
+    print(f"⏳ Generating structured summary ({backend.name})...")
+    with phase("generate"):
+        answer = generate_notes(backend, system_prompt)
+    content = answer.text
+    print(f"🧊 Prompt cache: {describe_cache(answer.usage)} ({answer.latency:.2f}s)")
 
     try:
-        notes, raw_data = parse_and_validate_notes(content)
-        print("✅ 10 valid notes generated:\n")
-        for note in notes:
-            print(f"{note.id}. {note.heading} — {note.summary}")
-        save_notes_to_file(raw_data)
-    except Exception as e:
+        with phase("parse_and_validate"):
+            notes, raw_data = parse_and_validate_notes(content)
+    except (json.JSONDecodeError, ValidationError) as e:
         print("❌ Failed to parse or validate JSON:", e)
         print("\nRaw response:")
         print(content)
+        return
+
+    with phase("dedup"):
+        still_colliding = regenerate_colliding_notes(backend, answer.id, notes, raw_data)
+    for note in still_colliding:
+        print(f"⚠️  Note {note.id} still overlaps another note: {note.heading}")
+    print("✅ 10 valid notes generated:\n")
+    for note in notes:
+        print(f"{note.id}. {note.heading} — {note.summary}")
+
+    with phase("page_refs"):
+        page_cache = load_page_cache()
+        mismatches = check_page_refs(notes, page_cache) if page_cache is not None else []
+    for note, best_page in mismatches:
+        hint = f"best match p. {best_page}" if best_page else f"document has {len(page_cache)} pages"
+        print(f"⚠️  Note {note.id} cites p. {note.page_ref} ({hint})")
+    with phase("save"):
+        save_notes_to_file(raw_data, key, inputs, cache=cache)
 
 
 if __name__ == "__main__":
-    main()
+    run_profiled("02_generate_notes", main)
@@ -0,0 +1,286 @@
+"""
+Open-loop load generator for the PDF Q&A path.
+
+Questions arrive as a Poisson process at a fixed target rate, independent of
+how fast earlier ones complete, so a slow backend shows up as growing latency
+and errors instead of silently lowering the offered load. Latency is measured
+from each question's scheduled arrival, which includes any client-side
+queueing. Errors are counted by category: the run's final status (failed,
+expired, ...), no_answer, or the exception type (RateLimitError,
+APITimeoutError, ...).
+
+Runs take their slots from the shared run scheduler, so by default at most
+LAB_SCHEDULER_CAPACITY questions are in flight at OpenAI and the rest queue
+client-side; the saturation point found is then the scheduler's. --capacity N
+gives the test a private scheduler with N slots, not shared with other lab
+processes, to push past it.
+
+Usage:
+    python scripts/03_load_test.py --rate 5 --duration 60 --corpus questions.txt
+    python scripts/03_load_test.py --rate 50 --base-url http://localhost:8080/v1
+    python scripts/03_load_test.py --rate 50 --capacity 64   # beyond the shared slot cap
+    LAB_METRICS_PORT=9464 python scripts/03_load_test.py --rate 5   # plus /metrics
+
+Corpus: one question per line, or a JSON list of strings.
+"""
+
+import os
+import json
+import argparse
+import time
+import random
+import bisect
+import tempfile
+import importlib
+import threading
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+from lab_common.profiling import run_profiled
+from lab_common.run_metrics import serve_from_env
+from lab_common.run_scheduler import SCHEDULER, RunScheduler
+from qna_backends import run_pdf_question
+
+qna = importlib.import_module("01_qna_assistant")
+
+# Latency histogram bucket upper bounds in seconds (last bucket is open-ended)
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+REPORT_INTERVAL = 5
+RESULTS_FILE = Path(__file__).resolve().parent.parent / "load_test_results.json"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop load test for the PDF Q&A path.")
+    parser.add_argument("--rate", type=float, default=5.0, help="target questions per second (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of arrivals (default: %(default)s)")
+    parser.add_argument("--corpus", help="questions, one per line or a JSON list of strings")
+    parser.add_argument("--base-url", help="API base URL, e.g. a local stand-in server")
+    parser.add_argument("--max-workers", type=int, default=512,
+                        help="client threads, the most questions in flight (default: %(default)s)")
+    parser.add_argument("--seed", type=int, help="seed for the arrival schedule and question choice")
+    parser.add_argument("--capacity", type=int,
+                        help="run slots of a private scheduler (default: the shared LAB_SCHEDULER_CAPACITY)")
+    args = parser.parse_args(argv)
+    for name in ("rate", "duration", "max_workers", "capacity"):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    return args
+
+
+def load_corpus(path):
+    text = Path(path).read_text()
+    if path.endswith(".json"):
+        return [q for q in json.loads(text) if q.strip()]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self):
+        labels = [f"<={b}s" for b in self.buckets] + [f">{self.buckets[-1]}s"]
+        return dict(zip(labels, self.counts))
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.window = self._new_window()
+        self.overall = self._new_window()
+        self.timeline = []
+
+    @staticmethod
+    def _new_window():
+        return {"sent": 0, "completed": 0, "errors": 0, "error_types": Counter(), "histogram": LatencyHistogram()}
+
+    def sent(self):
+        with self.lock:
+            self.window["sent"] += 1
+            self.overall["sent"] += 1
+
+    def finished(self, latency, error=None):
+        """Record a finished question; error is its category, None when it was answered."""
+        with self.lock:
+            for window in (self.window, self.overall):
+                window["completed" if error is None else "errors"] += 1
+                if error is not None:
+                    window["error_types"][error] += 1
+                window["histogram"].record(latency)
+
+    def roll(self, elapsed, interval, in_flight):
+        """Close the current window and record it in the timeline."""
+        with self.lock:
+            window, self.window = self.window, self._new_window()
+        histogram = window["histogram"]
+        done = window["completed"] + window["errors"]
+        row = {
+            "t": round(elapsed, 1),
+            "offered_rps": window["sent"] / interval,
+            "throughput_rps": window["completed"] / interval,
+            "error_rate": window["errors"] / done if done else 0.0,
+            "error_types": dict(window["error_types"]),
+            "in_flight": in_flight,
+            "p50": histogram.percentile(0.50),
+            "p95": histogram.percentile(0.95),
+            "p99": histogram.percentile(0.99),
+            "histogram": histogram.to_dict()
+        }
+        self.timeline.append(row)
+        return row
+
+
+def ask_once(client, assistant_id, question, scheduled_at, stats, in_flight, scheduler=None):
+    error = "unknown"
+    try:
+        run, message = run_pdf_question(client, assistant_id, question, scheduler=scheduler)
+        if run.status != "completed":
+            error = run.status
+        else:
+            error = None if message is not None else "no_answer"
+    except Exception as e:
+        error = type(e).__name__
+    finally:
+        stats.finished(time.perf_counter() - scheduled_at, error)
+        with in_flight["lock"]:
+            in_flight["count"] -= 1
+
+
+def format_latency(value):
+    return "-" if value is None else ("inf" if value == float("inf") else f"{value:g}s")
+
+
+def format_error_types(error_types):
+    return ", ".join(f"{name} {count}" for name, count in Counter(error_types).most_common())
+
+
+def main():
+    args = parse_args()
+    rate, duration, base_url = args.rate, args.duration, args.base_url
+
+    print("🚦 Open-loop load test for PDF Q&A")
+    print("=" * 40)
+
+    if base_url:
+        # Local stand-in servers don't check the key
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", "sk-local"), base_url=base_url,
+                        max_retries=0)
+    else:
+        client = qna.get_client().with_options(max_retries=0)
+    assistant_id = qna.load_assistant_id()
+    # Scrape during the test to see whether latency is queueing at OpenAI or our client
+    serve_from_env()
+
+    questions = load_corpus(args.corpus) if args.corpus else [
+        "How do cortisol levels correlate with anxiety and depression according to the UK Biobank study?",
+        "What machine learning models are proposed for analyzing voice, facial expression, and physiological data in the study?"
+    ]
+    if args.capacity:
+        # Its own ledger, so neither the shared cap nor other lab processes limit the test
+        scheduler = RunScheduler(capacity=args.capacity,
+                                 path=Path(tempfile.mkdtemp(prefix="load_test_")) / "run_slots.json")
+    else:
+        scheduler = SCHEDULER
+    rng = random.Random(args.seed)
+    stats = LoadStats()
+    in_flight = {"count": 0, "lock": threading.Lock()}
+
+    print(f"🎯 Target: {rate:g} q/s for {duration:g}s ({len(questions)} questions in corpus)")
+    if args.capacity:
+        print(f"🎛️  Private scheduler: {scheduler.capacity} run slots; saturation is measured against them")
+    else:
+        print(f"🎛️  Shared scheduler: at most {scheduler.capacity} runs in flight (LAB_SCHEDULER_CAPACITY), "
+              f"the rest queue client-side; pass --capacity to measure past it")
+    print(f"{'t':>6} {'offered':>8} {'tput':>7} {'err%':>6} {'inflight':>9} {'p50':>7} {'p95':>7} {'p99':>7}")
+
+    start = time.perf_counter()
+    next_arrival = start
+    next_report = start + REPORT_INTERVAL
+
+    executor = ThreadPoolExecutor(max_workers=args.max_workers)
+    try:
+        while True:
+            # Exponential inter-arrival gaps on an absolute schedule, so slow submits don't drift the rate
+            next_arrival += rng.expovariate(rate)
+            if next_arrival - start > duration:
+                break
+
+            while True:
+                now = time.perf_counter()
+                if now >= next_report:
+                    row = stats.roll(now - start, REPORT_INTERVAL, in_flight["count"])
+                    print(f"{row['t']:>5.0f}s {row['offered_rps']:>8.2f} {row['throughput_rps']:>7.2f} "
+                          f"{row['error_rate']:>6.1%} {row['in_flight']:>9} {format_latency(row['p50']):>7} "
+                          f"{format_latency(row['p95']):>7} {format_latency(row['p99']):>7}"
+                          + (f"  {format_error_types(row['error_types'])}" if row["error_types"] else ""))
+                    next_report += REPORT_INTERVAL
+                    continue
+                if now >= next_arrival:
+                    break
+                time.sleep(min(next_arrival, next_report) - now)
+
+            stats.sent()
+            with in_flight["lock"]:
+                in_flight["count"] += 1
+            executor.submit(ask_once, client, assistant_id, rng.choice(questions),
+                            next_arrival, stats, in_flight, scheduler)
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopping arrivals, waiting for in-flight questions...")
+    finally:
+        executor.shutdown(wait=True)
+
+    overall = stats.overall
+    elapsed = time.perf_counter() - start
+    histogram = overall["histogram"]
+    done = overall["completed"] + overall["errors"]
+
+    print("\n📊 Summary")
+    print(f"   Sent: {overall['sent']}  Completed: {overall['completed']}  Errors: {overall['errors']}")
+    print(f"   Throughput: {overall['completed'] / elapsed:.2f} q/s over {elapsed:.1f}s")
+    print(f"   Error rate: {(overall['errors'] / done if done else 0):.1%}")
+    if overall["error_types"]:
+        print(f"   Errors by type: {format_error_types(overall['error_types'])}")
+    print(f"   Latency p50/p95/p99: {format_latency(histogram.percentile(0.5))} / "
+          f"{format_latency(histogram.percentile(0.95))} / {format_latency(histogram.percentile(0.99))}")
+
+    RESULTS_FILE.write_text(json.dumps({
+        "rate": rate,
+        "duration": duration,
+        "base_url": base_url,
+        "capacity": scheduler.capacity,
+        "scheduler": "private" if args.capacity else "shared",
+        "summary": {
+            "sent": overall["sent"],
+            "completed": overall["completed"],
+            "errors": overall["errors"],
+            "error_types": dict(overall["error_types"]),
+            "elapsed": elapsed,
+            "histogram": histogram.to_dict()
+        },
+        "timeline": stats.timeline
+    }, indent=2, default=str))
+    print(f"\n💾 Timeline saved to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    run_profiled("03_load_test", main)
@@ -0,0 +1,113 @@
+"""
+Make-style build cache for generated artifacts such as exam_notes.json.
+
+A build is keyed by the hash of its inputs (document digest, prompt, model,
+schema, ...). When the key matches the current version of the target the
+build is skipped. Every distinct output is kept under .cache/builds/<target>/
+with a manifest recording which inputs produced it, so earlier versions can
+be restored. Targets are told apart by their full path, so two files with the
+same name in different directories don't share a history.
+
+Rolling back pins the restored version until the next store() or restore():
+pinned() returns its key, so callers can leave it in place instead of
+switching straight back to the newer build on their next run.
+
+    cache = BuildCache()
+    key = cache.key({"document": file_digest(pdf), "prompt": prompt, ...})
+    if not cache.is_current("exam_notes.json", key):
+        cache.store("exam_notes.json", key, data, inputs)
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+from lab_common.provisioner import config_hash
+
+BUILD_DIR = Path(__file__).resolve().parent.parent / ".cache" / "builds"
+
+
+def _write_json(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps(value, indent=2))
+    os.replace(tmp_path, path)
+
+
+class BuildCache:
+    def __init__(self, root=BUILD_DIR, keep=20):
+        self.root = Path(root)
+        self.keep = keep
+
+    @staticmethod
+    def key(inputs):
+        return config_hash(inputs)
+
+    def _dir(self, target):
+        path = str(Path(target).resolve())
+        return self.root / f"{Path(target).stem}-{hashlib.sha256(path.encode()).hexdigest()[:8]}"
+
+    def manifest(self, target):
+        path = self._dir(target) / "manifest.json"
+        if not path.exists():
+            return {"current": None, "versions": []}
+        return json.loads(path.read_text())
+
+    def _save_manifest(self, target, manifest):
+        _write_json(self._dir(target) / "manifest.json", manifest)
+
+    def is_current(self, target, key):
+        """True when target exists and was built from inputs hashing to key."""
+        return Path(target).exists() and self.manifest(target)["current"] == key
+
+    def lookup(self, target, key):
+        """Previously built output for key, or None."""
+        path = self._dir(target) / f"{key}.json"
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def store(self, target, key, data, inputs=None):
+        """Record a new version and write it to target."""
+        _write_json(self._dir(target) / f"{key}.json", data)
+        manifest = self.manifest(target)
+        manifest["versions"] = [v for v in manifest["versions"] if v["key"] != key]
+        manifest["versions"].append({"key": key, "built_at": time.time(), "inputs": inputs or {}})
+        for stale in manifest["versions"][:-self.keep]:
+            (self._dir(target) / f"{stale['key']}.json").unlink(missing_ok=True)
+        manifest["versions"] = manifest["versions"][-self.keep:]
+        manifest.pop("pinned", None)
+        _write_json(Path(target), data)
+        return self._activate(target, key, manifest)
+
+    def restore(self, target, key, pin=False):
+        """Make a cached version the current target without rebuilding."""
+        data = self.lookup(target, key)
+        if data is None:
+            raise KeyError(f"No cached build {key[:12]} for {target}")
+        _write_json(Path(target), data)
+        manifest = self.manifest(target)
+        if pin:
+            manifest["pinned"] = key
+        else:
+            manifest.pop("pinned", None)
+        return self._activate(target, key, manifest)
+
+    def pinned(self, target):
+        """Key of a rolled-back version that should stay current, or None."""
+        return self.manifest(target).get("pinned")
+
+    def rollback(self, target):
+        """Restore and pin the version built before the current one; returns its key."""
+        manifest = self.manifest(target)
+        keys = [v["key"] for v in manifest["versions"]]
+        if manifest["current"] not in keys or keys.index(manifest["current"]) == 0:
+            raise KeyError(f"No earlier build of {target} to roll back to")
+        previous = keys[keys.index(manifest["current"]) - 1]
+        self.restore(target, previous, pin=True)
+        return previous
+
+    def _activate(self, target, key, manifest):
+        manifest["current"] = key
+        self._save_manifest(target, manifest)
+        return key
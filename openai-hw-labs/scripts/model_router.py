@@ -0,0 +1,191 @@
+"""
+Latency-aware model routing for questions.
+
+A cheap local heuristic scores each question (length, synthesis cues,
+multi-part questions, lookup phrasing) and maps the score to a tier. Each
+tier names the model its runs are started with. The router keeps a rolling
+window of latencies per tier, and when a tier's p95 is over the SLO its
+questions go to the next faster tier. Every probe_every-th of them still
+goes to the preferred tier, so its window keeps moving and it can recover.
+
+Every routed question is appended to routing_log.jsonl (in the lab
+directory) with its features, tier, latency and quality signals (status,
+citations, answer length), so the thresholds can be tuned from real traffic.
+A new router seeds its latency windows from the last hour of that log, so a
+short-lived script like 01_qna_assistant sheds load on what earlier runs saw
+instead of starting every tier with too few samples to judge:
+
+    python scripts/model_router.py [routing_log.jsonl]
+"""
+
+import re
+import sys
+import json
+import time
+import threading
+from collections import deque, defaultdict
+from pathlib import Path
+
+from lab_common.profiling import run_profiled
+
+# Fastest first; a tier over its SLO falls back to the one before it
+MODEL_TIERS = [
+    {"name": "fast", "model": "gpt-4.1-nano", "max_score": 0},
+    {"name": "standard", "model": "gpt-4o-mini", "max_score": 2},
+    {"name": "deep", "model": "gpt-4o", "max_score": None},
+]
+ROUTING_LOG = Path(__file__).resolve().parent.parent / "routing_log.jsonl"
+# Logged latencies older than this don't describe the tiers any more
+HISTORY_MAX_AGE = 3600
+
+SYNTHESIS_CUES = ("compare", "contrast", "why", "how does", "how do", "explain", "evaluate",
+                  "implication", "relationship", "trade-off", "tradeoff", "synthes", "critique",
+                  "propose", "design", "limitations", "differ")
+LOOKUP_PREFIXES = ("what is", "what are", "define", "who", "when", "which", "list", "name")
+
+
+def question_features(question):
+    text = question.lower().strip()
+    return {
+        "words": len(text.split()),
+        "synthesis_cues": sum(cue in text for cue in SYNTHESIS_CUES),
+        # Sentences plus "... and how/what/why ..." sub-questions
+        "parts": max(len(re.findall(r"[.?!](?:\s|$)", text)), 1)
+                 + len(re.findall(r"\b(?:and|also) (?:how|what|why|which)\b", text)),
+        "lookup": text.startswith(LOOKUP_PREFIXES)
+    }
+
+
+def complexity_score(features):
+    score = (features["words"] > 25) + (features["words"] > 50)
+    score += min(features["synthesis_cues"], 2)
+    score += features["parts"] > 1
+    score -= features["lookup"] and not features["synthesis_cues"]
+    return score
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ModelRouter:
+    def __init__(self, tiers=MODEL_TIERS, slo_p95=20.0, window=200, min_samples=20, probe_every=10,
+                 log_path=ROUTING_LOG, history_max_age=HISTORY_MAX_AGE):
+        self.tiers = tiers
+        self.slo_p95 = slo_p95
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self._breaches = defaultdict(int)
+        self.log_path = Path(log_path) if log_path else None
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        if self.log_path and history_max_age:
+            self._load_history(time.time() - history_max_age)
+
+    def _load_history(self, since):
+        """Seed the latency windows from log entries recorded after since."""
+        try:
+            with open(self.log_path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        names = {tier["name"] for tier in self.tiers}
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("at", 0) >= since and entry.get("tier") in names:
+                self._latencies[entry["tier"]].append(entry["latency"])
+
+    def _tier_for_score(self, score):
+        for index, tier in enumerate(self.tiers):
+            if tier["max_score"] is None or score <= tier["max_score"]:
+                return index
+        return len(self.tiers) - 1
+
+    def tier_p95(self, name):
+        with self._lock:
+            samples = list(self._latencies[name])
+        return percentile(samples, 0.95) if len(samples) >= self.min_samples else None
+
+    def route(self, question):
+        """Pick a tier for a question; returns a decision dict including the model."""
+        features = question_features(question)
+        score = complexity_score(features)
+        index = self._tier_for_score(score)
+        preferred = self.tiers[index]["name"]
+
+        # Step down while the chosen tier is breaching the latency SLO
+        while index > 0:
+            name = self.tiers[index]["name"]
+            p95 = self.tier_p95(name)
+            if p95 is None or p95 <= self.slo_p95:
+                break
+            with self._lock:
+                self._breaches[name] += 1
+                probe = self._breaches[name] % self.probe_every == 0
+            if probe:
+                break
+            index -= 1
+
+        tier = self.tiers[index]
+        return {"tier": tier["name"], "model": tier["model"], "preferred_tier": preferred,
+                "score": score, "features": features}
+
+    def record(self, decision, latency, status, citations=0, answer_chars=0):
+        """Record the outcome of a routed question."""
+        with self._lock:
+            self._latencies[decision["tier"]].append(latency)
+        if self.log_path:
+            entry = dict(decision, latency=round(latency, 3), status=status, citations=citations,
+                         answer_chars=answer_chars, at=time.time())
+            with self._lock, open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def summarize_log(log_path=ROUTING_LOG):
+    """Per-tier latency percentiles and quality signals from a routing log."""
+    by_tier = defaultdict(list)
+    with open(log_path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                by_tier[entry["tier"]].append(entry)
+
+    summary = {}
+    for tier, entries in by_tier.items():
+        latencies = [e["latency"] for e in entries]
+        completed = [e for e in entries if e["status"] == "completed"]
+        summary[tier] = {
+            "questions": len(entries),
+            "downgraded": sum(e["preferred_tier"] != tier for e in entries),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "completed_rate": len(completed) / len(entries),
+            "cited_rate": sum(e["citations"] > 0 for e in completed) / len(completed) if completed else 0.0,
+            "avg_answer_chars": sum(e["answer_chars"] for e in completed) / len(completed) if completed else 0.0,
+            "avg_score": sum(e["score"] for e in entries) / len(entries)
+        }
+    return summary
+
+
+def main():
+    log_path = Path(sys.argv[1]) if len(sys.argv) > 1 else ROUTING_LOG
+    if not log_path.exists():
+        print(f"❌ No routing log at {log_path}")
+        sys.exit(1)
+
+    print(f"🧭 Routing summary from {log_path}")
+    print(f"{'tier':<10} {'n':>5} {'down':>5} {'p50':>7} {'p95':>7} {'ok%':>6} {'cited%':>7} {'chars':>7} {'score':>6}")
+    for tier, row in summarize_log(log_path).items():
+        print(f"{tier:<10} {row['questions']:>5} {row['downgraded']:>5} {row['p50']:>6.2f}s {row['p95']:>6.2f}s "
+              f"{row['completed_rate']:>6.0%} {row['cited_rate']:>7.0%} {row['avg_answer_chars']:>7.0f} "
+              f"{row['avg_score']:>6.2f}")
+
+
+if __name__ == "__main__":
+    run_profiled("model_router", main)
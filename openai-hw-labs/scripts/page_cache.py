@@ -0,0 +1,245 @@
+"""
+Memory-mapped per-page text cache for a source PDF.
+
+Text is extracted once per PDF (requires pypdf) and written to a single file:
+
+    header   magic, page count, source size + mtime
+    offsets  (pages + 1) uint64 offsets into the display text
+    offsets  (pages + 1) uint64 offsets into the search text
+    text     UTF-8 page text as extracted
+    search   lowercased, whitespace-collapsed page text for lookups
+
+Pages are served as zero-copy memoryviews over the mmap, and substring
+lookups run mmap.find over the search text and map hits back to pages
+with a binary search over the offset table. Word lookups for paraphrases only
+match whole words, so "art" doesn't hit "heart".
+
+A truncated or otherwise corrupt cache file is rebuilt, and a PDF that can't
+be parsed leaves the caller without a page cache instead of failing.
+
+Usage: python scripts/page_cache.py [path/to/file.pdf]
+"""
+
+import re
+import sys
+import mmap
+import bisect
+import struct
+from array import array
+from pathlib import Path
+
+from lab_common.profiling import run_profiled
+
+SOURCE_PDF = Path(__file__).resolve().parents[2] / "data" / "Cognitive_science.pdf"
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache"
+
+MAGIC = b"PGC1"
+HEADER = struct.Struct("<4sIQQ")  # magic, page count, source size, source mtime_ns
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "are", "was", "were", "its",
+    "into", "their", "using", "use", "of", "to", "in", "on", "a", "an", "as", "by", "is"
+}
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace so quotes match across line breaks."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_path_for(pdf_path):
+    return CACHE_DIR / f"{Path(pdf_path).stem}.pages"
+
+
+def write_page_cache(pages, cache_path, source_size=0, source_mtime_ns=0):
+    """Write a list of page strings to the memory-mappable cache format."""
+    texts = [page.encode("utf-8") for page in pages]
+    searches = [normalize(page).encode("utf-8") + b"\n" for page in pages]
+
+    table_size = 2 * 8 * (len(pages) + 1)
+    text_start = HEADER.size + table_size
+    search_start = text_start + sum(len(t) for t in texts)
+
+    def offsets(start, chunks):
+        result = array("Q", [start])
+        for chunk in chunks:
+            result.append(result[-1] + len(chunk))
+        return result
+
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(pages), source_size, source_mtime_ns))
+        f.write(offsets(text_start, texts).tobytes())
+        f.write(offsets(search_start, searches).tobytes())
+        f.writelines(texts)
+        f.writelines(searches)
+    tmp_path.replace(cache_path)
+    return cache_path
+
+
+def build_page_cache(pdf_path, cache_path=None):
+    """Extract per-page text from a PDF and write the cache file."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("pypdf is required to build the page cache: pip install pypdf")
+
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    try:
+        pages = [page.extract_text() or "" for page in PdfReader(pdf_path).pages]
+    except Exception as e:
+        # pypdf raises a variety of errors on damaged files
+        raise RuntimeError(f"Could not extract text from {pdf_path.name}: {e}") from e
+    return write_page_cache(pages, cache_path or cache_path_for(pdf_path),
+                            stat.st_size, stat.st_mtime_ns)
+
+
+class PageCache:
+    def __init__(self, cache_path):
+        self.path = Path(cache_path)
+        self._file = open(self.path, "rb")
+        try:
+            # mmap raises ValueError for an empty file
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_tables()
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f"Corrupt page cache {self.path}: {e}") from e
+
+    def _read_tables(self):
+        magic, self.page_count, self.source_size, self.source_mtime_ns = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("bad magic")
+
+        # The offset table is tiny, so it is copied out; page text stays in the mmap
+        n = self.page_count + 1
+        table = array("Q")
+        table.frombytes(self._mm[HEADER.size:HEADER.size + 16 * n])
+        if len(table) != 2 * n or table[-1] != len(self._mm):
+            raise ValueError("truncated")
+        self._text_offsets = table[:n]
+        self._search_offsets = table[n:]
+
+    def __len__(self):
+        return self.page_count
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def covers(self, filename):
+        """Whether filename names the PDF this cache was built from (caches are named after its stem)."""
+        path = Path(filename or "")
+        return path.suffix.lower() == ".pdf" and path.stem == self.path.stem
+
+    def is_fresh(self, pdf_path):
+        stat = Path(pdf_path).stat()
+        return (stat.st_size, stat.st_mtime_ns) == (self.source_size, self.source_mtime_ns)
+
+    def page(self, page_number):
+        """Zero-copy UTF-8 bytes of a 1-based page."""
+        if not 1 <= page_number <= self.page_count:
+            raise IndexError(f"Page {page_number} out of range 1..{self.page_count}")
+        start, end = self._text_offsets[page_number - 1], self._text_offsets[page_number]
+        return memoryview(self._mm)[start:end]
+
+    def page_text(self, page_number):
+        return bytes(self.page(page_number)).decode("utf-8")
+
+    def _page_at(self, position):
+        return bisect.bisect_right(self._search_offsets, position)
+
+    def find(self, text, whole_words=False):
+        """1-based pages containing text (case- and whitespace-insensitive)."""
+        needle = normalize(text).encode("utf-8")
+        if not needle:
+            return []
+        if whole_words:
+            pattern = re.compile(rb"(?<![\w-])" + re.escape(needle) + rb"(?![\w-])")
+        pages = []
+        position = self._search_offsets[0]
+        end = self._search_offsets[-1]
+        while True:
+            if whole_words:
+                match = pattern.search(self._mm, position, end)
+                position = match.start() if match else -1
+            else:
+                position = self._mm.find(needle, position, end)
+            if position < 0:
+                return pages
+            page = self._page_at(position)
+            pages.append(page)
+            # Continue from the next page; one hit per page is enough
+            position = self._search_offsets[page]
+
+    def best_page_for(self, text):
+        """Page sharing the most distinctive words with a paraphrase, or None."""
+        words = {w for w in re.findall(r"[a-z0-9][a-z0-9-]{2,}", normalize(text)) if w not in STOPWORDS}
+        if not words:
+            return None
+        scores = [0] * (self.page_count + 1)
+        for word in words:
+            for page in self.find(word, whole_words=True):
+                scores[page] += 1
+        best = max(range(1, self.page_count + 1), key=scores.__getitem__, default=None)
+        return best if best and scores[best] else None
+
+
+def load_page_cache(pdf_path=SOURCE_PDF):
+    """Open the cache for a PDF, (re)building it when missing or stale.
+
+    Returns None when the cache can't be built (e.g. pypdf isn't installed).
+    """
+    cache_path = cache_path_for(pdf_path)
+    if cache_path.exists():
+        try:
+            cache = PageCache(cache_path)
+        except (ValueError, OSError) as e:
+            print(f"⚠️  Rebuilding page cache: {e}")
+        else:
+            if cache.is_fresh(pdf_path):
+                return cache
+            cache.close()
+    try:
+        build_page_cache(pdf_path, cache_path)
+        return PageCache(cache_path)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"⚠️  Page cache unavailable: {e}")
+        return None
+
+
+def citation_page_locator(cache, answer_text):
+    """page_locator for CitationResolver.render: finds the page for the sentence a citation follows.
+
+    Only citations of the cached PDF get a page; other files return None.
+    """
+    def locate(filename, annotation):
+        # Assistants annotations carry start_index, Responses annotations index
+        position = getattr(annotation, "start_index", None)
+        if position is None:
+            position = getattr(annotation, "index", None)
+        if cache is None or position is None or not cache.covers(filename):
+            return None
+        sentence = re.split(r"(?<=[.!?])\s+", answer_text[:position])[-1]
+        return cache.best_page_for(sentence)
+    return locate
+
+
+def main():
+    pdf_path = Path(sys.argv[1]) if len(sys.argv) > 1 else SOURCE_PDF
+    cache_path = build_page_cache(pdf_path)
+    with PageCache(cache_path) as cache:
+        print(f"✅ Cached {len(cache)} pages from {pdf_path.name} → {cache_path}")
+
+
+if __name__ == "__main__":
+    run_profiled("page_cache", main)
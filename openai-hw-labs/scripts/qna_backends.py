@@ -0,0 +1,311 @@
+"""
+Pluggable backends for PDF Q&A and notes generation.
+
+AssistantsBackend uses the thread/run lifecycle: create a thread, add the
+message, start a run and poll until it finishes. ResponsesBackend answers
+with a single Responses API request using the file_search tool over the same
+vector store, with no polling; follow-ups chain on previous_response_id.
+
+Both return an Answer, whose id continues the conversation on the same
+backend (a thread id or a response id), so callers can pick a backend per
+call. ask_turn answers one turn of a ConversationSession
+(lab_common.conversation) within its context budget. Passing on_delta to
+ask streams the answer instead: each piece of text is handed to on_delta as
+it is generated, and the same Answer is returned at the end.
+
+    backend = ResponsesBackend.from_assistant(client, assistant_id, vector_store_id)
+    answer = backend.ask("What does HRV measure?")
+    follow_up = backend.ask("And cortisol?", previous_id=answer.id)
+"""
+
+import time
+
+from lab_common.prompt_layout import run_instructions
+from lab_common.conversation import summary_instructions
+from lab_common.run_metrics import METRICS, count_tool_calls
+from lab_common.run_scheduler import SCHEDULER
+from lab_common.state_store import get_store
+
+TERMINAL_STATUSES = ["completed", "failed", "cancelled", "expired", "incomplete"]
+# Appended after the assistant's instructions so every Q&A run shares a cacheable prefix
+QNA_GUIDANCE = "Answer using attached files. Cite sources if possible."
+
+
+class Answer:
+    def __init__(self, backend, id, status, text=None, annotations=(), usage=None, latency=0.0, raw=None):
+        self.backend = backend
+        self.id = id
+        self.status = status
+        self.text = text
+        self.annotations = list(annotations)
+        self.usage = usage
+        self.latency = latency
+        # The run or response it came from
+        self.raw = raw
+
+    @property
+    def completed(self):
+        return self.status == "completed" and self.text is not None
+
+
+def assistant_config(client, assistant_id, store=None):
+    """The assistant's model and instructions, as 00_bootstrap last applied them.
+
+    Read from the state store, so checking a build cache needs no request;
+    retrieved (and recorded) only when the store has nothing for this assistant.
+    """
+    store = store or get_store()
+    config = store.get("assistant_config") or {}
+    if config.get("id") != assistant_id:
+        assistant = client.beta.assistants.retrieve(assistant_id)
+        config = {"id": assistant.id, "model": assistant.model, "instructions": assistant.instructions}
+        store.set("assistant_config", config)
+    return config
+
+
+def run_pdf_question(client, assistant_id, question, poll_interval=1, on_status=None, model=None,
+                     priority="interactive", scheduler=None):
+    """Ask a question in a new thread and wait for the run.
+
+    model overrides the assistant's model for this run only.
+    Returns (run, assistant_message); the message is None if the run did not complete.
+    """
+    thread = client.beta.threads.create()
+    return run_in_thread(client, assistant_id, thread.id, question, poll_interval, on_status,
+                         priority=priority, scheduler=scheduler, model=model, **run_instructions(QNA_GUIDANCE))
+
+
+def message_text(message):
+    """The first text block of a message (it may also hold images), or None."""
+    if message is None:
+        return None
+    return next((block.text for block in message.content if block.type == "text"), None)
+
+
+def _stream_run(client, assistant_id, thread_id, on_status, on_delta, run_kwargs):
+    """Start a streaming run and follow it to the end; returns (run, completed message)."""
+    run, message = None, None
+    stream = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, stream=True,
+                                             **run_kwargs)
+    for event in stream:
+        data = event.data
+        if event.event == "thread.message.delta":
+            for block in data.delta.content or ():
+                if block.type == "text" and block.text and block.text.value:
+                    on_delta(block.text.value)
+        elif event.event == "thread.message.completed":
+            message = data
+        elif getattr(data, "object", None) == "thread.run":
+            run = data
+            if on_status:
+                on_status(run.status)
+    if run is None:
+        raise RuntimeError(f"Stream for thread {thread_id} ended without a run")
+    return run, message
+
+
+def run_in_thread(client, assistant_id, thread_id, content, poll_interval=1, on_status=None,
+                  priority="interactive", on_delta=None, scheduler=None, **run_kwargs):
+    """Add a user message to a thread, run it to a terminal status and return (run, newest message).
+
+    The run waits for a slot of its priority class in the run scheduler first (the
+    shared SCHEDULER unless another is given).
+    With on_delta the run is streamed instead of polled.
+    """
+    client.beta.threads.messages.create(thread_id=thread_id, role="user", content=content)
+
+    run_kwargs = {k: v for k, v in run_kwargs.items() if v is not None}
+    message = None
+    try:
+        with (scheduler or SCHEDULER).slot(priority):
+            # Scheduler wait is reported separately, not as client overhead
+            start = time.perf_counter()
+            if on_delta is not None:
+                run, message = _stream_run(client, assistant_id, thread_id, on_status, on_delta, run_kwargs)
+            else:
+                run = client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id,
+                                                      **run_kwargs)
+                while run.status not in TERMINAL_STATUSES:
+                    time.sleep(poll_interval)
+                    run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+                    if on_status:
+                        on_status(run.status)
+    except Exception as e:
+        METRICS.observe_exception(assistant_id, e, run_kwargs.get("model"))
+        raise
+    # Wall time stops here, before the optional run steps lookup
+    wall = time.perf_counter() - start
+    METRICS.observe_run(run, wall, count_tool_calls(client, thread_id, run.id) if METRICS.enabled else None)
+
+    if run.status != "completed":
+        return run, None
+
+    if message is None:
+        messages = client.beta.threads.messages.list(thread_id=thread_id, order="desc", limit=1)
+        message = messages.data[0] if messages.data else None
+    return run, message if message is not None and message.role == "assistant" else None
+
+
+class AssistantsBackend:
+    name = "assistants"
+
+    def __init__(self, client, assistant_id, poll_interval=1, priority="interactive", store=None):
+        self.client = client
+        self.assistant_id = assistant_id
+        self.poll_interval = poll_interval
+        self.priority = priority
+        self.store = store
+        self._config = None
+
+    def _ask(self, content, previous_id, on_status, history=(), on_delta=None, **run_kwargs):
+        # Latency runs from the slot grant to the answer, as on ResponsesBackend; the
+        # run inside reuses this slot
+        with SCHEDULER.slot(self.priority):
+            start = time.perf_counter()
+            # A new thread starts from whatever conversation came before it
+            thread_id = previous_id or self.client.beta.threads.create(
+                **({"messages": list(history)} if history else {})).id
+            run, message = run_in_thread(self.client, self.assistant_id, thread_id, content,
+                                         self.poll_interval, on_status, self.priority, on_delta, **run_kwargs)
+            latency = time.perf_counter() - start
+        text = message_text(message)
+        return Answer(self.name, thread_id, run.status,
+                      text=text.value if text else None,
+                      annotations=text.annotations if text else (),
+                      usage=run.usage, latency=latency, raw=run)
+
+    def ask(self, question, previous_id=None, model=None, on_status=None, on_delta=None):
+        return self._ask(question, previous_id, on_status, on_delta=on_delta, model=model,
+                         **run_instructions(QNA_GUIDANCE))
+
+    def ask_json(self, instructions, content, previous_id=None, model=None):
+        return self._ask(content, previous_id, None, model=model,
+                         response_format={"type": "json_object"}, **run_instructions(instructions))
+
+    def ask_turn(self, question, conversation_id=None, history=(), summary=None, budget=None, model=None,
+                 on_status=None):
+        """One conversation turn on the session's thread; the thread already holds the history."""
+        return self._ask(question, conversation_id, on_status, history=() if conversation_id else history,
+                         model=model, **(budget.run_kwargs() if budget else {}),
+                         **run_instructions(QNA_GUIDANCE, summary_instructions(summary)))
+
+    def describe(self):
+        """Settings that determine this backend's output."""
+        if self._config is None:
+            self._config = assistant_config(self.client, self.assistant_id, self.store)
+        return {"backend": self.name, "model": self._config["model"], "instructions": self._config["instructions"]}
+
+
+class ResponsesBackend:
+    name = "responses"
+
+    def __init__(self, client, vector_store_id, model="gpt-4o-mini", instructions=None, max_num_results=None,
+                 priority="interactive"):
+        self.client = client
+        self.model = model
+        self.priority = priority
+        # Stable instructions first, so requests share a cacheable prefix
+        self.instructions = instructions
+        self.file_search = {"type": "file_search", "vector_store_ids": [vector_store_id]}
+        if max_num_results:
+            self.file_search["max_num_results"] = max_num_results
+
+    @classmethod
+    def from_assistant(cls, client, assistant_id, vector_store_id, store=None, **kwargs):
+        """Mirror an assistant's model and instructions, so both backends answer alike."""
+        config = assistant_config(client, assistant_id, store)
+        return cls(client, vector_store_id, model=config["model"], instructions=config["instructions"], **kwargs)
+
+    def _create(self, content, instructions, previous_id, model, on_status=None, on_delta=None, **kwargs):
+        model = model or self.model
+        with SCHEDULER.slot(self.priority):
+            start = time.perf_counter()
+            try:
+                response = self.client.responses.create(
+                    model=model,
+                    instructions=instructions,
+                    input=content,
+                    tools=[self.file_search],
+                    **({"previous_response_id": previous_id} if previous_id else {}),
+                    **({"stream": True} if on_delta is not None else {}),
+                    **kwargs
+                )
+                if on_delta is not None:
+                    response = self._follow(response, on_status, on_delta)
+            except Exception as e:
+                METRICS.observe_exception(self.name, e, model)
+                raise
+            latency = time.perf_counter() - start
+
+        annotations, tool_calls = [], {}
+        for item in response.output:
+            if item.type == "message":
+                for part in item.content:
+                    if part.type == "output_text":
+                        annotations.extend(part.annotations)
+            elif item.type.endswith("_call"):
+                tool = item.type.removesuffix("_call")
+                tool_calls[tool] = tool_calls.get(tool, 0) + 1
+        status = response.status or "completed"
+        # No assistant behind a response, so its metrics are labelled with the backend
+        METRICS.observe_request(self.name, model, status, latency, response.usage, tool_calls)
+        return Answer(self.name, response.id, status,
+                      text=response.output_text if status == "completed" else None,
+                      annotations=annotations, usage=response.usage, latency=latency, raw=response)
+
+    @staticmethod
+    def _follow(stream, on_status, on_delta):
+        """Hand a response stream's text to on_delta; returns the final response."""
+        response = None
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                on_delta(event.delta)
+            elif event.type == "error":
+                raise RuntimeError(f"Response stream failed: {event.message}")
+            elif getattr(event, "response", None) is not None:
+                # created, in_progress, then completed, failed or incomplete
+                response = event.response
+                if on_status:
+                    on_status(response.status)
+        if response is None:
+            raise RuntimeError("Response stream ended without a response")
+        return response
+
+    def _instructions(self, *extra):
+        return "\n\n".join(part for part in (self.instructions, *extra) if part) or None
+
+    def ask(self, question, previous_id=None, model=None, on_status=None, on_delta=None):
+        return self._create(question, self._instructions(QNA_GUIDANCE), previous_id, model,
+                            on_status=on_status, on_delta=on_delta)
+
+    def ask_json(self, instructions, content, previous_id=None, model=None):
+        return self._create(content, self._instructions(instructions), previous_id, model,
+                            text={"format": {"type": "json_object"}})
+
+    def ask_turn(self, question, conversation_id=None, history=(), summary=None, budget=None, model=None,
+                 on_status=None):
+        """One conversation turn; the window of history is sent as input instead of chaining responses."""
+        return self._create([*history, {"role": "user", "content": question}],
+                            self._instructions(QNA_GUIDANCE, summary_instructions(summary)), None, model)
+
+    def describe(self):
+        return {"backend": self.name, "model": self.model, "instructions": self.instructions}
+
+
+def compare_backends(backends, questions, on_answer=None):
+    """Ask every question on every backend; returns rows of per-backend latency and output size."""
+    rows = []
+    for question in questions:
+        row = {"question": question}
+        for backend in backends:
+            answer = backend.ask(question)
+            row[backend.name] = {
+                "status": answer.status,
+                "latency": answer.latency,
+                "chars": len(answer.text or ""),
+                "citations": len(answer.annotations)
+            }
+            if on_answer:
+                on_answer(backend, question, answer)
+        rows.append(row)
+    return rows
@@ -0,0 +1,332 @@
+"""
+Long-running HTTP service for PDF Q&A.
+
+One process keeps a warm OpenAI client (and its connection pool), the
+citation cache, page cache and model router across requests. Questions take
+their slots from the shared run scheduler (see lab_common.run_scheduler), the
+same one notes generation and the RAG sweeps use from their own processes, so
+bulk work fills idle slots but can't crowd out interactive questions. Its
+capacity (LAB_SCHEDULER_CAPACITY) is the service's worker count. Per priority
+class at most workers + queue_depth are admitted at once and anything beyond
+that gets 503 with Retry-After, so a burst backs off at the edge instead of
+piling up threads and timing out.
+
+    python scripts/qna_service.py [--port 8000] [--queue-depth 32]
+
+    POST /ask        {"question": "..."}                  → JSON answer with citations
+    POST /ask        {"question": "...", "stream": true}  → text/event-stream
+                     (or send Accept: text/event-stream)
+                     add "priority": "bulk" for batch jobs; the default is "interactive"
+    GET  /healthz    worker pool load
+    GET  /metrics    run metrics in the Prometheus text format
+
+Streamed answers send `status` events as the run progresses, `delta` events
+with answer text as it is generated, then one `answer` event with the full
+text and citations and a final `done`.
+
+Identical questions (same normalized text, assistant and vector store) that
+arrive while one is already running join its flight instead of starting
+another run: they take no worker slot and all get the same answer, streamed
+to each of them (see singleflight.py).
+"""
+
+import json
+import time
+import argparse
+import importlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lab_common.citations import CitationResolver
+from page_cache import load_page_cache, citation_page_locator
+from model_router import ModelRouter
+from qna_backends import AssistantsBackend
+from lab_common.run_metrics import METRICS
+from singleflight import SingleFlight, flight_key
+from lab_common.run_scheduler import SCHEDULER
+from lab_common.state_store import get_store
+from lab_common.profiling import run_profiled
+
+qna = importlib.import_module("01_qna_assistant")
+
+REQUEST_TIMEOUT = 300
+KEEPALIVE_INTERVAL = 15
+
+
+class Overloaded(Exception):
+    """Every worker is busy and the queue is full."""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Long-running HTTP service for PDF Q&A.")
+    parser.add_argument("--port", type=int, default=8000, help="port on 127.0.0.1 (default: %(default)s)")
+    parser.add_argument("--queue-depth", type=int, default=32,
+                        help="requests per priority class queued beyond the run slots (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.queue_depth < 0:
+        parser.error("--queue-depth can't be negative")
+    return args
+
+
+def warm_client(workers):
+    """A client whose connection pool fits the worker pool, so requests reuse connections."""
+    from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient
+
+    # Built from the SDK's own Limits type, whichever HTTP library it ships with
+    limits = type(DEFAULT_CONNECTION_LIMITS)(max_connections=workers * 2, max_keepalive_connections=workers)
+    return qna.get_client().with_options(http_client=DefaultHttpxClient(limits=limits))
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class QnAService:
+    def __init__(self, client, assistant_id, queue_depth=32, citation_resolver=None, page_cache=None,
+                 router=None, backend=None, vector_store_id=None, scheduler=None):
+        self.client = client
+        self.assistant_id = assistant_id
+        self.vector_store_id = vector_store_id
+        # The scheduler every run of this process goes through, including the backend's
+        self.scheduler = scheduler or SCHEDULER
+        self.workers = self.scheduler.capacity
+        self.capacity = self.workers + queue_depth
+        self.citation_resolver = citation_resolver or CitationResolver(client)
+        self.page_cache = page_cache
+        self.router = router
+        self.backend = backend or AssistantsBackend(client, assistant_id)
+        self._admitted = {priority: 0 for priority in self.scheduler.priorities}
+        self._running = 0
+        self._count_lock = threading.Lock()
+        self.flights = SingleFlight()
+
+    @property
+    def priorities(self):
+        return self.scheduler.priorities
+
+    def submit(self, fn, *args, priority="interactive"):
+        """Queue work on the scheduler, or raise Overloaded when its class is already at capacity."""
+        with self._count_lock:
+            if self._admitted[priority] >= self.capacity:
+                raise Overloaded()
+            self._admitted[priority] += 1
+        future = self.scheduler.submit(priority, self._run, fn, *args)
+        future.add_done_callback(lambda _: self._done(priority))
+        return future
+
+    def _run(self, fn, *args):
+        with self._count_lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._count_lock:
+                self._running -= 1
+
+    def _done(self, priority):
+        with self._count_lock:
+            self._admitted[priority] -= 1
+
+    def health(self):
+        """This service's admitted and queued requests; classes shows the scheduler across processes."""
+        with self._count_lock:
+            in_flight, running = sum(self._admitted.values()), self._running
+        return {"workers": self.workers, "capacity": self.capacity, "in_flight": in_flight,
+                "queued": in_flight - running, "classes": self.scheduler.describe(),
+                "flights": self.flights.in_flight(), "coalesced": self.flights.coalesced}
+
+    def answer(self, question, streaming=False, priority="interactive"):
+        """Join or start the flight for a question; returns it once the leader's work is queued.
+
+        The flight's result is the answer body and its events end with an
+        `answer` event, whether it was started as a streaming request or not.
+        Priorities get separate flights, so an interactive question never
+        waits on a queued bulk one.
+        """
+        key = flight_key(question, self.assistant_id, self.vector_store_id)
+        flight, leader = self.flights.join(f"{priority}:{key}")
+        if leader:
+            try:
+                self.submit(self._lead, flight, question, streaming, priority=priority)
+            except Overloaded as e:
+                flight.emit("error", {"error": "overloaded, retry shortly"})
+                self.flights.finish(flight, error=e)
+                raise
+        return flight
+
+    def _lead(self, flight, question, streaming):
+        try:
+            if streaming:
+                result = self.stream(question, flight.emit)
+            else:
+                result = self.ask(question)
+                flight.emit("answer", result)
+        except Exception as e:
+            flight.emit("error", {"error": f"{type(e).__name__}: {e}"})
+            self.flights.finish(flight, error=e)
+        else:
+            self.flights.finish(flight, result)
+
+    def citations(self, text, annotations):
+        page_locator = citation_page_locator(self.page_cache, text)
+        return self.citation_resolver.render(annotations, page_locator=page_locator)
+
+    def _body(self, answer):
+        return {
+            "id": answer.id,
+            "backend": answer.backend,
+            "status": answer.status,
+            "answer": answer.text,
+            "citations": self.citations(answer.text, answer.annotations) if answer.completed else [],
+            "latency": round(answer.latency, 3)
+        }
+
+    def ask(self, question):
+        """Answer a question through ask_pdf_question; returns the JSON response body."""
+        return self._body(qna.ask_pdf_question(self.client, self.assistant_id, question, self.citation_resolver,
+                                               self.page_cache, self.router, self.backend))
+
+    def stream(self, question, emit):
+        """Answer as ask() does, streamed: calls emit(event, data) as the answer arrives.
+
+        Returns the body of the final `answer` event.
+        """
+        answer = qna.ask_pdf_question(self.client, self.assistant_id, question, self.citation_resolver,
+                                      self.page_cache, self.router, self.backend,
+                                      on_status=lambda status: emit("status", {"status": status}),
+                                      on_delta=lambda text: emit("delta", {"text": text}))
+        result = self._body(answer)
+        emit("answer", result)
+        return result
+
+    def shutdown(self):
+        self.scheduler.shutdown()
+
+
+def make_handler(service, request_timeout=REQUEST_TIMEOUT, keepalive=KEEPALIVE_INTERVAL):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send_json(200, service.health())
+            elif self.path == "/metrics":
+                payload = METRICS.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/ask":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                question = request["question"].strip()
+                if not question:
+                    raise ValueError("empty question")
+                priority = request.get("priority", "interactive")
+                if priority not in service.priorities:
+                    raise ValueError(f"priority must be one of {', '.join(service.priorities)}")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self._send_json(400, {"error": f"invalid request: {e}"})
+                return
+
+            streaming = request.get("stream") or "text/event-stream" in self.headers.get("Accept", "")
+            try:
+                if streaming:
+                    self._stream(question, priority)
+                else:
+                    self._answer(question, priority)
+            except Overloaded:
+                self._send_json(503, {"error": "overloaded, retry shortly", **service.health()},
+                                headers={"Retry-After": "1"})
+
+        def _answer(self, question, priority):
+            flight = service.answer(question, priority=priority)
+            try:
+                self._send_json(200, flight.wait(timeout=request_timeout))
+            except Overloaded:
+                raise
+            except TimeoutError:
+                self._send_json(504, {"error": f"no answer within {request_timeout}s"})
+            except Exception as e:
+                self._send_json(502, {"error": f"{type(e).__name__}: {e}"})
+
+        def _stream(self, question, priority):
+            flight = service.answer(question, streaming=True, priority=priority)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            deadline = time.monotonic() + request_timeout
+            try:
+                for item in flight.subscribe(timeout=keepalive):
+                    if time.monotonic() > deadline:
+                        self.wfile.write(sse_event("error", {"error": f"no answer within {request_timeout}s"}))
+                        break
+                    # Comment lines keep proxies from closing an idle stream
+                    self.wfile.write(b": keepalive\n\n" if item is None else sse_event(*item))
+                    self.wfile.flush()
+                else:
+                    self.wfile.write(sse_event("done", {}))
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away; the leader finishes the run for everyone else
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(service, port=8000, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    args = parse_args()
+    port, queue_depth = args.port, args.queue_depth
+
+    print("🛰️  PDF Q&A service")
+    print("=" * 40)
+    assistant_id = qna.load_assistant_id()
+
+    service = QnAService(warm_client(SCHEDULER.capacity), assistant_id, queue_depth=queue_depth,
+                         page_cache=load_page_cache(), router=ModelRouter(),
+                         vector_store_id=get_store().get("vector_store_id"))
+    server = serve(service, port)
+    print(f"✅ Listening on http://127.0.0.1:{port} ({service.workers} shared run slots, queue depth {queue_depth})")
+    print(f"   curl -N -d '{{\"question\": \"What does HRV measure?\", \"stream\": true}}' "
+          f"http://127.0.0.1:{port}/ask")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Shutting down, waiting for in-flight questions...")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    run_profiled("qna_service", main)
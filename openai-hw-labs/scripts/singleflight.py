@@ -0,0 +1,116 @@
+"""
+In-flight coalescing of identical requests ("singleflight").
+
+The first caller for a key becomes the leader and does the work; callers
+that arrive with the same key while it is running join the same flight and
+get its result instead of starting their own run. Events the leader emits
+along the way (streamed answer text) are buffered on the flight, so a
+follower that joins late replays what it missed and then follows live.
+
+A flight is forgotten as soon as it finishes. This is not a cache: it only
+removes duplicate work during a burst, and the next identical request after
+that starts a fresh run.
+"""
+
+import re
+import json
+import hashlib
+import threading
+
+
+def normalize_question(question):
+    """Case, whitespace and trailing punctuation don't change what is asked."""
+    return re.sub(r"\s+", " ", question.casefold()).strip().rstrip("?!. ")
+
+
+def flight_key(question, assistant_id, vector_store_id=None):
+    payload = json.dumps([normalize_question(question), assistant_id, vector_store_id])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Flight:
+    def __init__(self, key):
+        self.key = key
+        self.events = []
+        self.waiters = 1
+        self.done = False
+        self.result = None
+        self.error = None
+        self._condition = threading.Condition()
+
+    def emit(self, event, data):
+        with self._condition:
+            self.events.append((event, data))
+            self._condition.notify_all()
+
+    def _finish(self, result, error):
+        with self._condition:
+            self.result, self.error, self.done = result, error, True
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """The leader's result; re-raises its error, TimeoutError if it isn't done in time."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.done, timeout):
+                raise TimeoutError(f"flight still running after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def subscribe(self, timeout=None):
+        """Yield every (event, data) from the start; yields None after timeout seconds without one."""
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.done:
+                    self._condition.wait(timeout)
+                batch = self.events[index:]
+                index += len(batch)
+                finished = self.done
+            if not batch and not finished:
+                yield None
+            yield from batch
+            if finished:
+                return
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        # Requests served by joining another request's flight
+        self.coalesced = 0
+
+    def join(self, key):
+        """Returns (flight, leader); only the leader runs the work and must call finish()."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+            return flight, True
+
+    def finish(self, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight._finish(result, error)
+
+    def do(self, key, fn):
+        """Run fn() once for every concurrent caller with the same key; returns (result, shared)."""
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.wait(), True
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(flight, error=e)
+            raise
+        self.finish(flight, result)
+        return result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
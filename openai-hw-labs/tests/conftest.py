@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Scripts are run as `python scripts/<name>.py`, so their helpers import as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+# Helpers shared with the practice lab; requirements.txt installs them, this lets the tests run without that
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "lab_common"))
+# Runs made by the tests take slots from a private ledger, not the one real lab processes share
+os.environ["LAB_SCHEDULER_FILE"] = str(Path(tempfile.mkdtemp()) / "run_slots.json")
+# Test helpers (e.g. record_replay) live next to the tests
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--record",
+        action="store_true",
+        default=False,
+        help="Call the live OpenAI API and re-record the HTTP cassettes under tests/cassettes/"
+    )
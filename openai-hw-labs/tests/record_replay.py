@@ -0,0 +1,114 @@
+"""
+Record/replay HTTP transport for the OpenAI client.
+
+In record mode every request goes to the real API and the interaction is
+stored in a gzip-compressed JSON cassette. In replay mode responses are
+served from the cassette with no network access. Requests are matched on
+method, path and normalized JSON body; repeated identical requests (e.g. run
+polling) are answered in the order they were recorded.
+
+Record with `pytest --record` (needs OPENAI_API_KEY and a bootstrapped
+assistant) and commit the cassettes under tests/cassettes/ so the citation
+tests replay offline. Only commit cassettes recorded against the real API;
+without one the citation tests skip.
+"""
+
+import base64
+import gzip
+import json
+from collections import defaultdict, deque
+from pathlib import Path
+
+try:
+    # openai 3.x ships its HTTP stack as httpx2; the transport must subclass the same one
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+# Hop-by-hop / encoding headers that no longer apply to the stored, decoded body
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class CassetteMiss(Exception):
+    """Replay mode received a request that is not in the cassette."""
+
+
+def normalize_body(content):
+    """Canonical form of a request body so key order and whitespace don't matter."""
+    if not content:
+        return ""
+    try:
+        return json.dumps(json.loads(content), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return base64.b64encode(content).decode()
+
+
+def request_key(request):
+    return f"{request.method} {request.url.raw_path.decode()} {normalize_body(request.content)}"
+
+
+class RecordReplayTransport(httpx.BaseTransport):
+    def __init__(self, cassette_path, record=False, metadata=None):
+        self.cassette_path = Path(cassette_path)
+        self.record = record
+        self.metadata = dict(metadata or {})
+        self.interactions = []
+        self._queues = defaultdict(deque)
+
+        if record:
+            self._upstream = httpx.HTTPTransport()
+        else:
+            cassette = load_cassette(self.cassette_path)
+            self.metadata = cassette["metadata"]
+            for interaction in cassette["interactions"]:
+                self._queues[interaction["key"]].append(interaction)
+
+    def handle_request(self, request):
+        key = request_key(request)
+        if self.record:
+            response = self._upstream.handle_request(request)
+            try:
+                content = response.read()
+            finally:
+                # Return the pooled connection now rather than when the response is collected
+                response.close()
+            headers = [(k, v) for k, v in response.headers.items()
+                       if k.lower() not in DROPPED_HEADERS]
+            self.interactions.append({
+                "key": key,
+                "status": response.status_code,
+                "headers": headers,
+                "content": base64.b64encode(content).decode()
+            })
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=headers,
+                content=content,
+                request=request
+            )
+
+        if not self._queues[key]:
+            raise CassetteMiss(f"No recorded response for: {key[:200]}")
+        interaction = self._queues[key].popleft()
+        return httpx.Response(
+            status_code=interaction["status"],
+            headers=interaction["headers"],
+            content=base64.b64decode(interaction["content"]),
+            request=request
+        )
+
+    def close(self):
+        if self.record:
+            save_cassette(self.cassette_path, self.metadata, self.interactions)
+            self._upstream.close()
+
+
+def load_cassette(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cassette(path, metadata, interactions):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "interactions": interactions}, f)
@@ -0,0 +1,87 @@
+import json
+import importlib
+from pathlib import Path
+
+import pytest
+
+from build_cache import BuildCache
+from lab_common.state_store import StateStore
+
+
+def test_skips_unchanged_inputs_and_rolls_back(tmp_path):
+    cache = BuildCache(tmp_path / "builds")
+    target = tmp_path / "exam_notes.json"
+    v1_inputs = {"document": "a" * 64, "prompt": "p", "model": "gpt-4o-mini", "schema": {}}
+    v2_inputs = dict(v1_inputs, model="gpt-4o")
+    v1, v2 = cache.key(v1_inputs), cache.key(v2_inputs)
+
+    assert not cache.is_current(target, v1)
+    cache.store(target, v1, {"notes": [1]}, v1_inputs)
+    assert cache.is_current(target, v1)
+    assert cache.key(dict(v1_inputs)) == v1
+
+    cache.store(target, v2, {"notes": [2]}, v2_inputs)
+    assert not cache.is_current(target, v1)
+    assert json.loads(target.read_text()) == {"notes": [2]}
+
+    assert cache.rollback(target) == v1
+    assert json.loads(target.read_text()) == {"notes": [1]}
+    assert cache.is_current(target, v1)
+    with pytest.raises(KeyError):
+        cache.rollback(target)
+
+    # A previously built key is restored without regenerating
+    assert cache.lookup(target, v2) == {"notes": [2]}
+
+
+def test_keeps_a_bounded_number_of_versions(tmp_path):
+    cache = BuildCache(tmp_path / "builds", keep=2)
+    target = tmp_path / "exam_notes.json"
+    keys = [cache.store(target, cache.key({"n": n}), {"n": n}) for n in range(3)]
+
+    assert [v["key"] for v in cache.manifest(target)["versions"]] == keys[1:]
+    assert cache.lookup(target, keys[0]) is None
+
+
+def test_rollback_stays_pinned_until_the_next_build(tmp_path):
+    cache = BuildCache(tmp_path / "builds")
+    target = tmp_path / "exam_notes.json"
+    v1, v2 = (cache.store(target, cache.key({"n": n}), {"n": n}) for n in (1, 2))
+    assert cache.pinned(target) is None
+
+    assert cache.rollback(target) == v1
+    assert cache.pinned(target) == v1
+    # Re-reading the manifest (a later run) still sees the pin
+    assert BuildCache(tmp_path / "builds").pinned(target) == v1
+
+    cache.store(target, v2, {"n": 2})
+    assert cache.pinned(target) is None
+
+
+def test_same_named_targets_in_different_directories_are_separate(tmp_path):
+    cache = BuildCache(tmp_path / "builds")
+    first, second = tmp_path / "a" / "exam_notes.json", tmp_path / "b" / "exam_notes.json"
+    key = cache.store(first, cache.key({"n": 1}), {"n": 1})
+
+    assert not cache.is_current(second, key)
+    assert cache.manifest(second)["versions"] == []
+    assert cache.lookup(second, key) is None
+
+
+def test_notes_key_changes_with_the_provisioned_knowledge(tmp_path):
+    generate_notes = importlib.import_module("02_generate_notes")
+
+    class Backend:
+        def describe(self):
+            return {"backend": "assistants", "model": "gpt-4o-mini", "instructions": "Cite sources."}
+
+    def key(vector_store_id, file_id):
+        store = StateStore(tmp_path / f"{vector_store_id}-{file_id}.json")
+        store.update({"vector_store_id": vector_store_id,
+                      "provision": {"files": {"../data/Cognitive_science.pdf": {"digest": "d", "file_id": file_id}}}})
+        inputs = generate_notes.build_inputs(Backend(), "prompt", pdf_path=__file__, store=store)
+        return BuildCache.key(inputs)
+
+    assert key("vs_1", "file_1") == key("vs_1", "file_1")
+    assert len({key("vs_1", "file_1"), key("vs_2", "file_1"), key("vs_1", "file_2")}) == 3
+    assert generate_notes.NOTES_FILE.parent == Path(generate_notes.__file__).resolve().parent.parent
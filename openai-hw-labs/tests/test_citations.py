@@ -0,0 +1,73 @@
+import multiprocessing
+from types import SimpleNamespace
+
+from lab_common.citations import CitationResolver
+
+
+class FakeFiles:
+    def __init__(self):
+        self.calls = []
+
+    def retrieve(self, file_id):
+        self.calls.append(file_id)
+        return SimpleNamespace(filename=f"{file_id}.pdf", bytes=100)
+
+
+def citation(file_id):
+    return SimpleNamespace(text="【4:0†source】", file_citation=SimpleNamespace(file_id=file_id))
+
+
+def test_warm_cache_renders_without_api_calls(tmp_path):
+    cache_path = tmp_path / "file_metadata"
+    annotations = [citation("file_a"), citation("file_b"), citation("file_a")]
+
+    files = FakeFiles()
+    resolver = CitationResolver(SimpleNamespace(files=files), cache_path=cache_path)
+    assert resolver.render(annotations) == ["[1] file_a.pdf", "[2] file_b.pdf", "[3] file_a.pdf"]
+    assert sorted(files.calls) == ["file_a", "file_b"]
+
+    # A fresh resolver (new process) is served from the on-disk cache
+    files = FakeFiles()
+    resolver = CitationResolver(SimpleNamespace(files=files), cache_path=cache_path)
+    lines = resolver.render(annotations, page_locator=lambda name, ann: 7)
+    assert lines[0] == "[1] file_a.pdf, p. 7"
+    assert files.calls == []
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    resolver = CitationResolver(SimpleNamespace(files=FakeFiles()), cache_path=tmp_path / "file_metadata",
+                                max_entries=2)
+    resolver.prefetch(["file_a", "file_b"])
+    # A hit on file_a makes file_b the least recently used entry
+    assert resolver.filename("file_a") == "file_a.pdf"
+    resolver.prefetch(["file_c"])
+    assert list(resolver._lru) == ["file_a", "file_c"]
+
+
+def test_default_cache_is_anchored_to_the_project(tmp_path, monkeypatch):
+    monkeypatch.setenv("LAB_PROJECT_DIR", str(tmp_path / "lab"))
+    monkeypatch.chdir(tmp_path)
+    resolver = CitationResolver(SimpleNamespace(files=FakeFiles()))
+    assert resolver.cache_path == tmp_path / "lab" / ".cache" / "file_metadata"
+
+
+def _resolve_range(cache_path, start):
+    resolver = CitationResolver(SimpleNamespace(files=FakeFiles()), cache_path=cache_path)
+    for i in range(start, start + 10):
+        resolver.filename(f"file_{i}")
+
+
+def test_processes_share_the_disk_cache(tmp_path):
+    cache_path = tmp_path / "file_metadata"
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_resolve_range, args=(cache_path, start)) for start in range(0, 40, 10)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+
+    files = FakeFiles()
+    resolver = CitationResolver(SimpleNamespace(files=files), cache_path=cache_path)
+    resolver.prefetch([f"file_{i}" for i in range(40)])
+    assert files.calls == []
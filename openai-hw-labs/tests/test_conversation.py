@@ -0,0 +1,128 @@
+import importlib
+from types import SimpleNamespace
+
+from lab_common.conversation import ContextBudget, ConversationSession
+from lab_common.run_metrics import METRICS
+from lab_common.state_store import StateStore
+from qna_backends import AssistantsBackend, ResponsesBackend
+
+
+def text_message(id, role, value):
+    block = SimpleNamespace(type="text", text=SimpleNamespace(value=value, annotations=[]))
+    return SimpleNamespace(id=id, role=role, content=[block])
+
+
+class FakeThreadClient:
+    """Threads whose prompt size grows with the messages a run is allowed to see."""
+
+    def __init__(self):
+        self.messages = []
+        self.runs = []
+        self.summaries = []
+        self.threads_created = []
+        messages = SimpleNamespace(create=self._add_user, list=self._list)
+        runs = SimpleNamespace(create=self._run)
+        threads = SimpleNamespace(create=self._create_thread, messages=messages, runs=runs)
+        self.beta = SimpleNamespace(threads=threads)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._summarize))
+
+    def _create_thread(self, messages=()):
+        self.threads_created.append(list(messages))
+        self.messages = [text_message(f"msg_{i}", m["role"], m["content"]) for i, m in enumerate(messages)]
+        return SimpleNamespace(id=f"thread_{len(self.threads_created)}")
+
+    def _add_user(self, thread_id, role, content):
+        self.messages.append(text_message(f"msg_{len(self.messages)}", role, content))
+
+    def _list(self, thread_id, order="asc", limit=None):
+        messages = list(self.messages if order == "asc" else reversed(self.messages))
+        return SimpleNamespace(data=messages[:limit])
+
+    def _run(self, thread_id, assistant_id, **kwargs):
+        self.runs.append(kwargs)
+        window = kwargs["truncation_strategy"]["last_messages"]
+        prompt_tokens = 100 * len(self.messages[-window:])
+        self.messages.append(text_message(f"msg_{len(self.messages)}", "assistant", "answer"))
+        return SimpleNamespace(id=f"run_{len(self.runs)}", status="completed", assistant_id=assistant_id,
+                               usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=10))
+
+    def _summarize(self, model, messages):
+        self.summaries.append(messages[-1]["content"])
+        content = f"summary {len(self.summaries)}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=SimpleNamespace(prompt_tokens=50, completion_tokens=20))
+
+
+def test_prompt_stays_bounded_and_old_turns_are_summarized(tmp_path):
+    client = FakeThreadClient()
+    store = StateStore(path=tmp_path / "state.json")
+    backend = AssistantsBackend(client, "asst_1", poll_interval=0)
+    session = ConversationSession(backend, budget=ContextBudget(last_messages=4), store=store)
+    runs_before = METRICS.runs.value(assistant="asst_1", model="unknown", status="completed")
+    summaries_before = METRICS.runs.value(assistant="conversation_summary", model="gpt-4o-mini", status="completed")
+
+    for turn in range(6):
+        answer = session.ask(f"question {turn}")
+        assert answer.completed and answer.text == "answer"
+
+    # Prompt size plateaus once the truncation window is full
+    assert session.budget.prompt_tokens == [100, 300, 400, 400, 400, 400]
+    assert session.budget.trend() < 100
+    # Each message is summarized once, and the summary rides along on later runs
+    assert sum(s.count("USER: question") for s in client.summaries) == 4
+    assert client.runs[-1]["additional_instructions"].endswith("summary 3")
+    assert client.runs[-1]["max_prompt_tokens"] == 6000
+    # Turns and summaries go through the backend's metered path
+    assert METRICS.runs.value(assistant="asst_1", model="unknown", status="completed") - runs_before == 6
+    assert METRICS.runs.value(assistant="conversation_summary", model="gpt-4o-mini",
+                              status="completed") - summaries_before == 4
+
+    resumed = ConversationSession(backend, store=store)
+    assert (resumed.conversation_id, resumed.summary) == ("thread_1", "summary 4")
+    assert len(client.threads_created) == 1
+
+
+def test_session_carries_its_window_across_backends(tmp_path):
+    client = FakeThreadClient()
+    store = StateStore(path=tmp_path / "state.json")
+    budget = ContextBudget(last_messages=4)
+    assistants = ConversationSession(AssistantsBackend(client, "asst_1", poll_interval=0), budget=budget,
+                                     store=store)
+    for turn in range(3):
+        assistants.ask(f"question {turn}")
+
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return SimpleNamespace(id=f"resp_{len(requests)}", status="completed", output=[], output_text="answer",
+                               usage=SimpleNamespace(input_tokens=120, output_tokens=10))
+
+    client.responses = SimpleNamespace(create=create)
+    responses = ConversationSession(ResponsesBackend(client, "vs_1", instructions="You are a tutor."),
+                                    budget=ContextBudget(last_messages=4), store=store)
+    # A thread id means nothing to the Responses API, but the window and summary carry over
+    assert responses.conversation_id is None
+    responses.ask("question 3")
+
+    request = requests[0]
+    assert "previous_response_id" not in request
+    assert [m["content"] for m in request["input"]] == ["question 1", "answer", "question 2", "answer",
+                                                        "question 3"]
+    assert request["instructions"].endswith("summary 1")
+    assert responses.budget.prompt_tokens[-1] == 120
+
+    # Back on Assistants, a fresh thread is seeded with the window
+    back = ConversationSession(AssistantsBackend(client, "asst_1", poll_interval=0),
+                               budget=ContextBudget(last_messages=4), store=store)
+    back.ask("question 4")
+    assert [m["content"] for m in client.threads_created[-1]] == ["question 2", "answer", "question 3", "answer"]
+
+
+def test_chat_flags_are_parsed_with_the_backend():
+    qna = importlib.import_module("01_qna_assistant")
+
+    args = qna.parse_args(["--chat", "--backend", "responses"])
+    assert (args.chat, args.backend, args.compare) == ("default", "responses", False)
+    assert qna.parse_args(["--chat", "exam"]).chat == "exam"
+    assert qna.parse_args(["--compare"]).chat is None
@@ -0,0 +1,73 @@
+import importlib
+
+import pytest
+
+load_test = importlib.import_module("03_load_test")
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    histogram = load_test.LatencyHistogram(buckets=[1, 2, 5])
+    assert histogram.percentile(0.5) is None
+
+    for seconds in (0.2, 0.9, 1.0, 1.5, 4, 30):
+        histogram.record(seconds)
+    assert histogram.to_dict() == {"<=1s": 3, "<=2s": 1, "<=5s": 1, ">5s": 1}
+    assert [histogram.percentile(q) for q in (0.5, 0.8, 0.99)] == [1, 5, float("inf")]
+
+
+def test_windows_roll_while_overall_accumulates():
+    stats = load_test.LoadStats()
+    for _ in range(4):
+        stats.sent()
+    stats.finished(0.4)
+    stats.finished(0.6)
+    stats.finished(9.0, error="RateLimitError")
+
+    row = stats.roll(elapsed=5, interval=5, in_flight=1)
+    assert (row["offered_rps"], row["throughput_rps"], row["in_flight"]) == (0.8, 0.4, 1)
+    assert row["error_rate"] == 1 / 3
+    assert row["error_types"] == {"RateLimitError": 1}
+
+    stats.finished(2.0, error="failed")
+    stats.finished(3.0, error="RateLimitError")
+    row = stats.roll(elapsed=10, interval=5, in_flight=0)
+    assert (row["offered_rps"], row["throughput_rps"], row["error_rate"]) == (0.0, 0.0, 1.0)
+    assert row["error_types"] == {"failed": 1, "RateLimitError": 1}
+
+    overall = stats.overall
+    assert (overall["sent"], overall["completed"], overall["errors"]) == (4, 2, 3)
+    assert overall["error_types"] == {"RateLimitError": 2, "failed": 1}
+    assert [row["t"] for row in stats.timeline] == [5, 10]
+
+
+def test_ask_once_categorizes_errors(monkeypatch):
+    stats = load_test.LoadStats()
+    in_flight = {"count": 4, "lock": load_test.threading.Lock()}
+    outcomes = iter([ValueError("boom"), ("failed", object()), ("completed", None), ("completed", object())])
+
+    def fake_run(client, assistant_id, question, scheduler=None):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return type("Run", (), {"status": outcome[0]}), outcome[1]
+
+    monkeypatch.setattr(load_test, "run_pdf_question", fake_run)
+    for _ in range(4):
+        load_test.ask_once(None, "asst_1", "q", load_test.time.perf_counter(), stats, in_flight)
+
+    assert stats.overall["error_types"] == {"ValueError": 1, "failed": 1, "no_answer": 1}
+    assert stats.overall["completed"] == 1
+    assert in_flight["count"] == 0
+
+
+def test_arguments_are_validated():
+    args = load_test.parse_args(["--rate", "2.5", "--seed", "7"])
+    assert (args.rate, args.duration, args.seed) == (2.5, 60.0, 7)
+    with pytest.raises(SystemExit):
+        load_test.parse_args(["--rate", "0"])
+    with pytest.raises(SystemExit):
+        load_test.parse_args(["--duration", "soon"])
+    assert load_test.parse_args([]).capacity is None
+    assert load_test.parse_args(["--capacity", "64"]).capacity == 64
+    with pytest.raises(SystemExit):
+        load_test.parse_args(["--capacity", "0"])
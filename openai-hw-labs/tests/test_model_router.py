@@ -0,0 +1,51 @@
+import json
+import time
+
+from model_router import MODEL_TIERS, ModelRouter, summarize_log
+
+SIMPLE = "What is HRV?"
+COMPLEX = ("Compare the proposed multimodal model with single-modality approaches and explain why "
+           "integration improves accuracy. What are the ethical trade-offs?")
+
+
+def test_routes_by_question_complexity(tmp_path):
+    router = ModelRouter(log_path=None)
+
+    assert router.route(SIMPLE)["tier"] == "fast"
+    assert router.route("How do cortisol levels correlate with anxiety in the UK Biobank study?")["tier"] == "standard"
+    assert router.route(COMPLEX)["model"] == "gpt-4o"
+    # Each tier runs a different model, so routing changes what answers
+    assert len({tier["model"] for tier in MODEL_TIERS}) == len(MODEL_TIERS)
+
+
+def test_tier_over_slo_sheds_to_faster_tier_with_probes(tmp_path):
+    log_path = tmp_path / "routing.jsonl"
+    router = ModelRouter(slo_p95=10.0, min_samples=5, probe_every=4, log_path=log_path)
+
+    for _ in range(5):
+        decision = router.route(COMPLEX)
+        router.record(decision, latency=30.0, status="completed", citations=2, answer_chars=900)
+
+    tiers = [router.route(COMPLEX)["tier"] for _ in range(8)]
+    # Mostly downgraded, but every 4th breach still probes the slow tier
+    assert tiers.count("deep") == 2
+    assert set(tiers) == {"deep", "standard"}
+
+    summary = summarize_log(log_path)
+    assert summary["deep"]["questions"] == 5
+    assert summary["deep"]["p95"] == 30.0
+    assert summary["deep"]["cited_rate"] == 1.0
+
+
+def test_a_new_router_sheds_on_recent_logged_latencies(tmp_path):
+    log_path = tmp_path / "routing.jsonl"
+    now = time.time()
+    entries = [{"tier": "deep", "latency": 30.0, "at": now - 60}] * 5
+    # Too old to count, and a line from an interrupted write
+    entries += [{"tier": "standard", "latency": 30.0, "at": now - 7200}] * 5
+    log_path.write_text("".join(json.dumps(e) + "\n" for e in entries) + '{"tier": "dee')
+
+    router = ModelRouter(slo_p95=10.0, min_samples=5, log_path=log_path)
+
+    assert router.tier_p95("deep") == 30.0 and router.tier_p95("standard") is None
+    assert router.route(COMPLEX)["tier"] == "standard"
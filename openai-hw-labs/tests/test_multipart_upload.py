@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from lab_common.multipart_upload import upload_file_multipart
+
+
+class FakeUploads:
+    def __init__(self, fail_on_part=None):
+        self.fail_on_part = fail_on_part
+        self.created = 0
+        self.sent = []
+        self.completed_with = None
+        self.parts = SimpleNamespace(create=self._create_part)
+
+    def create(self, **kwargs):
+        self.created += 1
+        return SimpleNamespace(id=f"upload_{self.created}", expires_at=int(time.time()) + 3600)
+
+    def _create_part(self, upload_id, data):
+        index = len(self.sent)
+        if self.fail_on_part is not None and index == self.fail_on_part:
+            raise ConnectionError("connection dropped")
+        self.sent.append(bytes(data))
+        return SimpleNamespace(id=f"part_{data[:1].decode()}")
+
+    def complete(self, upload_id, part_ids, md5):
+        self.completed_with = list(part_ids)
+        return SimpleNamespace(file=SimpleNamespace(id="file_123"))
+
+
+def test_interrupted_upload_resumes_without_resending(tmp_path):
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"a" * 4 + b"b" * 4 + b"c" * 4)
+    checkpoints = tmp_path / "checkpoints"
+
+    uploads = FakeUploads(fail_on_part=2)
+    client = SimpleNamespace(uploads=uploads)
+    with pytest.raises(ConnectionError):
+        upload_file_multipart(client, source, part_size=4, max_workers=1,
+                              checkpoint_dir=checkpoints)
+    assert len(uploads.sent) == 2
+
+    uploads.fail_on_part = None
+    result = upload_file_multipart(client, source, part_size=4, max_workers=1,
+                                   checkpoint_dir=checkpoints)
+
+    assert result.id == "file_123"
+    assert uploads.created == 1
+    assert len(uploads.sent) == 3
+    assert uploads.completed_with == ["part_a", "part_b", "part_c"]
+    assert not any(checkpoints.iterdir())
+
+
+def test_checkpoints_sit_next_to_the_state_file(tmp_path, monkeypatch):
+    from lab_common import multipart_upload
+    from lab_common.state_store import StateStore
+
+    monkeypatch.setattr(multipart_upload, "get_store", lambda: StateStore(path=tmp_path / "lab" / ".state.json"))
+    monkeypatch.chdir(tmp_path)
+
+    assert multipart_upload.default_checkpoint_dir() == tmp_path / "lab" / ".uploads"
@@ -0,0 +1,85 @@
+import random
+
+from note_dedup import colliding_slots, find_near_duplicates
+import note_dedup
+
+# Headings and summaries from a generated exam_notes.json, kept here so the
+# test doesn't change when the notes are regenerated
+SAVED_NOTES = [
+    ("Introduction to Mental State Detection",
+     "Explores the use of physiological and behavioral indicators to assess mental health objectively."),
+    ("Importance of Understanding Mental States",
+     "Highlights the necessity for real-time measures of mental health, linking cortisol levels to stress disorders."),
+    ("Research Gaps",
+     "Identifies the lack of integrated models combining various physiological and behavioral indicators."),
+    ("Multimodal Integration",
+     "Discusses the improved accuracy in mental state detection through the integration of multiple biomarkers."),
+    ("Proposed Methodology",
+     "Outlines a model that combines data from facial expressions, voice recordings, and physiological indicators."),
+    ("Challenges in Data Collection",
+     "Addresses the difficulties in accessing diverse datasets and the ethical implications of sensitive data."),
+    ("False Negatives in Model Accuracy",
+     "Discusses the risks of misclassifying mental states, potentially leading to delayed interventions."),
+    ("Ethical and Privacy Concerns",
+     "Examines privacy issues surrounding the use of sensitive data in mental health assessments."),
+    ("Model Architecture Overview",
+     "Describes the proposed deep learning architecture for processing multimodal data for mental state prediction."),
+    ("Practical Applications",
+     "Explores applications of the model in healthcare, mental health assessments, and workplace wellness."),
+]
+
+
+def test_flags_the_overlap_in_the_saved_notes():
+    notes = [{"heading": heading, "summary": summary} for heading, summary in SAVED_NOTES]
+    # "Introduction to Mental State Detection" and "Importance of Understanding Mental States"
+    assert [(i, j) for i, j, _ in find_near_duplicates(notes)] == [(0, 1)]
+    assert colliding_slots(notes) == [1]
+
+    # A later slot that came back as a rewording of "Multimodal Integration"
+    notes.append({"heading": "Integration of Multimodal Data",
+                  "summary": "Integrating multiple biomarkers improves the accuracy of mental state detection."})
+    assert [(i, j) for i, j, _ in find_near_duplicates(notes)] == [(0, 1), (3, 10)]
+    assert colliding_slots(notes) == [1, 10]
+
+
+def test_only_later_note_of_each_cluster_is_regenerated():
+    notes = [
+        {"heading": "Cortisol and Anxiety", "summary": "Cortisol levels correlate with anxiety in the UK Biobank."},
+        {"heading": "Heart Rate Variability", "summary": "HRV reflects autonomic balance under stress."},
+        {"heading": "Cortisol Levels and Anxiety", "summary": "Links between cortisol and anxiety disorders."},
+        {"heading": "Anxiety and Cortisol", "summary": "UK Biobank cortisol levels correlate with anxiety."},
+    ]
+
+    assert colliding_slots(notes) == [2, 3]
+
+
+def test_colliding_slots_do_not_depend_on_pair_order(monkeypatch):
+    # 0~1, 1~2 and 0~2: keeping 0 replaces 1 and 2, whatever order the pairs come in
+    pairs = [(1, 2, 0.5), (0, 2, 0.4), (0, 1, 0.6)]
+    monkeypatch.setattr(note_dedup, "find_near_duplicates", lambda notes, threshold: pairs)
+    assert colliding_slots([]) == [1, 2]
+
+    # A chain 0~1, 1~2: 1 is replaced, so 2 only collided with a note that is going away
+    pairs[:] = [(1, 2, 0.5), (0, 1, 0.6)]
+    assert colliding_slots([]) == [1]
+
+
+def test_batched_signatures_match_one_at_a_time(monkeypatch):
+    monkeypatch.setattr(note_dedup, "BATCH_SIZE", 3)
+    index = note_dedup.MinHashIndex()
+    sets = [note_dedup.shingles(summary) for _, summary in SAVED_NOTES] + [set()]
+
+    batched = index.signatures(sets)
+    assert all((batched[k] == index.signature(shingles)).all() for k, shingles in enumerate(sets))
+    assert (batched[-1] == note_dedup.PRIME).all()
+
+
+def test_distinct_notes_at_scale_have_no_duplicates():
+    rng = random.Random(0)
+    vocab = [f"term{i}" for i in range(5000)]
+    # Six-word headings: headings match on shared words, and four random words share two by chance
+    notes = [{"heading": " ".join(rng.choices(vocab, k=6)), "summary": " ".join(rng.choices(vocab, k=15))}
+             for _ in range(1000)]
+    notes.append(dict(notes[10]))
+
+    assert [(i, j) for i, j, _ in find_near_duplicates(notes)] == [(10, 1000)]
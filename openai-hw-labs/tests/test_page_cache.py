@@ -0,0 +1,75 @@
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+import page_cache
+from page_cache import PageCache, citation_page_locator, write_page_cache
+
+PAGES = [
+    "Introduction\nMental state detection uses physiological signals.",
+    "Heart rate variability (HRV) reflects the balance between the\nsympathetic and parasympathetic systems.",
+    "Cortisol levels correlate with anxiety and depression in the UK Biobank study.",
+]
+
+
+def test_page_access_and_quote_lookup(tmp_path):
+    cache_path = write_page_cache(PAGES, tmp_path / "doc.pages")
+
+    with PageCache(cache_path) as cache:
+        assert len(cache) == 3
+        assert bytes(cache.page(2)).decode() == PAGES[1]
+        assert cache.find("HEART RATE variability") == [2]
+        # Quotes match across line breaks in the extracted text
+        assert cache.find("balance between the sympathetic and parasympathetic systems") == [2]
+        assert cache.find("not anywhere in the document at all") == []
+        assert cache.best_page_for("Cortisol linked to depression (UK Biobank)") == 3
+
+
+def test_paraphrase_lookup_matches_whole_words_only(tmp_path):
+    cache_path = write_page_cache(["The heart of the matter.", "Art therapy sessions."], tmp_path / "doc.pages")
+
+    with PageCache(cache_path) as cache:
+        assert cache.find("art") == [1, 2]
+        assert cache.find("art", whole_words=True) == [2]
+        assert cache.best_page_for("art") == 2
+        assert cache.best_page_for("matt") is None
+
+
+def test_locator_only_pages_citations_of_the_cached_pdf(tmp_path):
+    cache_path = write_page_cache(PAGES, tmp_path / "Cognitive_science.pages")
+    answer = "Cortisol tracks depression in the UK Biobank cohort.【4:0†source】"
+    annotation = SimpleNamespace(start_index=answer.index("【"))
+
+    with PageCache(cache_path) as cache:
+        locate = citation_page_locator(cache, answer)
+        assert locate("Cognitive_science.pdf", annotation) == 3
+        assert locate("api_best_practices.md", annotation) is None
+        assert locate(None, annotation) is None
+
+
+@pytest.fixture
+def pdf_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "CACHE_DIR", tmp_path / "cache")
+    pdf_path = tmp_path / "source.pdf"
+    shutil.copyfile(page_cache.SOURCE_PDF, pdf_path)
+    return pdf_path
+
+
+@pytest.mark.parametrize("damage", ["empty", "truncated", "garbage"])
+def test_damaged_cache_is_rebuilt(pdf_copy, damage):
+    pytest.importorskip("pypdf")
+    cache_path = page_cache.build_page_cache(pdf_copy)
+    data = cache_path.read_bytes()
+    cache_path.write_bytes({"empty": b"", "truncated": data[:len(data) // 2], "garbage": b"x" * 64}[damage])
+
+    cache = page_cache.load_page_cache(pdf_copy)
+    assert cache is not None and len(cache) > 0
+    cache.close()
+    assert cache_path.read_bytes() == data
+
+
+def test_unreadable_pdf_falls_back_to_no_cache(pdf_copy):
+    pytest.importorskip("pypdf")
+    pdf_copy.write_bytes(b"%PDF-1.4 this is not really a pdf")
+    assert page_cache.load_page_cache(pdf_copy) is None
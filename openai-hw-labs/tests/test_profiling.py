@@ -0,0 +1,79 @@
+import json
+import time
+import threading
+
+from lab_common import profiling
+from lab_common.profiling import Profiler, phase, profiler_mode
+
+
+def test_phase_is_free_without_a_profiler():
+    with phase("anything"):
+        pass
+    assert profiling._active is None
+
+
+def test_profile_mode_from_flag_and_sample_rate(monkeypatch):
+    monkeypatch.delenv("LAB_PROFILER_SAMPLE", raising=False)
+    assert profiler_mode(["script.py", "--profile"]) == "full"
+    assert profiler_mode(["script.py"]) is None
+    monkeypatch.setenv("LAB_PROFILER_SAMPLE", "1")
+    assert profiler_mode(["script.py"]) == "sample"
+
+
+def test_phases_are_timed_and_exported_to_speedscope(tmp_path, capsys):
+    profiler = Profiler("demo", "full", output_dir=tmp_path, interval=0.002)
+    profiler.start()
+    with profiler.phase("main"):
+        with profiler.phase("parse"):
+            data = [str(i) * 10 for i in range(20000)]
+            time.sleep(0.05)
+    profiler.finish()
+
+    assert set(profiler.phases) == {"main", "main/parse"}
+    assert profiler.phases["main"]["wall"] >= profiler.phases["main/parse"]["wall"] >= 0.05
+    assert profiler.phases["main/parse"]["alloc_peak"] > 0
+    assert len(data) == 20000
+
+    document = json.loads(next(tmp_path.glob("demo-*.speedscope.json")).read_text())
+    assert "main/parse" in {p["name"] for p in document["profiles"]}
+    assert len(list(tmp_path.glob("demo-*.pstats"))) == 2
+    assert "main/parse" in capsys.readouterr().out
+
+
+def test_phases_in_concurrent_threads_do_not_nest(tmp_path, capsys):
+    profiler = Profiler("demo", "full", output_dir=tmp_path, interval=0.002)
+    profiler.start()
+    started = threading.Barrier(4)
+
+    def answer():
+        with profiler.phase("answer"):
+            started.wait(2)
+            time.sleep(0.02)
+
+    with profiler.phase("main"):
+        workers = [threading.Thread(target=answer) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    profiler.finish()
+
+    # Worker phases are named from their own thread's stack, never from each other's
+    assert set(profiler.phases) == {"main", "answer"}
+    assert profiler.phases["answer"]["calls"] == 4
+    # cProfile only runs in the thread that started the profiler
+    assert profiler.phases["answer"]["profile"] is None
+
+
+def test_samples_are_counted_per_distinct_stack(tmp_path, capsys):
+    profiler = Profiler("demo", "sample", output_dir=tmp_path, interval=0.001)
+    profiler.start()
+    with profiler.phase("main"):
+        time.sleep(0.1)
+    profiler.finish()
+
+    samples = profiler.sampler.samples
+    assert sum(samples.values()) > len(samples)
+    document = json.loads(next(tmp_path.glob("demo-*.speedscope.json")).read_text())
+    (main,) = [p for p in document["profiles"] if p["name"] == "main"]
+    assert len(main["samples"]) == len(main["weights"]) == len({s for (name, s) in samples if name == "main"})
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from lab_common.prompt_layout import CacheTally, cached_tokens, describe_cache, run_instructions
+
+
+def test_run_guidance_is_appended_not_replacing_instructions():
+    assert run_instructions("Cite sources.", None, "Summary: x") == {
+        "additional_instructions": "Cite sources.\n\nSummary: x"
+    }
+    assert run_instructions(None) == {}
+
+
+def test_cached_tokens_from_each_usage_shape():
+    chat = SimpleNamespace(prompt_tokens=2000, prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+    responses = SimpleNamespace(input_tokens=1200, input_tokens_details=SimpleNamespace(cached_tokens=1024))
+    run_extra = SimpleNamespace(prompt_tokens=1100, model_extra={"prompt_token_details": {"cached_tokens": 0}})
+    run_plain = SimpleNamespace(prompt_tokens=900)
+
+    assert [cached_tokens(u) for u in (chat, responses, run_extra, run_plain)] == [1536, 1024, 0, None]
+    assert describe_cache(chat) == "1536/2000 prompt tokens cached (77%)"
+    assert describe_cache(run_plain) == "900 prompt tokens (cache not reported)"
+
+    tally = CacheTally()
+    for usage in (chat, responses, run_plain, None):
+        tally.record(usage)
+    assert (tally.runs, tally.prompt, tally.cached, tally.unreported) == (3, 4100, 2560, 1)
+    # Numbers already pulled out of usage (as the RAG lab keeps them) count the same way
+    tally.add(800, 400)
+    tally.add(None, None)
+    assert tally.describe() == "2960/4900 prompt tokens cached (60%) over 4 run(s), 1 run(s) without cache details"
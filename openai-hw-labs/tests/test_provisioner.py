@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+from lab_common.provisioner import ProvisioningPlan, config_hash, file_digest
+
+ASSISTANT_CONFIG = {
+    "name": "Study Q&A Assistant",
+    "instructions": "Cite sources.",
+    "model": "gpt-4o-mini",
+    "tools": [{"type": "file_search"}]
+}
+
+
+class FakeTool:
+    def __init__(self, type):
+        self.type = type
+
+    def model_dump(self, exclude_none=False):
+        return {"type": self.type, "file_search": {"max_num_results": 20}}
+
+
+class FakeClient:
+    def __init__(self, assistant):
+        self.calls = []
+        self.beta = SimpleNamespace(assistants=SimpleNamespace(
+            retrieve=lambda assistant_id: self._record("assistants.retrieve", assistant),
+            update=lambda **kwargs: self._record("assistants.update", assistant),
+        ))
+        self.vector_stores = SimpleNamespace(
+            retrieve=lambda vector_store_id: self._record(
+                "vector_stores.retrieve", SimpleNamespace(id=vector_store_id, status="completed")),
+        )
+
+    def _record(self, name, result):
+        self.calls.append(name)
+        return result
+
+
+def remote_assistant(**overrides):
+    fields = {**ASSISTANT_CONFIG, "id": "asst_1", "tools": [FakeTool("file_search")],
+              "tool_resources": {"file_search": {"vector_store_ids": ["vs_1"]}}}
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def desired_and_state(tmp_path):
+    doc = tmp_path / "doc.pdf"
+    doc.write_bytes(b"%PDF-1.4 sample")
+    desired = {"assistant": ASSISTANT_CONFIG, "files": [str(doc)],
+               "vector_store": {"name": "knowledge_base"}}
+    digest = file_digest(doc)
+    state = {
+        "assistant_id": "asst_1",
+        "vector_store_id": "vs_1",
+        "vector_store_hash": config_hash({"store": desired["vector_store"], "files": [digest]}),
+        "files": {str(doc): {"digest": digest, "file_id": "file_1"}}
+    }
+    return desired, state
+
+
+def test_noop_bootstrap_only_reads(tmp_path):
+    desired, state = desired_and_state(tmp_path)
+    client = FakeClient(remote_assistant())
+
+    plan = ProvisioningPlan(client, desired, state)
+    plan.apply()
+
+    assert plan.steps == []
+    assert sorted(client.calls) == ["assistants.retrieve", "vector_stores.retrieve"]
+
+
+def test_changed_instructions_only_update_assistant(tmp_path):
+    desired, state = desired_and_state(tmp_path)
+    client = FakeClient(remote_assistant(instructions="Old instructions."))
+
+    plan = ProvisioningPlan(client, desired, state)
+    assert plan.describe() == ["assistant"]
+    plan.apply()
+    assert client.calls.count("assistants.update") == 1
+
+
+def test_changed_file_replaces_store_and_deletes_the_old_one_after_relinking(tmp_path):
+    desired, state = desired_and_state(tmp_path)
+    (tmp_path / "doc.pdf").write_bytes(b"%PDF-1.4 revised")
+    client = FakeClient(remote_assistant())
+    client.vector_stores.create = lambda **kwargs: client._record("vector_stores.create", SimpleNamespace(id="vs_2"))
+    client.vector_stores.delete = lambda vector_store_id: client._record(f"vector_stores.delete:{vector_store_id}", None)
+    client.files = SimpleNamespace(delete=lambda file_id: client._record(f"files.delete:{file_id}", None))
+
+    plan = ProvisioningPlan(client, desired, state, max_workers=1, uploader=lambda client, path: "file_2")
+    assert plan.describe() == [f"upload:{tmp_path / 'doc.pdf'}", "vector_store", "assistant", "cleanup"]
+    plan.apply()
+
+    writes = [call for call in client.calls if not call.endswith("retrieve")]
+    assert writes[:2] == ["vector_stores.create", "assistants.update"]
+    assert sorted(writes[2:]) == ["files.delete:file_1", "vector_stores.delete:vs_1"]
+    assert (state["vector_store_id"], state["files"][str(tmp_path / "doc.pdf")]["file_id"]) == ("vs_2", "file_2")
@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+from lab_common.citations import cited_file_id
+from lab_common.run_metrics import METRICS
+from lab_common.run_scheduler import RunScheduler
+from lab_common.state_store import StateStore
+from qna_backends import AssistantsBackend, ResponsesBackend, run_pdf_question
+
+
+class FakeResponses:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        citation = SimpleNamespace(type="file_citation", file_id="file_1", filename="doc.pdf", index=12)
+        text = SimpleNamespace(type="output_text", text="Cortisol rises.", annotations=[citation])
+        return SimpleNamespace(
+            id=f"resp_{len(self.requests)}",
+            status="completed",
+            output=[SimpleNamespace(type="file_search_call"), SimpleNamespace(type="message", content=[text])],
+            output_text="Cortisol rises.",
+            usage=None
+        )
+
+
+def test_responses_backend_answers_in_one_request_and_chains_follow_ups():
+    client = SimpleNamespace(responses=FakeResponses())
+    backend = ResponsesBackend(client, "vs_1", model="gpt-4o-mini", instructions="You are a tutor.")
+    labels = {"assistant": "responses", "model": "gpt-4o-mini"}
+    before = (METRICS.runs.value(status="completed", **labels),
+              METRICS.tool_calls.value(tool="file_search", **labels))
+
+    answer = backend.ask("How does cortisol relate to anxiety?")
+    follow_up = backend.ask("And depression?", previous_id=answer.id)
+
+    first, second = client.responses.requests
+    assert first["tools"] == [{"type": "file_search", "vector_store_ids": ["vs_1"]}]
+    assert first["instructions"].startswith("You are a tutor.")
+    assert "previous_response_id" not in first
+    assert second["previous_response_id"] == "resp_1"
+    assert follow_up.completed and follow_up.text == "Cortisol rises."
+    assert [cited_file_id(a) for a in answer.annotations] == ["file_1"]
+    # Recorded in the run metrics like an assistant run
+    assert METRICS.runs.value(status="completed", **labels) - before[0] == 2
+    assert METRICS.tool_calls.value(tool="file_search", **labels) - before[1] == 2
+
+    notes = backend.ask_json("Return JSON notes.", "Summarize the document.")
+    assert client.responses.requests[-1]["text"] == {"format": {"type": "json_object"}}
+    assert notes.backend == "responses"
+
+
+def test_assistants_backend_reuses_thread_for_follow_ups():
+    created_threads, runs = [], []
+    message = SimpleNamespace(role="assistant", content=[
+        SimpleNamespace(type="text", text=SimpleNamespace(value='{"notes": []}', annotations=[]))])
+    threads = SimpleNamespace(
+        create=lambda: created_threads.append(1) or SimpleNamespace(id=f"thread_{len(created_threads)}"),
+        messages=SimpleNamespace(create=lambda **kwargs: None,
+                                 list=lambda **kwargs: SimpleNamespace(data=[message])),
+        runs=SimpleNamespace(create=lambda **kwargs: runs.append(kwargs) or SimpleNamespace(
+            id="run_1", status="completed", usage=None))
+    )
+    backend = AssistantsBackend(SimpleNamespace(beta=SimpleNamespace(threads=threads)), "asst_1")
+
+    answer = backend.ask_json("Return JSON notes.", "Summarize the document.")
+    backend.ask_json("Replace note 2.", "Replace the overlapping notes.", previous_id=answer.id)
+
+    assert len(created_threads) == 1
+    assert [run["thread_id"] for run in runs] == ["thread_1", "thread_1"]
+    assert runs[0]["response_format"] == {"type": "json_object"}
+    assert runs[0]["additional_instructions"] == "Return JSON notes."
+    assert "model" not in runs[0]
+    assert answer.text == '{"notes": []}'
+
+
+def test_runs_take_their_slot_from_the_scheduler_given(tmp_path):
+    message = SimpleNamespace(role="assistant", content=[])
+    threads = SimpleNamespace(
+        create=lambda: SimpleNamespace(id="thread_1"),
+        messages=SimpleNamespace(create=lambda **kwargs: None,
+                                 list=lambda **kwargs: SimpleNamespace(data=[message])),
+        runs=SimpleNamespace(create=lambda **kwargs: SimpleNamespace(id="run_1", status="completed", usage=None))
+    )
+    scheduler = RunScheduler(capacity=1, path=tmp_path / "slots.json")
+
+    run, answer = run_pdf_question(SimpleNamespace(beta=SimpleNamespace(threads=threads)), "asst_1", "Why?",
+                                   scheduler=scheduler)
+
+    assert (run.status, answer) == ("completed", message)
+    assert scheduler.describe()["interactive"]["granted"] == 1
+
+
+def test_assistant_config_is_read_from_the_store_before_retrieving(tmp_path):
+    retrieved = []
+    assistant = SimpleNamespace(id="asst_1", model="gpt-4o-mini", instructions="You are a tutor.")
+    assistants = SimpleNamespace(retrieve=lambda assistant_id: retrieved.append(assistant_id) or assistant)
+    client = SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+    store = StateStore(path=tmp_path / "state.json")
+
+    described = AssistantsBackend(client, "asst_1", store=store).describe()
+    assert described == {"backend": "assistants", "model": "gpt-4o-mini", "instructions": "You are a tutor."}
+    assert retrieved == ["asst_1"]
+
+    # Later runs (a build-cache check each) reuse what was recorded
+    assert AssistantsBackend(client, "asst_1", store=store).describe() == described
+    assert ResponsesBackend.from_assistant(client, "asst_1", "vs_1", store=store).describe()["model"] == "gpt-4o-mini"
+    assert retrieved == ["asst_1"]
+
+    # A different assistant id is never answered from another assistant's config
+    AssistantsBackend(client, "asst_2", store=store).describe()
+    assert retrieved == ["asst_1", "asst_2"]
+
+
+def test_assistants_backend_streams_deltas_and_finds_the_text_block():
+    ev = lambda name, data: SimpleNamespace(event=name, data=data)
+    delta = lambda value: ev("thread.message.delta", SimpleNamespace(delta=SimpleNamespace(content=[
+        SimpleNamespace(type="text", text=SimpleNamespace(value=value))])))
+    run = lambda status: SimpleNamespace(object="thread.run", id="run_1", status=status, usage=None)
+    image = SimpleNamespace(type="image_file", image_file=SimpleNamespace(file_id="file_img"))
+    text = SimpleNamespace(type="text", text=SimpleNamespace(value="HRV measures variability", annotations=[]))
+    message = SimpleNamespace(role="assistant", content=[image, text])
+    events = [ev("thread.run.created", run("queued")), delta("HRV "), delta("measures variability"),
+              ev("thread.message.completed", message), ev("thread.run.completed", run("completed"))]
+    requests = []
+    threads = SimpleNamespace(
+        create=lambda: SimpleNamespace(id="thread_1"),
+        messages=SimpleNamespace(create=lambda **kwargs: None),
+        runs=SimpleNamespace(create=lambda **kwargs: requests.append(kwargs) or iter(events))
+    )
+    backend = AssistantsBackend(SimpleNamespace(beta=SimpleNamespace(threads=threads)), "asst_1")
+    deltas, statuses = [], []
+
+    answer = backend.ask("What does HRV measure?", on_status=statuses.append, on_delta=deltas.append)
+
+    assert requests[0]["stream"] is True
+    assert deltas == ["HRV ", "measures variability"] and statuses == ["queued", "completed"]
+    # The image block comes first; the answer is still the text
+    assert answer.completed and answer.text == "HRV measures variability"
+
+
+def test_responses_backend_streams_deltas_to_the_final_response():
+    final = FakeResponses().create()
+    events = [SimpleNamespace(type="response.created", response=SimpleNamespace(status="in_progress")),
+              SimpleNamespace(type="response.output_text.delta", delta="Cortisol "),
+              SimpleNamespace(type="response.output_text.delta", delta="rises."),
+              SimpleNamespace(type="response.completed", response=final)]
+    requests = []
+    client = SimpleNamespace(responses=SimpleNamespace(create=lambda **kwargs: requests.append(kwargs) or iter(events)))
+    deltas, statuses = [], []
+
+    answer = ResponsesBackend(client, "vs_1").ask("And cortisol?", on_status=statuses.append, on_delta=deltas.append)
+
+    assert requests[0]["stream"] is True
+    assert deltas == ["Cortisol ", "rises."] and statuses == ["in_progress", "completed"]
+    assert answer.id == final.id and answer.text == "Cortisol rises."
+    assert [cited_file_id(a) for a in answer.annotations] == ["file_1"]
@@ -0,0 +1,158 @@
+import json
+import time
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from qna_backends import Answer
+from qna_service import Overloaded, QnAService, serve
+from lab_common.run_scheduler import RunScheduler
+
+
+class FakeService(QnAService):
+    def __init__(self, workers=8, **kwargs):
+        super().__init__(client=None, assistant_id="asst_1", citation_resolver=object(),
+                         scheduler=RunScheduler(capacity=workers, path=Path(tempfile.mkdtemp()) / "slots.json"),
+                         **kwargs)
+        self.release = threading.Event()
+        self.asked = []
+
+    def ask(self, question):
+        self.asked.append(question)
+        self.release.wait(5)
+        return {"status": "completed", "answer": f"About {question}"}
+
+    def stream(self, question, emit):
+        emit("status", {"status": "in_progress"})
+        for word in ("HRV ", "measures ", "variability"):
+            emit("delta", {"text": word})
+        emit("answer", {"status": "completed", "answer": "HRV measures variability"})
+
+
+@pytest.fixture
+def running():
+    started = []
+
+    def start(service):
+        server = serve(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((server, service))
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server, service in started:
+        service.release.set()
+        server.shutdown()
+        service.shutdown()
+
+
+def post(url, body, accept=None):
+    request = urllib.request.Request(url + "/ask", data=json.dumps(body).encode(), method="POST",
+                                     headers={"Accept": accept} if accept else {})
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_admission_is_bounded_by_workers_plus_queue_depth():
+    service = FakeService(workers=1, queue_depth=1)
+    first, second = service.submit(service.ask, "a"), service.submit(service.ask, "b")
+    health = service.health()
+    assert (health["in_flight"], health["queued"], health["capacity"]) == (2, 1, 2)
+    with pytest.raises(Overloaded):
+        service.submit(service.ask, "c")
+
+    service.release.set()
+    assert [first.result(5)["answer"], second.result(5)["answer"]] == ["About a", "About b"]
+    service.shutdown()
+    assert service.health()["in_flight"] == 0
+
+
+def test_ask_answers_json_and_rejects_when_full(running):
+    service = FakeService(workers=1, queue_depth=0)
+    url = running(service)
+
+    blocked = service.submit(service.ask, "slow")
+    with pytest.raises(urllib.error.HTTPError) as overloaded:
+        post(url, {"question": "HRV"})
+    assert overloaded.value.code == 503 and overloaded.value.headers["Retry-After"] == "1"
+
+    service.release.set()
+    blocked.result(5)
+    assert json.load(post(url, {"question": "HRV"}))["answer"] == "About HRV"
+
+    for body in ({"question": "  "}, {"question": "HRV", "priority": "urgent"}):
+        with pytest.raises(urllib.error.HTTPError) as bad:
+            post(url, body)
+        assert bad.value.code == 400
+
+
+def test_ask_streams_server_sent_events(running):
+    url = running(FakeService())
+    body = post(url, {"question": "HRV"}, accept="text/event-stream").read().decode()
+
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["status", "delta", "delta", "delta", "answer", "done"]
+    deltas = [json.loads(lines[1].removeprefix("data: "))["text"] for lines in events if "delta" in lines[0]]
+    assert "".join(deltas) == "HRV measures variability"
+
+
+def test_identical_questions_share_one_run(running):
+    service = FakeService(workers=1, queue_depth=0)
+    url = running(service)
+    answers = []
+
+    def ask(question):
+        answers.append(json.load(post(url, {"question": question}))["answer"])
+
+    clients = [threading.Thread(target=ask, args=(q,)) for q in ("What is HRV?", "what is  HRV", "WHAT IS HRV?")]
+    clients[0].start()
+    while not service.asked:
+        time.sleep(0.01)
+    for client in clients[1:]:
+        client.start()
+    while service.health()["coalesced"] < 2:
+        time.sleep(0.01)
+    service.release.set()
+    for client in clients:
+        client.join(5)
+
+    # One worker and no queue, yet every caller was answered by the first run
+    assert service.asked == ["What is HRV?"]
+    assert answers == ["About What is HRV?"] * 3
+    assert service.health()["flights"] == 0
+
+
+class StreamingBackend:
+    name = "assistants"
+
+    def ask(self, question, previous_id=None, model=None, on_status=None, on_delta=None):
+        on_status("in_progress")
+        for word in ("HRV ", "measures ", "variability"):
+            on_delta(word)
+        citation = SimpleNamespace(type="file_citation", text="【4:0†source】", file_id="file_1")
+        return Answer(self.name, "thread_1", "completed", text="HRV measures variability【4:0†source】",
+                      annotations=[citation], latency=0.5)
+
+
+class Resolver:
+    def render(self, annotations, page_locator=None):
+        return [a.file_id for a in annotations]
+
+
+def test_stream_goes_through_the_backend_with_rendered_citations():
+    service = QnAService(client=None, assistant_id="asst_1", citation_resolver=Resolver(),
+                         backend=StreamingBackend())
+    events = []
+
+    result = service.stream("What does HRV measure?", lambda event, data: events.append((event, data)))
+    service.shutdown()
+
+    assert [event for event, _ in events] == ["status", "delta", "delta", "delta", "answer"]
+    assert "".join(data["text"] for event, data in events if event == "delta") == "HRV measures variability"
+    assert events[-1] == ("answer", result)
+    assert (result["backend"], result["status"], result["citations"]) == ("assistants", "completed", ["file_1"])
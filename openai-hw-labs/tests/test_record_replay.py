@@ -0,0 +1,89 @@
+import base64
+import json
+
+import pytest
+
+from record_replay import CassetteMiss, RecordReplayTransport, httpx, load_cassette, normalize_body, save_cassette
+
+
+def interaction(key, status, body):
+    return {"key": key, "status": status, "headers": [["content-type", "application/json"]],
+            "content": base64.b64encode(json.dumps(body).encode()).decode()}
+
+
+def request(method, path, body=None):
+    return httpx.Request(method, f"https://api.openai.com{path}", content=body)
+
+
+def test_normalize_body_ignores_key_order_and_whitespace():
+    assert normalize_body(b'{"b": 1,  "a": [1, 2]}') == normalize_body(b'{"a":[1,2],"b":1}') == '{"a":[1,2],"b":1}'
+    assert normalize_body(b"") == ""
+    assert normalize_body(b"\x00not json") == base64.b64encode(b"\x00not json").decode()
+
+
+def test_repeated_requests_replay_in_recorded_order(tmp_path):
+    cassette = tmp_path / "polling.json.gz"
+    poll = "GET /v1/threads/thread_1/runs/run_1 "
+    save_cassette(cassette, {"assistant_id": "asst_1"}, [
+        interaction(poll, 200, {"status": "in_progress"}),
+        interaction('POST /v1/threads {"metadata":{}}', 200, {"id": "thread_1"}),
+        interaction(poll, 200, {"status": "completed"}),
+    ])
+    transport = RecordReplayTransport(cassette)
+    assert transport.metadata == {"assistant_id": "asst_1"}
+
+    created = transport.handle_request(request("POST", "/v1/threads", b'{ "metadata": {} }'))
+    statuses = [json.loads(transport.handle_request(request("GET", "/v1/threads/thread_1/runs/run_1")).read())["status"]
+                for _ in range(2)]
+    assert json.loads(created.read()) == {"id": "thread_1"}
+    assert statuses == ["in_progress", "completed"]
+
+    # Each recorded response is served once; a third poll was never recorded
+    with pytest.raises(CassetteMiss):
+        transport.handle_request(request("GET", "/v1/threads/thread_1/runs/run_1"))
+
+
+def test_unrecorded_request_is_a_miss(tmp_path):
+    cassette = tmp_path / "empty.json.gz"
+    save_cassette(cassette, {}, [interaction("POST /v1/threads {}", 200, {"id": "thread_1"})])
+    with pytest.raises(CassetteMiss):
+        RecordReplayTransport(cassette).handle_request(request("POST", "/v1/threads", b'{"metadata":{"a":1}}'))
+
+
+def record_transport(cassette, upstream):
+    transport = RecordReplayTransport(cassette, record=True, metadata={"assistant_id": "asst_1"})
+    transport._upstream.close()
+    transport._upstream = httpx.MockTransport(upstream)
+    return transport
+
+
+def test_record_mode_stores_decoded_interactions(tmp_path):
+    cassette = tmp_path / "recorded.json.gz"
+    transport = record_transport(cassette, lambda request: httpx.Response(
+        200, json={"id": "thread_1"}, headers={"content-encoding": "identity"}))
+    response = transport.handle_request(request("POST", "/v1/threads", b'{"metadata": {}}'))
+    transport.close()
+
+    assert json.loads(response.read()) == {"id": "thread_1"}
+    recorded = load_cassette(cassette)
+    assert recorded["metadata"] == {"assistant_id": "asst_1"}
+    [stored] = recorded["interactions"]
+    assert stored["key"] == 'POST /v1/threads {"metadata":{}}'
+    assert "content-encoding" not in dict(stored["headers"])
+
+
+def test_record_mode_closes_an_upstream_response_that_fails_midway(tmp_path):
+    closed = []
+
+    class BrokenStream(httpx.SyncByteStream):
+        def __iter__(self):
+            yield b'{"id": '
+            raise httpx.ReadError("connection reset")
+
+        def close(self):
+            closed.append(True)
+
+    transport = record_transport(tmp_path / "broken.json.gz", lambda request: httpx.Response(200, stream=BrokenStream()))
+    with pytest.raises(httpx.ReadError):
+        transport.handle_request(request("POST", "/v1/threads", b"{}"))
+    assert closed == [True]
@@ -0,0 +1,57 @@
+import urllib.request
+from types import SimpleNamespace
+
+from lab_common.run_metrics import RunMetrics, run_phases, tool_call_counts
+
+
+def make_run(status="completed", **timestamps):
+    usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=300,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+    return SimpleNamespace(assistant_id="asst_1", model="gpt-4o-mini", status=status, usage=usage,
+                           last_error=None, **timestamps)
+
+
+def test_wall_time_splits_into_queue_execution_and_client_overhead():
+    run = make_run(created_at=100, started_at=103, completed_at=110)
+    assert run_phases(run, wall=11.5) == {"queue_wait": 3, "execution": 7, "client_overhead": 1.5,
+                                          "total": 11.5}
+
+    failed = make_run("failed", created_at=100, started_at=None, failed_at=101)
+    assert run_phases(failed, wall=2.0) == {"client_overhead": 1.0, "total": 2.0}
+
+
+def test_tool_calls_are_counted_by_type():
+    def step(*types):
+        calls = [SimpleNamespace(type=t) for t in types]
+        return SimpleNamespace(type="tool_calls", step_details=SimpleNamespace(tool_calls=calls))
+
+    steps = [step("file_search"), SimpleNamespace(type="message_creation", step_details=None),
+             step("file_search", "function")]
+    assert tool_call_counts(steps) == {"file_search": 2, "function": 1}
+
+
+def test_metrics_are_served_in_prometheus_text_format():
+    metrics = RunMetrics(buckets=[1, 5, 10])
+    metrics.observe_run(make_run(created_at=100, started_at=103, completed_at=110), 11.5, {"file_search": 2})
+    metrics.observe_run(make_run("expired", created_at=100, started_at=101, expired_at=160), 61.0)
+    metrics.observe_exception("asst_1", TimeoutError(), model="gpt-4o-mini")
+
+    labels = {"assistant": "asst_1", "model": "gpt-4o-mini"}
+    assert metrics.phase_seconds.count(phase="queue_wait", **labels) == 2
+    assert metrics.runs.value(status="expired", **labels) == 1
+    assert metrics.errors.value(reason="TimeoutError", **labels) == 1
+    assert metrics.tokens.value(kind="cached_prompt", **labels) == 2048
+
+    server = metrics.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+
+    assert "# TYPE openai_run_phase_seconds histogram" in body
+    assert ('openai_run_phase_seconds_bucket{assistant="asst_1",model="gpt-4o-mini",phase="execution",le="10"} 1'
+            in body)
+    assert 'openai_run_phase_seconds_count{assistant="asst_1",model="gpt-4o-mini",phase="execution"} 2' in body
+    assert 'openai_run_tool_calls_total{assistant="asst_1",model="gpt-4o-mini",tool="file_search"} 2' in body
+    assert 'openai_run_errors_total{assistant="asst_1",model="gpt-4o-mini",reason="expired"} 1' in body
@@ -0,0 +1,167 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+
+import pytest
+
+from lab_common.run_scheduler import RunScheduler
+
+
+def hold(scheduler, priority, started, release):
+    with scheduler.slot(priority):
+        started.append(priority)
+        release.wait(5)
+
+
+def test_bulk_is_capped_below_capacity_and_interactive_gets_the_rest(tmp_path):
+    scheduler = RunScheduler(capacity=4, path=tmp_path / "slots.json")
+    release = threading.Event()
+    started = []
+    threads = [threading.Thread(target=hold, args=(scheduler, p, started, release))
+               for p in ["bulk"] * 6 + ["interactive"]]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+
+    # Bulk holds its 3 slots (75% of 4); the last one is left for interactive
+    assert sorted(started) == ["bulk"] * 3 + ["interactive"]
+    assert scheduler.describe()["bulk"]["waiting"] == 3
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(started) == ["bulk"] * 6 + ["interactive"]
+
+
+def test_waiting_classes_share_slots_by_weight(tmp_path):
+    scheduler = RunScheduler(classes=[{"name": "interactive", "weight": 3, "max_share": 1.0},
+                                      {"name": "bulk", "weight": 1, "max_share": 1.0}], capacity=1,
+                             path=tmp_path / "slots.json")
+    order = []
+    gate = threading.Event()
+    blocker = scheduler.submit("bulk", gate.wait, 5)
+    futures = [scheduler.submit(p, order.append, p) for p in ["bulk"] * 8 + ["interactive"] * 8]
+    gate.set()
+    blocker.result(5)
+    for future in futures:
+        future.result(5)
+    scheduler.shutdown()
+
+    # Three interactive grants for every bulk one while both are backlogged; the blocker
+    # already used bulk's first turn
+    assert order[:9] == ["interactive"] * 4 + ["bulk"] + ["interactive"] * 3 + ["bulk"]
+    assert sorted(order) == ["bulk"] * 8 + ["interactive"] * 8
+
+
+def test_slots_are_reentrant_and_unknown_classes_rejected(tmp_path):
+    scheduler = RunScheduler(capacity=1, path=tmp_path / "slots.json")
+    future = scheduler.submit("bulk", lambda: scheduler.slot("interactive").__enter__() or "nested ok")
+    assert future.result(5) == "nested ok"
+    with pytest.raises(ValueError):
+        scheduler.submit("urgent", print)
+    scheduler.shutdown()
+
+
+def test_async_slots_wait_without_blocking_the_loop(tmp_path):
+    scheduler = RunScheduler(capacity=2, path=tmp_path / "slots.json")
+
+    async def query(i, running, peak):
+        async with scheduler.aslot("bulk"):
+            running.append(i)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(i)
+
+    async def sweep():
+        running, peak = [], []
+        await asyncio.gather(*(query(i, running, peak) for i in range(6)))
+        return max(peak)
+
+    # Bulk may use 1 of the 2 slots
+    assert asyncio.run(sweep()) == 1
+    assert scheduler.describe()["bulk"]["running"] == 0
+
+
+def _hold_slot(path, held, release):
+    with RunScheduler(capacity=1, path=path).slot("bulk"):
+        held.set()
+        release.wait(10)
+
+
+def _exit_holding_slot(path):
+    RunScheduler(capacity=1, path=path).slot("bulk").__enter__()
+    os._exit(0)
+
+
+def wait_for_slot(scheduler, priority, granted):
+    with scheduler.slot(priority):
+        granted.set()
+
+
+def test_processes_take_slots_from_one_ledger(tmp_path):
+    path = tmp_path / "slots.json"
+    context = multiprocessing.get_context("fork")
+    held, release = context.Event(), context.Event()
+    holder = context.Process(target=_hold_slot, args=(path, held, release))
+    holder.start()
+    assert held.wait(10)
+
+    scheduler = RunScheduler(capacity=1, path=path, poll_interval=0.01)
+    assert scheduler.describe()["bulk"]["running"] == 1
+    granted = threading.Event()
+    threading.Thread(target=wait_for_slot, args=(scheduler, "interactive", granted), daemon=True).start()
+    # The other process holds the only slot
+    assert not granted.wait(0.3)
+    assert scheduler.describe()["interactive"]["waiting"] == 1
+
+    release.set()
+    holder.join(10)
+    assert granted.wait(5)
+
+
+def test_slots_of_an_exited_process_are_handed_on(tmp_path):
+    path = tmp_path / "slots.json"
+    context = multiprocessing.get_context("fork")
+    crashed = context.Process(target=_exit_holding_slot, args=(path,))
+    crashed.start()
+    crashed.join(10)
+
+    scheduler = RunScheduler(capacity=1, path=path, poll_interval=0.01)
+    granted = threading.Event()
+    threading.Thread(target=wait_for_slot, args=(scheduler, "interactive", granted), daemon=True).start()
+    assert granted.wait(5)
+    assert scheduler.describe()["bulk"]["running"] == 0
+
+
+def test_a_failed_ledger_check_does_not_strand_waiters(tmp_path, capsys):
+    path = tmp_path / "slots.json"
+    # A second scheduler on the same ledger stands in for another process
+    holder, scheduler = RunScheduler(capacity=1, path=path), RunScheduler(capacity=1, path=path, poll_interval=0.01)
+    sync, failures = scheduler._sync, []
+
+    def flaky_sync(change=None):
+        if threading.current_thread().name == "run-slot-poller" and not failures:
+            failures.append(1)
+            raise OSError("ledger busy")
+        sync(change)
+
+    scheduler._sync = flaky_sync
+    granted = threading.Event()
+    with holder.slot("bulk"):
+        threading.Thread(target=wait_for_slot, args=(scheduler, "interactive", granted), daemon=True).start()
+        assert not granted.wait(0.1)
+    assert granted.wait(5)
+    assert failures and "ledger busy" in capsys.readouterr().out
+
+
+def test_capacity_and_weights_come_from_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("LAB_SCHEDULER_CAPACITY", "2")
+    monkeypatch.setenv("LAB_SCHEDULER_WEIGHTS", "interactive=2,bulk=1")
+    classes = RunScheduler(path=tmp_path / "slots.json").describe()
+    assert (classes["interactive"]["max_concurrency"], classes["interactive"]["weight"]) == (2, 2.0)
+    assert classes["bulk"]["max_concurrency"] == 1
+
+    monkeypatch.setenv("LAB_SCHEDULER_WEIGHTS", "urgent=9")
+    with pytest.raises(ValueError):
+        RunScheduler(path=tmp_path / "slots.json").priorities
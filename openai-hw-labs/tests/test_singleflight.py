@@ -0,0 +1,65 @@
+import time
+import threading
+
+import pytest
+
+from singleflight import SingleFlight, flight_key
+
+
+def test_key_ignores_case_whitespace_and_punctuation_but_not_scope():
+    assert flight_key("What is HRV?", "asst_1", "vs_1") == flight_key("  what is\nhrv ", "asst_1", "vs_1")
+    assert flight_key("What is HRV?", "asst_1", "vs_1") != flight_key("What is HRV?", "asst_1", "vs_2")
+    assert flight_key("What is HRV?", "asst_1") != flight_key("What is HRV?", "asst_2")
+
+
+def test_concurrent_callers_share_the_leaders_result_and_error():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    leader = threading.Thread(target=lambda: results.append(flights.do("k", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("k", work))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while flights.coalesced < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    # Finished flights are forgotten, so the next call runs again
+    assert flights.in_flight() == 0
+    assert flights.do("k", lambda: "fresh") == ("fresh", False)
+
+    flight, _ = flights.join("boom")
+    flights.finish(flight, error=ValueError("run failed"))
+    with pytest.raises(ValueError):
+        flight.wait(1)
+
+
+def test_late_subscribers_replay_buffered_events_then_follow_live():
+    flights = SingleFlight()
+    flight, leader = flights.join("k")
+    flight.emit("delta", {"text": "HRV "})
+    late, joined_as_leader = flights.join("k")
+    assert leader and not joined_as_leader and late is flight
+
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(e for e in late.subscribe(timeout=0.01) if e))
+    reader.start()
+    flight.emit("delta", {"text": "measures variability"})
+    flights.finish(flight, "HRV measures variability")
+    reader.join(5)
+
+    assert [data["text"] for _, data in received] == ["HRV ", "measures variability"]
+    assert flight.wait(0) == "HRV measures variability"
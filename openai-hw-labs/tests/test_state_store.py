@@ -0,0 +1,46 @@
+from multiprocessing import Pool
+
+from lab_common.state_store import StateStore
+
+
+def _write_keys(args):
+    path, worker = args
+    store = StateStore(path=path, profile="workers")
+    for i in range(25):
+        store.set(f"thread_{worker}_{i}", f"thread_{worker}_{i}")
+
+
+def test_profiles_are_isolated(tmp_path):
+    path = tmp_path / "state.json"
+    dev = StateStore(path=path, profile="dev")
+    prod = StateStore(path=path, profile="prod")
+
+    dev.set("assistant_id", "asst_dev")
+    prod.set("assistant_id", "asst_prod")
+
+    assert dev.get("assistant_id") == "asst_dev"
+    assert StateStore(path=path, profile="prod").get("assistant_id") == "asst_prod"
+    assert dev.delete("assistant_id") == "asst_dev"
+    assert dev.get("assistant_id") is None
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / "state.json")
+    with Pool(4) as pool:
+        pool.map(_write_keys, [(path, worker) for worker in range(4)])
+
+    store = StateStore(path=path, profile="workers")
+    assert all(store.get(f"thread_{w}_{i}") for w in range(4) for i in range(25))
+
+
+def test_get_or_create_calls_factory_once(tmp_path):
+    store = StateStore(path=tmp_path / "state.json")
+    calls = []
+
+    def create():
+        calls.append(1)
+        return "vs_123"
+
+    assert store.get_or_create("vector_store_id", create) == "vs_123"
+    assert StateStore(path=tmp_path / "state.json").get_or_create("vector_store_id", create) == "vs_123"
+    assert len(calls) == 1
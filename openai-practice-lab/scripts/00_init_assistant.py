@@ -3,7 +3,7 @@
 00 — Assistant Bootstrap Script
 
 Creates or updates a reusable OpenAI assistant with file_search capabilities.
-Stores the ASSISTANT_ID in a local .assistant file for reuse across labs.
+Stores the ASSISTANT_ID in the local state store (.state.json) for reuse across labs.
 
 Usage: python scripts/00_init_assistant.py
 
@@ -15,6 +15,9 @@ import sys
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.state_store import get_store
+from lab_common.provisioner import ProvisioningPlan
+from lab_common.profiling import run_profiled
 
 # Load environment variables
 load_dotenv()
@@ -35,17 +38,14 @@ def get_client():
     return OpenAI(**client_kwargs)
 
 def load_assistant_id():
-    """Load existing assistant ID from .assistant file if it exists."""
-    assistant_file = Path(".assistant")
-    if assistant_file.exists():
-        return assistant_file.read_text().strip()
-    return None
+    """Load existing assistant ID from the local state store if it exists."""
+    return get_store().get("assistant_id")
 
 def save_assistant_id(assistant_id):
-    """Save assistant ID to .assistant file for reuse."""
-    assistant_file = Path(".assistant")
-    assistant_file.write_text(assistant_id)
-    print(f"💾 Assistant ID saved to {assistant_file}")
+    """Save assistant ID to the local state store for reuse."""
+    store = get_store()
+    store.set("assistant_id", assistant_id)
+    print(f"💾 Assistant ID saved to {store.path} (profile: {store.profile})")
 
 def create_or_update_assistant(client):
     """Create a new assistant or update existing one."""
@@ -70,19 +70,23 @@ provide specific citations and references to the source material.""",
     }
     
     try:
-        if existing_id:
+        # Diff against the remote assistant and only write when something changed
+        plan = ProvisioningPlan(client, {"assistant": assistant_config},
+                                {"assistant_id": existing_id})
+        if not plan.steps:
+            print(f"✅ Assistant {existing_id} already up to date")
+        elif plan.remote.get("assistant"):
             print(f"🔄 Updating existing assistant: {existing_id}")
-            assistant = client.beta.assistants.update(
-                assistant_id=existing_id,
-                **assistant_config
-            )
+            plan.apply()
             print("✅ Assistant updated successfully!")
         else:
             print("🆕 Creating new assistant...")
-            assistant = client.beta.assistants.create(**assistant_config)
-            save_assistant_id(assistant.id)
+            plan.apply()
+            save_assistant_id(plan.assistant.id)
             print("✅ Assistant created successfully!")
         
+        assistant = plan.assistant
+        
         print(f"📋 Assistant Details:")
         print(f"   ID: {assistant.id}")
         print(f"   Name: {assistant.name}")
@@ -113,4 +117,4 @@ def main():
     print("\n💡 Tip: Use 'python scripts/99_cleanup.py' to clean up resources when done")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_profiled("00_init_assistant", main)
@@ -17,6 +17,13 @@ import json
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.state_store import get_store
+from stream_renderer import StreamRenderer
+from lab_common.conversation import ContextBudget
+from lab_common.prompt_layout import run_instructions, describe_cache
+from lab_common.profiling import run_profiled, phase
+from lab_common.run_scheduler import SCHEDULER
+from lab_common.run_metrics import METRICS, count_tool_calls, run_phases, serve_from_env
 
 # Load environment variables
 load_dotenv()
@@ -36,12 +43,12 @@ def get_client():
     return OpenAI(**client_kwargs)
 
 def load_assistant_id():
-    """Load assistant ID from .assistant file."""
-    assistant_file = Path(".assistant")
-    if not assistant_file.exists():
+    """Load assistant ID from the local state store."""
+    assistant_id = get_store().get("assistant_id")
+    if not assistant_id:
         print("❌ No assistant found. Please run: python scripts/00_init_assistant.py")
         sys.exit(1)
-    return assistant_file.read_text().strip()
+    return assistant_id
 
 def create_thread_with_messages(client):
     """Create a thread and add sample messages."""
@@ -64,46 +71,68 @@ def create_thread_with_messages(client):
     print(f"✅ Thread created: {thread.id}")
     return thread
 
-def demonstrate_polling_run(client, assistant_id, thread_id):
-    """Demonstrate run creation with polling until completion."""
+def demonstrate_polling_run(client, assistant_id, thread_id, dispatcher=None, budget=None):
+    """Demonstrate run creation with polling until completion.
+    
+    When the run reaches requires_action, the requested tool calls are
+    executed by the optional ToolDispatcher and submitted back. An optional
+    ContextBudget caps the prompt and records its size.
+    """
     print("\n🔄 Starting run with polling...")
     
     start_time = time.time()
     
-    # Create and start run
-    run = client.beta.threads.runs.create(
-        thread_id=thread_id,
-        assistant_id=assistant_id,
-        instructions="Please provide clear, educational explanations suitable for someone learning the API."
-    )
+    # The run holds an interactive scheduler slot until it reaches a terminal state
+    with SCHEDULER.slot("interactive"):
+        # Create and start run
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            **run_instructions("Please provide clear, educational explanations suitable for someone learning the API."),
+            **(budget.run_kwargs() if budget else {})
+        )
     
-    print(f"🚀 Run started: {run.id}")
-    print(f"📊 Initial status: {run.status}")
+        print(f"🚀 Run started: {run.id}")
+        print(f"📊 Initial status: {run.status}")
     
-    # Poll until completion
-    while run.status in ["queued", "in_progress", "requires_action"]:
-        time.sleep(1)
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
-        print(f"⏳ Status: {run.status}")
+        # Poll until completion
+        function_calls = 0
+        while run.status in ["queued", "in_progress", "requires_action"]:
+            time.sleep(1)
+            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+            print(f"⏳ Status: {run.status}")
         
-        if run.status == "requires_action":
-            print("🔧 Run requires action (tool calls)")
-            # In a real scenario, you'd handle tool calls here
-            break
+            if run.status == "requires_action":
+                print("🔧 Run requires action (tool calls)")
+                if dispatcher is None:
+                    print("⚠️  No local tools registered - leaving run in requires_action")
+                    break
+                function_calls += len(run.required_action.submit_tool_outputs.tool_calls)
+                run = dispatcher.resolve(client, thread_id, run)
     
     end_time = time.time()
     duration = end_time - start_time
     
     print(f"✅ Run completed in {duration:.2f} seconds")
     print(f"📊 Final status: {run.status}")
+    phases = run_phases(run, duration)
+    if "execution" in phases:
+        print(f"⏱️  Queue wait {phases['queue_wait']:.0f}s, execution {phases['execution']:.0f}s, "
+              f"client overhead {phases['client_overhead']:.2f}s")
+    tool_calls = count_tool_calls(client, thread_id, run.id) if METRICS.enabled else None
+    METRICS.observe_run(run, duration, tool_calls or ({"function": function_calls} if function_calls else None))
     
     if run.usage:
         print(f"💰 Token usage: {run.usage.total_tokens} total "
               f"({run.usage.prompt_tokens} prompt + {run.usage.completion_tokens} completion)")
+        print(f"🧊 Prompt cache: {describe_cache(run.usage)}")
+    if budget:
+        budget.record(run)
+        print(f"📏 Context: {budget.describe()}")
     
     return run
 
-def demonstrate_streaming_run(client, assistant_id, thread_id):
+def demonstrate_streaming_run(client, assistant_id, thread_id, budget=None):
     """Demonstrate streaming run with real-time token display."""
     print("\n🌊 Starting streaming run...")
     
@@ -117,32 +146,38 @@ def demonstrate_streaming_run(client, assistant_id, thread_id):
     print("📡 Streaming response:")
     print("-" * 50)
     
-    # Create streaming run
-    stream = client.beta.threads.runs.create(
-        thread_id=thread_id,
-        assistant_id=assistant_id,
-        stream=True,
-        instructions="Provide a concise but practical example with code snippets if helpful."
-    )
-    
-    full_response = ""
-    for event in stream:
-        if event.event == "thread.message.delta":
-            if hasattr(event.data.delta, 'content') and event.data.delta.content:
-                for content in event.data.delta.content:
-                    if hasattr(content, 'text') and hasattr(content.text, 'value'):
-                        chunk = content.text.value
-                        print(chunk, end="", flush=True)
-                        full_response += chunk
-        elif event.event == "thread.run.completed":
-            print(f"\n\n✅ Streaming completed")
-            if hasattr(event.data, 'usage') and event.data.usage:
-                usage = event.data.usage
-                print(f"💰 Token usage: {usage.total_tokens} total "
-                      f"({usage.prompt_tokens} prompt + {usage.completion_tokens} completion)")
+    # Created before the request so time to first token includes it
+    renderer = StreamRenderer()
+
+    # Create streaming run; its slot is held until the stream ends
+    with SCHEDULER.slot("interactive"):
+        stream = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            stream=True,
+            **run_instructions("Provide a concise but practical example with code snippets if helpful."),
+            **(budget.run_kwargs() if budget else {})
+        )
+
+        with phase("stream_events"):
+            run = renderer.consume(stream)
+    if run is not None:
+        METRICS.observe_run(run, renderer.clock() - renderer.started_at)
+
+    if run is not None and run.status == "completed":
+        print(f"\n\n✅ Streaming completed (first token after {renderer.ttft or 0:.2f}s)")
+        if run.usage:
+            print(f"💰 Token usage: {run.usage.total_tokens} total "
+                  f"({run.usage.prompt_tokens} prompt + {run.usage.completion_tokens} completion)")
+            print(f"🧊 Prompt cache: {describe_cache(run.usage)}")
+    else:
+        print(f"\n\n⚠️  Streaming ended with status: {run.status if run else 'unknown'}")
+    if budget and run is not None:
+        budget.record(run)
+        print(f"📏 Context: {budget.describe()}")
     
     print("-" * 50)
-    return full_response
+    return renderer.text
 
 def retrieve_thread_messages(client, thread_id):
     """Retrieve and display all messages in the thread."""
@@ -196,30 +231,35 @@ def main():
     client = get_client()
     assistant_id = load_assistant_id()
     print(f"✅ Using assistant: {assistant_id}")
+    serve_from_env()
     
     # 1. Create thread with messages
     thread = create_thread_with_messages(client)
     
+    # Every run on the shared thread gets the same prompt budget
+    budget = ContextBudget()
+    
     # 2. Demonstrate polling run
-    run = demonstrate_polling_run(client, assistant_id, thread.id)
+    run = demonstrate_polling_run(client, assistant_id, thread.id, budget=budget)
     
     # 3. Show run steps for debugging
     demonstrate_run_steps(client, thread.id, run.id)
     
     # 4. Demonstrate streaming run
-    demonstrate_streaming_run(client, assistant_id, thread.id)
+    demonstrate_streaming_run(client, assistant_id, thread.id, budget=budget)
+    print(f"📈 Prompt tokens per turn: {budget.prompt_tokens}")
     
     # 5. Show final conversation
     retrieve_thread_messages(client, thread.id)
     
     # Save thread ID for potential cleanup
-    thread_file = Path(".last_thread")
-    thread_file.write_text(thread.id)
+    store = get_store()
+    store.set("last_thread_id", thread.id)
     
     print(f"\n🎯 Lab Complete!")
-    print(f"   Thread ID saved to: {thread_file}")
+    print(f"   Thread ID saved to: {store.path} (profile: {store.profile})")
     print(f"   Next: python scripts/02_structured_output.py")
     print(f"   Cleanup: python scripts/99_cleanup.py")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_profiled("01_responses_api", main)
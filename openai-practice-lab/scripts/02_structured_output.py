@@ -13,11 +13,18 @@ Docs: https://platform.openai.com/docs/guides/structured-output
 import os
 import sys
 import json
+import time
 from pathlib import Path
 from typing import List, Optional
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.state_store import get_store
 from pydantic import BaseModel, Field
+from tool_dispatcher import ToolDispatcher
+from lab_common.prompt_layout import run_instructions
+from lab_common.run_scheduler import SCHEDULER
+from lab_common.run_metrics import METRICS
+from lab_common.profiling import run_profiled
 
 # Load environment variables
 load_dotenv()
@@ -56,12 +63,12 @@ def get_client():
     return OpenAI(**client_kwargs)
 
 def load_assistant_id():
-    """Load assistant ID from .assistant file."""
-    assistant_file = Path(".assistant")
-    if not assistant_file.exists():
+    """Load assistant ID from the local state store."""
+    assistant_id = get_store().get("assistant_id")
+    if not assistant_id:
         print("❌ No assistant found. Please run: python scripts/00_init_assistant.py")
         sys.exit(1)
-    return assistant_file.read_text().strip()
+    return assistant_id
 
 def demonstrate_json_mode(client, assistant_id):
     """Demonstrate basic JSON mode without strict schema validation."""
@@ -79,12 +86,19 @@ def demonstrate_json_mode(client, assistant_id):
     )
     
     # Run with JSON mode
-    run = client.beta.threads.runs.create_and_poll(
-        thread_id=thread.id,
-        assistant_id=assistant_id,
-        response_format={"type": "json_object"},
-        instructions="Always respond with valid JSON. Use clear, structured data."
-    )
+    with SCHEDULER.slot("interactive"):
+        start = time.perf_counter()
+        try:
+            run = client.beta.threads.runs.create_and_poll(
+                thread_id=thread.id,
+                assistant_id=assistant_id,
+                response_format={"type": "json_object"},
+                **run_instructions("Always respond with valid JSON. Use clear, structured data.")
+            )
+        except Exception as e:
+            METRICS.observe_exception(assistant_id, e)
+            raise
+        METRICS.observe_run(run, time.perf_counter() - start)
     
     if run.status == "completed":
         messages = client.beta.threads.messages.list(thread_id=thread.id)
@@ -114,62 +128,68 @@ def demonstrate_json_mode(client, assistant_id):
         print(f"❌ Run failed with status: {run.status}")
         return None
 
+# Function tool schema mirroring the TechAnalysis model
+ANALYZE_TECH_CONCEPT_SCHEMA = {
+    "name": "analyze_tech_concept",
+    "description": "Analyze a programming or technology concept",
+    "strict": True,
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "concept": {
+                "type": "string",
+                "description": "The programming concept being analyzed"
+            },
+            "difficulty_level": {
+                "type": "string",
+                "enum": ["Beginner", "Intermediate", "Advanced"],
+                "description": "Difficulty level"
+            },
+            "key_benefits": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Main advantages of this concept"
+            },
+            "common_pitfalls": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Common mistakes to avoid"
+            },
+            "use_cases": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Practical applications"
+            },
+            "learning_resources": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Recommended learning materials"
+            }
+        },
+        "required": ["concept", "difficulty_level", "key_benefits", "common_pitfalls", "use_cases"],
+        "additionalProperties": False
+    }
+}
+
+def build_tool_dispatcher(captured):
+    """Register local tools; validated TechAnalysis results are appended to captured."""
+    dispatcher = ToolDispatcher()
+    
+    def analyze_tech_concept(**arguments):
+        analysis = TechAnalysis(**arguments)
+        captured.append(analysis)
+        return {"status": "recorded", "concept": analysis.concept}
+    
+    dispatcher.register(ANALYZE_TECH_CONCEPT_SCHEMA, analyze_tech_concept)
+    return dispatcher
+
 def demonstrate_function_tools_strict(client, assistant_id):
     """Demonstrate function tools with strict schema validation."""
     print("\n🎯 Demonstrating Function Tools (Strict Schema)")
     print("-" * 50)
     
-    # Create assistant with function tool
-    function_schema = {
-        "name": "analyze_tech_concept",
-        "description": "Analyze a programming or technology concept",
-        "strict": True,
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "concept": {
-                    "type": "string",
-                    "description": "The programming concept being analyzed"
-                },
-                "difficulty_level": {
-                    "type": "string",
-                    "enum": ["Beginner", "Intermediate", "Advanced"],
-                    "description": "Difficulty level"
-                },
-                "key_benefits": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Main advantages of this concept"
-                },
-                "common_pitfalls": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Common mistakes to avoid"
-                },
-                "use_cases": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Practical applications"
-                },
-                "learning_resources": {
-                    "type": "array",
-                    "items": {"type": "string"},
-                    "description": "Recommended learning materials"
-                }
-            },
-            "required": ["concept", "difficulty_level", "key_benefits", "common_pitfalls", "use_cases"],
-            "additionalProperties": False
-        }
-    }
-    
-    # Update assistant with function tool
-    client.beta.assistants.update(
-        assistant_id=assistant_id,
-        tools=[
-            {"type": "file_search"},
-            {"type": "function", "function": function_schema}
-        ]
-    )
+    captured = []
+    dispatcher = build_tool_dispatcher(captured)
     
     # Create thread for function demo
     thread = client.beta.threads.create(
@@ -179,40 +199,30 @@ def demonstrate_function_tools_strict(client, assistant_id):
         }]
     )
     
-    # Run with function calling
-    run = client.beta.threads.runs.create_and_poll(
-        thread_id=thread.id,
-        assistant_id=assistant_id,
-        instructions="Use the analyze_tech_concept function to provide a structured analysis."
+    # Stream the run; tool calls are executed locally and submitted back as they arrive.
+    # Tools are overridden for this run only, so the shared assistant is never modified.
+    run = dispatcher.stream_run(
+        client,
+        thread.id,
+        assistant_id,
+        tools=[{"type": "file_search"}] + dispatcher.tools,
+        **run_instructions("Use the analyze_tech_concept function to provide a structured analysis.")
     )
     
     if run.status == "completed":
-        # Get run steps to find function calls
-        steps = client.beta.threads.runs.steps.list(thread_id=thread.id, run_id=run.id)
-        
-        for step in steps.data:
-            if step.type == "tool_calls":
-                for tool_call in step.step_details.tool_calls:
-                    if tool_call.type == "function":
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        print("📋 Function Call Arguments:")
-                        print(json.dumps(function_args, indent=2))
-                        
-                        # Validate with Pydantic
-                        try:
-                            tech_analysis = TechAnalysis(**function_args)
-                            print("\n✅ Strict schema validation successful!")
-                            print(f"📊 Concept: {tech_analysis.concept}")
-                            print(f"📊 Difficulty: {tech_analysis.difficulty_level}")
-                            print(f"📊 Benefits: {len(tech_analysis.key_benefits)} items")
-                            print(f"📊 Pitfalls: {len(tech_analysis.common_pitfalls)} items")
-                            return tech_analysis
-                        except Exception as e:
-                            print(f"❌ Pydantic validation failed: {e}")
-                            return function_args
+        if captured:
+            tech_analysis = captured[-1]
+            print("📋 Function Call Arguments:")
+            print(tech_analysis.model_dump_json(indent=2))
+            
+            print("\n✅ Strict schema validation successful!")
+            print(f"📊 Concept: {tech_analysis.concept}")
+            print(f"📊 Difficulty: {tech_analysis.difficulty_level}")
+            print(f"📊 Benefits: {len(tech_analysis.key_benefits)} items")
+            print(f"📊 Pitfalls: {len(tech_analysis.common_pitfalls)} items")
+            return tech_analysis
         
-        print("⚠️  No function calls found in run steps")
+        print("⚠️  No valid function calls were made during the run")
         return None
     else:
         print(f"❌ Run failed with status: {run.status}")
@@ -252,13 +262,6 @@ def compare_approaches(json_result, function_result):
     print("  • Function Tools (Strict): Guaranteed schema compliance")
     print("  • Use Function Tools for production applications requiring exact structure")
 
-def reset_assistant_tools(client, assistant_id):
-    """Reset assistant tools to original state."""
-    client.beta.assistants.update(
-        assistant_id=assistant_id,
-        tools=[{"type": "file_search"}]
-    )
-
 def main():
     """Main function to run the structured output lab."""
     print("🚀 OpenAI Practice Lab - Structured Output")
@@ -269,24 +272,18 @@ def main():
     assistant_id = load_assistant_id()
     print(f"✅ Using assistant: {assistant_id}")
     
-    try:
-        # 1. Demonstrate JSON mode
-        json_result = demonstrate_json_mode(client, assistant_id)
-        
-        # 2. Demonstrate function tools with strict schema
-        function_result = demonstrate_function_tools_strict(client, assistant_id)
-        
-        # 3. Compare approaches
-        compare_approaches(json_result, function_result)
-        
-        print(f"\n🎯 Lab Complete!")
-        print(f"   Next: python scripts/03_rag_file_search.py")
-        print(f"   Cleanup: python scripts/99_cleanup.py")
-        
-    finally:
-        # Reset assistant tools to original state
-        reset_assistant_tools(client, assistant_id)
-        print("🔄 Assistant tools reset to original state")
+    # 1. Demonstrate JSON mode
+    json_result = demonstrate_json_mode(client, assistant_id)
+    
+    # 2. Demonstrate function tools with strict schema
+    function_result = demonstrate_function_tools_strict(client, assistant_id)
+    
+    # 3. Compare approaches
+    compare_approaches(json_result, function_result)
+    
+    print(f"\n🎯 Lab Complete!")
+    print(f"   Next: python scripts/03_rag_file_search.py")
+    print(f"   Cleanup: python scripts/99_cleanup.py")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_profiled("02_structured_output", main)
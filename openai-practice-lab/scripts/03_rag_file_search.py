@@ -5,7 +5,10 @@
 End-to-end RAG demonstration using OpenAI's built-in file_search tool.
 No external vector DB required - OpenAI hosts the vector store.
 
-Usage: python scripts/03_rag_file_search.py
+Usage:
+    python scripts/03_rag_file_search.py
+    python scripts/03_rag_file_search.py --async                       # all queries at once, prefixed lines
+    python scripts/03_rag_file_search.py --async --output-dir rag_out  # one file per query
 
 Docs: https://platform.openai.com/docs/tools/file-search
 """
@@ -13,14 +16,43 @@ Docs: https://platform.openai.com/docs/tools/file-search
 import os
 import sys
 import json
+import argparse
+import time
+import asyncio
+import hashlib
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from lab_common.state_store import get_store
+from lab_common.multipart_upload import should_use_multipart, upload_file_multipart
+from lab_common.citations import CitationResolver
+from stream_renderer import StreamRenderer, PrefixedLineWriter
+from lab_common.prompt_layout import run_instructions, cached_tokens, describe_cache, CacheTally
+from lab_common.profiling import run_profiled, phase
+from lab_common.run_metrics import METRICS, tool_call_counts, serve_from_env
+from lab_common.run_scheduler import SCHEDULER
 
 # Load environment variables
 load_dotenv()
 
-def get_client():
+# Ask the run to return retrieved chunk content alongside its file_search steps
+FILE_SEARCH_INCLUDE = ["step_details.tool_calls[*].file_search.results[*].content"]
+RETRIEVAL_LOG = Path(__file__).resolve().parent.parent / "retrieval_log.jsonl"
+
+RAG_QUERIES = [
+    "What are the key characteristics of Large Language Models?",
+    "What are the best practices for API key management?",
+    "How should I handle rate limiting when using APIs?",
+    "What are the limitations of LLMs that I should be aware of?",
+    "Can you compare different LLM models mentioned in the documents?"
+]
+RAG_INSTRUCTIONS = ("Use the file_search tool to find relevant information from the uploaded documents. "
+                    "Always cite your sources and provide specific references.")
+
+def rag_message(query):
+    return f"{query}\n\nPlease provide a comprehensive answer based on the uploaded documents and include specific citations."
+
+def get_client(client_class=OpenAI):
     """Initialize OpenAI client with API key from environment."""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -32,15 +64,15 @@ def get_client():
     if org_id:
         client_kwargs["organization"] = org_id
     
-    return OpenAI(**client_kwargs)
+    return client_class(**client_kwargs)
 
 def load_assistant_id():
-    """Load assistant ID from .assistant file."""
-    assistant_file = Path(".assistant")
-    if not assistant_file.exists():
+    """Load assistant ID from the local state store."""
+    assistant_id = get_store().get("assistant_id")
+    if not assistant_id:
         print("❌ No assistant found. Please run: python scripts/00_init_assistant.py")
         sys.exit(1)
-    return assistant_file.read_text().strip()
+    return assistant_id
 
 def create_sample_documents():
     """Create sample documents for RAG demonstration."""
@@ -258,24 +290,34 @@ def upload_documents(client, file_paths):
     for file_path in file_paths:
         print(f"  Uploading: {file_path.name}")
         
-        with open(file_path, "rb") as file:
-            uploaded_file = client.files.create(
-                file=file,
-                purpose="assistants"
-            )
+        if should_use_multipart(file_path):
+            # Resumable, parallel upload for large documents
+            uploaded_file = upload_file_multipart(client, file_path, purpose="assistants")
+        else:
+            with open(file_path, "rb") as file:
+                uploaded_file = client.files.create(
+                    file=file,
+                    purpose="assistants"
+                )
         
         uploaded_files.append(uploaded_file)
         print(f"  ✅ File ID: {uploaded_file.id}")
     
     return uploaded_files
 
-def create_vector_store(client, uploaded_files):
-    """Create a vector store and add files to it."""
+def create_vector_store(client, uploaded_files, chunking_strategy=None,
+                        name="Practice Lab Knowledge Base"):
+    """Create a vector store and add files to it.
+    
+    chunking_strategy is passed through to the file batch, e.g.
+    {"type": "static", "static": {"max_chunk_size_tokens": 400, "chunk_overlap_tokens": 100}}.
+    The default (None) keeps the API's automatic chunking.
+    """
     print("\n🗂️  Creating vector store...")
     
     # Create vector store
     vector_store = client.vector_stores.create(
-        name="Practice Lab Knowledge Base",
+        name=name,
         expires_after={
             "anchor": "last_active_at",
             "days": 7
@@ -284,10 +326,15 @@ def create_vector_store(client, uploaded_files):
     
     print(f"✅ Vector store created: {vector_store.id}")
     
+    batch_kwargs = {}
+    if chunking_strategy:
+        batch_kwargs["chunking_strategy"] = chunking_strategy
+    
     # Add files to vector store
     file_batch = client.vector_stores.file_batches.create_and_poll(
         vector_store_id=vector_store.id,
-        file_ids=[file.id for file in uploaded_files]
+        file_ids=[file.id for file in uploaded_files],
+        **batch_kwargs
     )
     
     print(f"📊 File batch status: {file_batch.status}")
@@ -311,87 +358,225 @@ def attach_vector_store_to_assistant(client, assistant_id, vector_store_id):
     print("✅ Vector store attached to assistant")
     return assistant
 
+def extract_file_search_results(run_steps):
+    """Collect retrieved chunks from the file_search tool calls of a run."""
+    chunks = []
+    for step in run_steps:
+        if step.type != "tool_calls":
+            continue
+        for tool_call in step.step_details.tool_calls:
+            if tool_call.type != "file_search" or not tool_call.file_search:
+                continue
+            for result in tool_call.file_search.results or []:
+                text = "".join(part.text or "" for part in (result.content or []))
+                # The API does not expose chunk ids, so derive a stable one from the chunk text
+                chunk_id = hashlib.sha1(f"{result.file_id}:{text}".encode()).hexdigest()[:12]
+                chunks.append({
+                    "chunk_id": chunk_id,
+                    "file_id": result.file_id,
+                    "file_name": result.file_name,
+                    "score": result.score,
+                    "chars": len(text)
+                })
+    return chunks
+
+def append_retrieval_log(entry, log_path=RETRIEVAL_LOG):
+    """Append one query's retrieval record to the JSONL retrieval log."""
+    with open(log_path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def report_query_result(query, thread_id, run, message, run_steps, citation_resolver, timings=None):
+    """Print one query's answer, citations and retrieval, log it, and return its results entry."""
+    if run.status != "completed" or message is None:
+        print(f"❌ Query failed with status: {run.status}")
+        return dict(timings or {}, query=query, status=run.status, thread_id=thread_id)
+    
+    # Get the response
+    text = message.content[0].text
+    response = text.value
+    
+    print("🤖 Assistant Response:")
+    print(response[:300] + ("..." if len(response) > 300 else ""))
+    
+    # Check for citations
+    annotations = text.annotations
+    if annotations:
+        print(f"\n📚 Citations found: {len(annotations)}")
+        for line in citation_resolver.render(annotations)[:3]:  # Show first 3
+            print(f"  {line}")
+    
+    # Retrieval details come from the streamed run steps, no extra steps.list call
+    chunks = extract_file_search_results(run_steps)
+    file_search_used = any(
+        tool_call.type == "file_search"
+        for step in run_steps if step.type == "tool_calls"
+        for tool_call in step.step_details.tool_calls
+    )
+    
+    if file_search_used:
+        print(f"🔍 file_search tool was used ({len(chunks)} chunks retrieved)")
+        for chunk in chunks[:3]:
+            print(f"  • {chunk['file_name']} chunk {chunk['chunk_id']} "
+                  f"(score {chunk['score']:.3f}, {chunk['chars']} chars)")
+    else:
+        print("⚠️  file_search tool was not used")
+    print(f"🧊 Prompt cache: {describe_cache(run.usage)}")
+    
+    append_retrieval_log(dict(timings or {}, **{
+        "query": query,
+        "thread_id": thread_id,
+        "run_id": run.id,
+        "prompt_tokens": run.usage.prompt_tokens if run.usage else None,
+        "cached_tokens": cached_tokens(run.usage),
+        "chunks": chunks
+    }))
+    
+    return dict(timings or {}, **{
+        "query": query,
+        "response_length": len(response),
+        "file_search_used": file_search_used,
+        "retrieved_chunks": len(chunks),
+        "retrieved_chars": sum(chunk["chars"] for chunk in chunks),
+        "prompt_tokens": run.usage.prompt_tokens if run.usage else None,
+        "cached_tokens": cached_tokens(run.usage),
+        "thread_id": thread_id
+    })
+
 def demonstrate_rag_queries(client, assistant_id):
     """Demonstrate RAG queries with file_search."""
     print("\n🔍 Demonstrating RAG Queries")
     print("=" * 40)
     
-    queries = [
-        "What are the key characteristics of Large Language Models?",
-        "What are the best practices for API key management?",
-        "How should I handle rate limiting when using APIs?",
-        "What are the limitations of LLMs that I should be aware of?",
-        "Can you compare different LLM models mentioned in the documents?"
-    ]
-    
     results = []
+    citation_resolver = CitationResolver(client)
     
-    for i, query in enumerate(queries, 1):
+    for i, query in enumerate(RAG_QUERIES, 1):
         print(f"\n📝 Query {i}: {query}")
         print("-" * 50)
         
         # Create thread for this query
         thread = client.beta.threads.create(
-            messages=[{
-                "role": "user",
-                "content": f"{query}\n\nPlease provide a comprehensive answer based on the uploaded documents and include specific citations."
-            }]
+            messages=[{"role": "user", "content": rag_message(query)}]
         )
         
-        # Run with file_search
-        run = client.beta.threads.runs.create_and_poll(
+        # Stream the run so file_search results arrive inline with the run steps.
+        # Query sweeps are bulk work in the run scheduler.
+        with SCHEDULER.slot("bulk"):
+            start = time.perf_counter()
+            try:
+                with client.beta.threads.runs.stream(
+                    thread_id=thread.id,
+                    assistant_id=assistant_id,
+                    include=FILE_SEARCH_INCLUDE,
+                    **run_instructions(RAG_INSTRUCTIONS)
+                ) as stream:
+                    stream.until_done()
+                    run = stream.get_final_run()
+                    run_steps = stream.get_final_run_steps()
+                    messages = stream.get_final_messages()
+            except Exception as e:
+                METRICS.observe_exception(assistant_id, e)
+                raise
+            METRICS.observe_run(run, time.perf_counter() - start, tool_call_counts(run_steps))
+        
+        results.append(report_query_result(
+            query, thread.id, run, messages[-1] if messages else None, run_steps, citation_resolver
+        ))
+    
+    return results
+
+async def stream_rag_query(async_client, assistant_id, index, query, out):
+    """Run one query as a streaming run, writing its answer to out as it arrives.
+
+    Queries wait for a bulk slot in the run scheduler, so the fan-out stays
+    under bulk's share of concurrent runs; timings start once a slot is held.
+    """
+    async with SCHEDULER.aslot("bulk"):
+        renderer = StreamRenderer(out=out)
+        thread = await async_client.beta.threads.create(
+            messages=[{"role": "user", "content": rag_message(query)}]
+        )
+        stream = await async_client.beta.threads.runs.create(
             thread_id=thread.id,
             assistant_id=assistant_id,
-            instructions="Use the file_search tool to find relevant information from the uploaded documents. Always cite your sources and provide specific references."
+            include=FILE_SEARCH_INCLUDE,
+            stream=True,
+            **run_instructions(RAG_INSTRUCTIONS)
         )
-        
-        if run.status == "completed":
-            # Get the response
-            messages = client.beta.threads.messages.list(thread_id=thread.id)
-            response = messages.data[0].content[0].text.value
-            
-            print("🤖 Assistant Response:")
-            print(response[:300] + ("..." if len(response) > 300 else ""))
-            
-            # Check for citations
-            if hasattr(messages.data[0].content[0].text, 'annotations'):
-                annotations = messages.data[0].content[0].text.annotations
-                if annotations:
-                    print(f"\n📚 Citations found: {len(annotations)}")
-                    for j, annotation in enumerate(annotations[:3], 1):  # Show first 3
-                        if hasattr(annotation, 'file_citation'):
-                            print(f"  {j}. File: {annotation.file_citation.file_id}")
-            
-            # Analyze run steps for file_search usage
-            steps = client.beta.threads.runs.steps.list(thread_id=thread.id, run_id=run.id)
-            file_search_used = False
-            
-            for step in steps.data:
-                if step.type == "tool_calls":
-                    for tool_call in step.step_details.tool_calls:
-                        if tool_call.type == "file_search":
-                            file_search_used = True
-                            print("🔍 file_search tool was used")
-                            break
-            
-            if not file_search_used:
-                print("⚠️  file_search tool was not used")
-            
-            results.append({
-                "query": query,
-                "response_length": len(response),
-                "file_search_used": file_search_used,
-                "thread_id": thread.id
-            })
-        
-        else:
-            print(f"❌ Query failed with status: {run.status}")
-            results.append({
-                "query": query,
-                "status": run.status,
-                "thread_id": thread.id
-            })
+        run = await renderer.aconsume(stream)
+        latency = renderer.clock() - renderer.started_at
+    if run is not None:
+        METRICS.observe_run(run, latency, tool_call_counts(renderer.run_steps))
+    return {
+        "index": index,
+        "query": query,
+        "thread_id": thread.id,
+        "run": run,
+        "message": renderer.messages[-1] if renderer.messages else None,
+        "run_steps": renderer.run_steps,
+        "ttft_s": renderer.ttft,
+        "latency_s": latency
+    }
+
+async def _gather_rag_queries(assistant_id, writers):
+    async_client = get_client(AsyncOpenAI)
+    try:
+        return await asyncio.gather(*(
+            stream_rag_query(async_client, assistant_id, i, query, writers[i - 1])
+            for i, query in enumerate(RAG_QUERIES, 1)
+        ), return_exceptions=True)
+    finally:
+        await async_client.close()
+
+def demonstrate_rag_queries_async(client, assistant_id, output_dir=None):
+    """Run every RAG query concurrently as streaming runs.
+    
+    Answers stream to stdout as lines prefixed with [q<n>], or to one file per
+    query under output_dir. TTFT, latency and file_search usage are recorded
+    per query; wall-clock time is roughly that of the slowest query.
+    """
+    print(f"\n🔍 Demonstrating RAG Queries (concurrent, {len(RAG_QUERIES)} streams)")
+    print("=" * 40)
     
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        writers = [open(Path(output_dir) / f"query_{i}.md", "w") for i in range(1, len(RAG_QUERIES) + 1)]
+    else:
+        writers = [PrefixedLineWriter(f"[q{i}] ") for i in range(1, len(RAG_QUERIES) + 1)]
+    
+    start = time.perf_counter()
+    try:
+        outcomes = asyncio.run(_gather_rag_queries(assistant_id, writers))
+    finally:
+        for writer in writers:
+            writer.close()
+    wall_clock = time.perf_counter() - start
+    
+    results = []
+    citation_resolver = CitationResolver(client)
+    for i, (query, outcome) in enumerate(zip(RAG_QUERIES, outcomes), 1):
+        print(f"\n📝 Query {i}: {query}")
+        print("-" * 50)
+        if isinstance(outcome, Exception):
+            print(f"❌ Query failed: {outcome}")
+            results.append({"query": query, "status": "error", "error": str(outcome)})
+            continue
+        if outcome["run"] is None:
+            print("❌ Stream ended without a final run")
+            results.append({"query": query, "status": "incomplete", "thread_id": outcome["thread_id"]})
+            continue
+        timings = {"ttft_s": outcome["ttft_s"], "latency_s": outcome["latency_s"]}
+        ttft = f"{outcome['ttft_s']:.2f}s" if outcome["ttft_s"] is not None else "-"
+        print(f"⏱️  TTFT {ttft}, total {outcome['latency_s']:.2f}s")
+        results.append(report_query_result(
+            query, outcome["thread_id"], outcome["run"], outcome["message"],
+            outcome["run_steps"], citation_resolver, timings
+        ))
+    
+    slowest = max((r["latency_s"] for r in results if "latency_s" in r), default=0)
+    print(f"\n⏱️  Wall clock {wall_clock:.2f}s for {len(RAG_QUERIES)} queries (slowest query {slowest:.2f}s)")
+    if output_dir:
+        print(f"📂 Answers written to {output_dir}/")
     return results
 
 def analyze_rag_performance(results):
@@ -410,6 +595,23 @@ def analyze_rag_performance(results):
         print(f"📏 Average response length: {avg_response_length:.0f} characters")
         print(f"🔍 file_search usage: {file_search_usage}/{len(successful_queries)} queries")
         
+        avg_chunks = sum(r["retrieved_chunks"] for r in successful_queries) / len(successful_queries)
+        avg_chars = sum(r["retrieved_chars"] for r in successful_queries) / len(successful_queries)
+        print(f"📦 Average retrieved context: {avg_chunks:.1f} chunks, {avg_chars:.0f} characters")
+        print(f"🗒️  Retrieval log: {RETRIEVAL_LOG}")
+        
+        tally = CacheTally()
+        for r in successful_queries:
+            tally.add(r.get("prompt_tokens"), r.get("cached_tokens"))
+        print(f"🧊 Prompt cache: {tally.describe()}")
+        
+        timed = [r for r in successful_queries if r.get("latency_s") is not None]
+        if timed:
+            ttfts = [r["ttft_s"] for r in timed if r.get("ttft_s") is not None]
+            print(f"⏱️  Latency: avg {sum(r['latency_s'] for r in timed) / len(timed):.2f}s, "
+                  f"max {max(r['latency_s'] for r in timed):.2f}s"
+                  + (f"; TTFT avg {sum(ttfts) / len(ttfts):.2f}s" if ttfts else ""))
+        
         print("\n💡 Key Insights:")
         print("  • file_search automatically retrieves relevant document chunks")
         print("  • Citations provide traceability to source documents")
@@ -435,8 +637,19 @@ def cleanup_resources(client, uploaded_files, vector_store_id):
     except Exception as e:
         print(f"⚠️  Could not delete vector store {vector_store_id}: {e}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end RAG with file_search.")
+    parser.add_argument("--async", dest="concurrent", action="store_true",
+                        help="run every query at once as concurrent streams")
+    parser.add_argument("--output-dir", help="with --async, write each answer to <dir>/query_<n>.md")
+    args = parser.parse_args(argv)
+    if args.output_dir and not args.concurrent:
+        parser.error("--output-dir requires --async")
+    return args
+
 def main():
     """Main function to run the RAG file_search lab."""
+    args = parse_args()
     print("🚀 OpenAI Practice Lab - RAG with file_search")
     print("=" * 50)
     
@@ -444,6 +657,7 @@ def main():
     client = get_client()
     assistant_id = load_assistant_id()
     print(f"✅ Using assistant: {assistant_id}")
+    serve_from_env()
     
     uploaded_files = None
     vector_store = None
@@ -457,12 +671,17 @@ def main():
         
         # 3. Create vector store
         vector_store = create_vector_store(client, uploaded_files)
+        get_store().set("vector_store_id", vector_store.id)
         
         # 4. Attach vector store to assistant
         attach_vector_store_to_assistant(client, assistant_id, vector_store.id)
         
         # 5. Demonstrate RAG queries
-        results = demonstrate_rag_queries(client, assistant_id)
+        with phase("queries"):
+            if args.concurrent:
+                results = demonstrate_rag_queries_async(client, assistant_id, args.output_dir)
+            else:
+                results = demonstrate_rag_queries(client, assistant_id)
         
         # 6. Analyze performance
         analyze_rag_performance(results)
@@ -482,4 +701,4 @@ def main():
             cleanup_resources(client, uploaded_files, vector_store.id)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    run_profiled("03_rag_file_search", main)
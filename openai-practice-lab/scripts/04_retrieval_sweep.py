@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+04 — Chunking & Retrieval Parameter Sweep
+
+Builds one vector store per chunking configuration (chunk size × overlap) and
+replays a question set against each one for every file_search setting
+(max_num_results × ranker score threshold). Reports prompt tokens, latency and
+citation hit rate per configuration so oversized retrieval context shows up
+in numbers instead of guesses.
+
+Usage:
+    python scripts/04_retrieval_sweep.py
+    python scripts/04_retrieval_sweep.py --questions questions.json --doc ../data/Cognitive_science.pdf [--doc more.md ...]
+
+The questions file is a JSON list of {"question": "...", "expected_file": "name.md"}
+objects; expected_file is optional and, when missing, any citation counts as a hit.
+Questions whose expected_file is not among the swept documents (the default
+questions with --doc, say) are left out of the hit rate, which reads n/a when
+no question can be scored.
+
+Docs: https://platform.openai.com/docs/assistants/tools/file-search#customizing-file-search-settings
+"""
+
+import json
+import argparse
+import time
+import importlib
+import itertools
+from pathlib import Path
+from statistics import mean, median
+
+from assistant_variants import get_assistant_variant
+from lab_common.profiling import run_profiled
+from lab_common.run_scheduler import SCHEDULER
+from lab_common.run_metrics import METRICS, tool_call_counts
+
+rag_lab = importlib.import_module("03_rag_file_search")
+
+# Sweep grid
+CHUNK_SIZES = [400, 800]
+CHUNK_OVERLAPS = [100, 200]
+MAX_NUM_RESULTS = [5, 20]
+SCORE_THRESHOLDS = [0.0, 0.5]
+
+RESULTS_FILE = Path(__file__).resolve().parent.parent / "sweep_results.json"
+
+DEFAULT_QUESTIONS = [
+    {"question": "What are the key characteristics of Large Language Models?",
+     "expected_file": "intro_to_llms.md"},
+    {"question": "What are the best practices for API key management?",
+     "expected_file": "api_best_practices.md"},
+    {"question": "How should I handle rate limiting when using APIs?",
+     "expected_file": "api_best_practices.md"},
+    {"question": "What are the limitations of LLMs that I should be aware of?",
+     "expected_file": "intro_to_llms.md"},
+]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep chunking and file_search settings over a question set.")
+    parser.add_argument("--questions", type=Path,
+                        help='JSON list of {"question": ..., "expected_file": ...} (default: the lab questions)')
+    parser.add_argument("--doc", dest="docs", type=Path, action="append", default=[],
+                        help="document to sweep; repeat for several (default: the sample documents)")
+    return parser.parse_args(argv)
+
+def load_questions(path=None):
+    """Load the question set from path or fall back to the lab defaults."""
+    if path is None:
+        return DEFAULT_QUESTIONS
+    return json.loads(path.read_text())
+
+def chunking_configs():
+    """Yield static chunking strategies for the grid, skipping invalid overlaps."""
+    for size, overlap in itertools.product(CHUNK_SIZES, CHUNK_OVERLAPS):
+        # The API requires overlap to be at most half the chunk size
+        if overlap > size // 2:
+            continue
+        yield {
+            "type": "static",
+            "static": {"max_chunk_size_tokens": size, "chunk_overlap_tokens": overlap}
+        }
+
+def file_search_tool(max_num_results, score_threshold):
+    """Per-run file_search tool override for one retrieval setting."""
+    return {
+        "type": "file_search",
+        "file_search": {
+            "max_num_results": max_num_results,
+            "ranking_options": {"ranker": "auto", "score_threshold": score_threshold}
+        }
+    }
+
+# Dedicated assistant with no vector stores of its own, so only the thread's store is searched
+SWEEP_ASSISTANT_CONFIG = {
+    "name": "Retrieval Sweep Assistant",
+    "model": "gpt-4o-mini",
+    "instructions": "Answer using the attached files only. Always cite your sources.",
+    "tools": [{"type": "file_search"}]
+}
+
+def run_question(client, assistant_id, vector_store_id, question, tool):
+    """Ask one question against a vector store and measure the run."""
+    # The vector store is bound to the thread so the shared assistant stays untouched
+    thread = client.beta.threads.create(
+        messages=[{"role": "user", "content": question}],
+        tool_resources={"file_search": {"vector_store_ids": [vector_store_id]}}
+    )
+
+    # Sweeps are bulk work; the latency measured excludes waiting for a scheduler slot
+    with SCHEDULER.slot("bulk"):
+        start_time = time.perf_counter()
+        try:
+            with client.beta.threads.runs.stream(
+                thread_id=thread.id,
+                assistant_id=assistant_id,
+                tools=[tool],
+                include=rag_lab.FILE_SEARCH_INCLUDE
+            ) as stream:
+                stream.until_done()
+                run = stream.get_final_run()
+                run_steps = stream.get_final_run_steps()
+                messages = stream.get_final_messages()
+        except Exception as e:
+            METRICS.observe_exception(assistant_id, e)
+            raise
+        latency = time.perf_counter() - start_time
+    METRICS.observe_run(run, latency, tool_call_counts(run_steps))
+
+    cited_files = set()
+    if run.status == "completed" and messages:
+        for annotation in messages[-1].content[0].text.annotations:
+            if hasattr(annotation, "file_citation"):
+                cited_files.add(annotation.file_citation.file_id)
+
+    return {
+        "status": run.status,
+        "latency": latency,
+        "prompt_tokens": run.usage.prompt_tokens if run.usage else None,
+        "chunks": rag_lab.extract_file_search_results(run_steps),
+        "cited_files": cited_files
+    }
+
+def is_citation_hit(item, outcome, file_names):
+    """A hit cites the expected file, or anything at all when none is given.
+
+    Returns None when the expected file wasn't uploaded, so the question can't be scored.
+    """
+    expected = item.get("expected_file")
+    if expected and expected not in file_names.values():
+        return None
+    if not outcome["cited_files"]:
+        return False
+    if not expected:
+        return True
+    return any(file_names.get(file_id) == expected for file_id in outcome["cited_files"])
+
+def summarize(config, outcomes, hits, scored):
+    """Aggregate per-question outcomes into one row of the sweep report."""
+    completed = [o for o in outcomes if o["status"] == "completed"]
+    prompt_tokens = [o["prompt_tokens"] for o in completed if o["prompt_tokens"] is not None]
+    latencies = [o["latency"] for o in completed]
+    return {
+        **config,
+        "questions": len(outcomes),
+        "completed": len(completed),
+        "avg_prompt_tokens": mean(prompt_tokens) if prompt_tokens else None,
+        "median_latency": median(latencies) if latencies else None,
+        "max_latency": max(latencies) if latencies else None,
+        "avg_chunks": mean(len(o["chunks"]) for o in completed) if completed else None,
+        "citation_hit_rate": hits / scored if scored else None
+    }
+
+def print_report(rows):
+    """Print the sweep results as a table sorted by prompt tokens."""
+    print("\n📊 Sweep Results")
+    print("=" * 96)
+    print(f"{'chunk':>6} {'overlap':>8} {'max_res':>8} {'thresh':>7} "
+          f"{'prompt_tok':>11} {'p50_lat':>8} {'max_lat':>8} {'chunks':>7} {'hit_rate':>9}")
+
+    def fmt(value, spec, missing="-"):
+        return format(value, spec) if value is not None else missing
+
+    for row in sorted(rows, key=lambda r: r["avg_prompt_tokens"] or float("inf")):
+        print(f"{row['chunk_size']:>6} {row['chunk_overlap']:>8} {row['max_num_results']:>8} "
+              f"{row['score_threshold']:>7.2f} {fmt(row['avg_prompt_tokens'], '>11.0f')} "
+              f"{fmt(row['median_latency'], '>7.2f')}s {fmt(row['max_latency'], '>7.2f')}s "
+              f"{fmt(row['avg_chunks'], '>7.1f')} {fmt(row['citation_hit_rate'], '>9.0%', 'n/a'.rjust(9))}")
+
+def main():
+    """Main function to run the retrieval parameter sweep."""
+    args = parse_args()
+    print("🚀 OpenAI Practice Lab - Retrieval Parameter Sweep")
+    print("=" * 50)
+
+    client = rag_lab.get_client()
+    questions = load_questions(args.questions)
+    doc_paths = args.docs or rag_lab.create_sample_documents()
+    print(f"✅ {len(questions)} questions, {len(doc_paths)} documents")
+    if args.docs and not args.questions:
+        print("ℹ️  Default questions expect the sample documents; hit rate is n/a for --doc without --questions")
+
+    uploaded_files = rag_lab.upload_documents(client, doc_paths)
+    file_names = {file.id: file.filename for file in uploaded_files}
+    assistant_id = get_assistant_variant(client, SWEEP_ASSISTANT_CONFIG)
+    vector_store_ids = []
+    rows = []
+
+    try:
+        for chunking in chunking_configs():
+            static = chunking["static"]
+            vector_store = rag_lab.create_vector_store(
+                client,
+                uploaded_files,
+                chunking_strategy=chunking,
+                name=f"Sweep {static['max_chunk_size_tokens']}/{static['chunk_overlap_tokens']}"
+            )
+            vector_store_ids.append(vector_store.id)
+
+            for max_results, threshold in itertools.product(MAX_NUM_RESULTS, SCORE_THRESHOLDS):
+                config = {
+                    "chunk_size": static["max_chunk_size_tokens"],
+                    "chunk_overlap": static["chunk_overlap_tokens"],
+                    "max_num_results": max_results,
+                    "score_threshold": threshold
+                }
+                print(f"\n🔬 Config: {config}")
+                tool = file_search_tool(max_results, threshold)
+
+                outcomes = []
+                hits = scored = 0
+                for item in questions:
+                    outcome = run_question(client, assistant_id, vector_store.id,
+                                           item["question"], tool)
+                    hit = is_citation_hit(item, outcome, file_names)
+                    if hit is not None:
+                        hits += hit
+                        scored += 1
+                    outcomes.append(outcome)
+                    marker = "➖" if hit is None else "✅" if hit else "⚠️ "
+                    prompt_tokens = outcome["prompt_tokens"]
+                    tokens = f"{prompt_tokens} prompt tokens" if prompt_tokens is not None else "no usage"
+                    print(f"  {marker} {outcome['latency']:.2f}s {tokens} — {item['question'][:50]}")
+
+                rows.append(summarize(config, outcomes, hits, scored))
+
+        print_report(rows)
+        RESULTS_FILE.write_text(json.dumps(rows, indent=2))
+        print(f"\n💾 Results saved to {RESULTS_FILE}")
+
+    finally:
+        print("\n🧹 Removing sweep resources...")
+        for vector_store_id in vector_store_ids:
+            client.vector_stores.delete(vector_store_id)
+        for file in uploaded_files:
+            client.files.delete(file.id)
+        print("✅ Sweep resources removed")
+
+if __name__ == "__main__":
+    run_profiled("04_retrieval_sweep", main)
@@ -7,19 +7,39 @@ Helps maintain a clean OpenAI account and manage costs.
 
 Usage: python scripts/99_cleanup.py
 
+Vector storage is billed per GB-day, so age alone is the wrong signal for
+vector stores: a store in heavy use can be old, an abandoned one new. GC mode
+reads every store's usage_bytes and last_active_at and deletes the least
+recently used ones until total storage fits the budget. Stores named with
+--pin (or in LAB_PINNED_VECTOR_STORES) and the stores either lab's state
+file points at (every profile, hw labs and practice lab alike) are never
+touched, by either mode.
+
+    python scripts/99_cleanup.py --gc --budget-gb 1 --pin prod-handbook --dry-run
+
 Docs: https://platform.openai.com/docs/api-reference
 """
 
 import os
 import sys
+import json
 import time
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
+from lab_common.state_store import get_store
+from lab_common.profiling import run_profiled
 
 # Load environment variables
 load_dotenv()
 
+DEFAULT_BUDGET_GB = 1.0
+# Vector storage is free up to the first GB, then billed per GB-day (https://openai.com/api/pricing)
+FREE_STORAGE_GB = 1.0
+PRICE_PER_GB_DAY = 0.10
+# Labs whose state files record vector stores they still use
+LAB_DIRS = ("openai-hw-labs", "openai-practice-lab")
+
 def get_client():
     """Initialize OpenAI client with API key from environment."""
     api_key = os.getenv("OPENAI_API_KEY")
@@ -87,12 +107,39 @@ def cleanup_files(client, max_age_hours=24):
     except Exception as e:
         print(f"❌ Error cleaning up files: {e}")
 
-def cleanup_vector_stores(client, max_age_hours=24):
+def lab_state_files():
+    """State files of both labs, plus the one this process uses if LAB_STATE_FILE moved it."""
+    root = Path(__file__).resolve().parents[2]
+    return {get_store().path, *(root / lab / ".state.json" for lab in LAB_DIRS)}
+
+def lab_vector_store_ids(state_files):
+    """vector_store_id of every profile in the given state files."""
+    ids = set()
+    for path in state_files:
+        try:
+            state = json.loads(Path(path).read_text())
+        except (FileNotFoundError, ValueError):
+            continue
+        ids.update(profile.get("vector_store_id") for profile in state.values() if isinstance(profile, dict))
+    ids.discard(None)
+    return ids
+
+def pinned_vector_stores(names=(), state_files=None):
+    """Ids or names of stores no cleanup may delete: --pin values, LAB_PINNED_VECTOR_STORES and the labs' own."""
+    pinned = set(names)
+    pinned.update(n.strip() for n in os.getenv("LAB_PINNED_VECTOR_STORES", "").split(",") if n.strip())
+    pinned.update(lab_vector_store_ids(lab_state_files() if state_files is None else state_files))
+    return pinned
+
+def is_pinned(vector_store, pinned):
+    return vector_store.id in pinned or (vector_store.name or "") in pinned
+
+def cleanup_vector_stores(client, max_age_hours=24, pinned=()):
     """Clean up vector stores from lab sessions."""
     print("\n🧹 Cleaning up vector stores...")
     
     try:
-        vector_stores = client.beta.vector_stores.list()
+        vector_stores = client.vector_stores.list()
         current_time = int(time.time())
         deleted_count = 0
         
@@ -100,9 +147,9 @@ def cleanup_vector_stores(client, max_age_hours=24):
             # Calculate age in hours
             age_hours = (current_time - vs.created_at) / 3600
             
-            if age_hours > max_age_hours:
+            if age_hours > max_age_hours and not is_pinned(vs, pinned):
                 try:
-                    client.beta.vector_stores.delete(vs.id)
+                    client.vector_stores.delete(vs.id)
                     print(f"🗑️  Deleted vector store: {vs.id} ({vs.name}) (age: {age_hours:.1f}h)")
                     deleted_count += 1
                 except Exception as e:
@@ -113,16 +160,80 @@ def cleanup_vector_stores(client, max_age_hours=24):
     except Exception as e:
         print(f"❌ Error cleaning up vector stores: {e}")
 
+def storage_cost_per_day(usage_bytes):
+    """Daily cost of usage_bytes of vector storage, after the free allowance."""
+    return max(usage_bytes / 1024 ** 3 - FREE_STORAGE_GB, 0) * PRICE_PER_GB_DAY
+
+def plan_lru_eviction(vector_stores, budget_bytes, pinned=()):
+    """Least recently used unpinned stores to delete so total usage fits the budget.
+
+    Returns (to_evict, total_bytes, bytes_after).
+    """
+    total = sum(vs.usage_bytes or 0 for vs in vector_stores)
+    candidates = sorted(
+        (vs for vs in vector_stores if not is_pinned(vs, pinned)),
+        # Stores never queried fall back to their creation time
+        key=lambda vs: vs.last_active_at or vs.created_at
+    )
+    to_evict = []
+    remaining = total
+    for vs in candidates:
+        if remaining <= budget_bytes:
+            break
+        if not vs.usage_bytes:
+            continue
+        to_evict.append(vs)
+        remaining -= vs.usage_bytes
+    return to_evict, total, remaining
+
+def gc_vector_stores(client, budget_gb=DEFAULT_BUDGET_GB, pinned=(), dry_run=False):
+    """Evict least recently used vector stores until storage is under budget_gb."""
+    print(f"\n🧹 Vector store GC (budget {budget_gb:g} GB)...")
+    
+    vector_stores = list(client.vector_stores.list(limit=100))
+    budget_bytes = int(budget_gb * 1024 ** 3)
+    to_evict, total, remaining = plan_lru_eviction(vector_stores, budget_bytes, pinned)
+    current_time = int(time.time())
+    
+    print(f"📦 {len(vector_stores)} stores, {total / 1024 ** 2:.1f} MB total")
+    for vs in vector_stores:
+        if is_pinned(vs, pinned):
+            print(f"📌 Pinned: {vs.id} ({vs.name}) {(vs.usage_bytes or 0) / 1024 ** 2:.1f} MB")
+    if not to_evict:
+        print("✅ Within budget - nothing to evict")
+        return []
+    if remaining > budget_bytes:
+        print(f"⚠️  Pinned stores alone use {remaining / 1024 ** 2:.1f} MB; evicting every other store")
+    
+    evicted = []
+    for vs in to_evict:
+        idle_hours = (current_time - (vs.last_active_at or vs.created_at)) / 3600
+        label = f"{vs.id} ({vs.name}) {vs.usage_bytes / 1024 ** 2:.1f} MB, idle {idle_hours:.1f}h"
+        if dry_run:
+            print(f"📝 Would delete vector store: {label}")
+            continue
+        try:
+            client.vector_stores.delete(vs.id)
+            print(f"🗑️  Deleted vector store: {label}")
+            evicted.append(vs)
+        except Exception as e:
+            print(f"⚠️  Could not delete vector store {vs.id}: {e}")
+    
+    freed = sum(vs.usage_bytes for vs in (to_evict if dry_run else evicted))
+    print(f"✅ {'Would free' if dry_run else 'Freed'} {freed / 1024 ** 2:.1f} MB "
+          f"(~${storage_cost_per_day(total) - storage_cost_per_day(total - freed):.2f}/day); "
+          f"{(total - freed) / 1024 ** 2:.1f} MB left")
+    return evicted
+
 def cleanup_assistant(client, keep_assistant=True):
     """Optionally clean up the practice lab assistant."""
-    assistant_file = Path(".assistant")
+    store = get_store()
+    assistant_id = store.get("assistant_id")
     
-    if not assistant_file.exists():
-        print("\n📋 No assistant file found - nothing to clean up")
+    if not assistant_id:
+        print("\n📋 No assistant in the state store - nothing to clean up")
         return
     
-    assistant_id = assistant_file.read_text().strip()
-    
     if keep_assistant:
         print(f"\n📋 Keeping assistant: {assistant_id}")
         print("   (Use --delete-assistant flag to remove)")
@@ -132,8 +243,9 @@ def cleanup_assistant(client, keep_assistant=True):
     
     try:
         client.beta.assistants.delete(assistant_id)
-        assistant_file.unlink()  # Remove the .assistant file
-        print("🗑️  Deleted assistant and local reference file")
+        store.delete("assistant_id")
+        Path(".assistant").unlink(missing_ok=True)  # Legacy reference file
+        print("🗑️  Deleted assistant and local reference")
     except Exception as e:
         print(f"⚠️  Could not delete assistant: {e}")
 
@@ -141,6 +253,9 @@ def cleanup_local_files():
     """Clean up local temporary files created during labs."""
     print("\n🧹 Cleaning up local files...")
     
+    if get_store().delete("last_thread_id"):
+        print("🗑️  Removed last thread ID from the state store")
+    
     temp_files = [
         ".last_thread",
         "data/intro_to_llms.md",
@@ -185,13 +300,12 @@ def show_current_usage(client):
         print(f"📄 Assistant files: {len(assistant_files)}")
         
         # Count vector stores
-        vector_stores = client.beta.vector_stores.list()
+        vector_stores = client.vector_stores.list()
         print(f"🗂️  Vector stores: {len(vector_stores.data)}")
         
         # Check for assistant
-        assistant_file = Path(".assistant")
-        if assistant_file.exists():
-            assistant_id = assistant_file.read_text().strip()
+        assistant_id = get_store().get("assistant_id")
+        if assistant_id:
             print(f"🤖 Assistant: {assistant_id}")
         else:
             print("🤖 Assistant: None")
@@ -207,6 +321,7 @@ def main():
     # Parse command line arguments
     delete_assistant = "--delete-assistant" in sys.argv
     max_age = 24  # Default to 24 hours
+    pinned = pinned_vector_stores(sys.argv[i + 1] for i, arg in enumerate(sys.argv[:-1]) if arg == "--pin")
     
     if "--max-age" in sys.argv:
         try:
@@ -221,6 +336,22 @@ def main():
     # Show current usage
     show_current_usage(client)
     
+    if "--gc" in sys.argv:
+        budget_gb = DEFAULT_BUDGET_GB
+        if "--budget-gb" in sys.argv:
+            try:
+                budget_gb = float(sys.argv[sys.argv.index("--budget-gb") + 1])
+            except (IndexError, ValueError):
+                print(f"⚠️  Invalid --budget-gb value, using default {DEFAULT_BUDGET_GB:g} GB")
+        dry_run = "--dry-run" in sys.argv
+        if not dry_run:
+            confirm = input(f"\n🤔 Delete least recently used vector stores down to {budget_gb:g} GB? (y/N): ")
+            if confirm.lower().strip() != 'y':
+                print("❌ Cleanup cancelled")
+                return
+        gc_vector_stores(client, budget_gb, pinned, dry_run)
+        return
+    
     # Confirm cleanup
     print(f"\n🤔 This will delete resources older than {max_age} hours.")
     if delete_assistant:
@@ -234,7 +365,7 @@ def main():
     # Perform cleanup
     cleanup_threads(client, max_age)
     cleanup_files(client, max_age)
-    cleanup_vector_stores(client, max_age)
+    cleanup_vector_stores(client, max_age, pinned)
     cleanup_assistant(client, keep_assistant=not delete_assistant)
     cleanup_local_files()
     
@@ -243,7 +374,8 @@ def main():
     print("   • Run cleanup regularly to manage costs")
     print("   • Use --max-age <hours> to adjust cleanup threshold")
     print("   • Use --delete-assistant to remove the practice assistant")
+    print("   • Use --gc [--budget-gb 1] [--pin name] [--dry-run] to evict idle vector stores by storage")
     print("   • Example: python scripts/99_cleanup.py --max-age 1 --delete-assistant")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_profiled("99_cleanup", main)
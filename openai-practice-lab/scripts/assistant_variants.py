@@ -0,0 +1,65 @@
+"""
+Immutable assistant variants keyed by config hash.
+
+Most per-run differences (tools, response_format, instructions, model) should
+be passed as run overrides. When a flow really needs its own assistant, this
+creates it once, tags it with the hash of its config and reuses it from then
+on instead of mutating the shared assistant. Variants are never updated: a
+different config simply hashes to a different variant.
+
+A recorded variant id is checked once per process; if the assistant was
+deleted (by 99_cleanup.py, say) the variant is created again.
+"""
+
+from openai import NotFoundError
+
+from lab_common.provisioner import config_hash
+from lab_common.state_store import get_store
+
+# Variant ids confirmed to exist (or created) by this process
+_verified = set()
+
+
+def _find_remote_variant(client, digest):
+    """Look for a variant another worker already created with this hash."""
+    for assistant in client.beta.assistants.list(limit=100):
+        if (assistant.metadata or {}).get("config_hash") == digest:
+            return assistant.id
+    return None
+
+
+def get_assistant_variant(client, config, store=None):
+    """Return the id of an assistant matching config exactly, creating it once."""
+    store = store or get_store()
+    # Metadata values are limited to 64 characters
+    digest = config_hash(config)[:32]
+
+    key = f"assistant_variant:{digest}"
+
+    def create_variant():
+        assistant_id = _find_remote_variant(client, digest)
+        if assistant_id:
+            _verified.add(assistant_id)
+            return assistant_id
+        assistant = client.beta.assistants.create(
+            metadata={"config_hash": digest},
+            **config
+        )
+        print(f"🆕 Created assistant variant {assistant.id} ({digest[:8]})")
+        _verified.add(assistant.id)
+        return assistant.id
+
+    # Created under the store lock, so parallel workers share one variant
+    assistant_id = store.get_or_create(key, create_variant)
+    if assistant_id in _verified:
+        return assistant_id
+    try:
+        client.beta.assistants.retrieve(assistant_id)
+    except NotFoundError:
+        print(f"♻️  Assistant variant {assistant_id} no longer exists, recreating it")
+        # Another worker may already have replaced the stale id
+        if store.get(key) == assistant_id:
+            store.delete(key)
+        return store.get_or_create(key, create_variant)
+    _verified.add(assistant_id)
+    return assistant_id
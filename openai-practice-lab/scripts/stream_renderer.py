@@ -0,0 +1,188 @@
+"""
+Low-overhead rendering of Assistants streaming events.
+
+Events are dispatched through a table keyed by event name, so each event
+costs one dict lookup instead of a chain of comparisons and hasattr checks.
+Text deltas are collected in a list and joined once at the end, and output
+is written in batches: pending text is flushed when it reaches flush_bytes
+or flush_interval after it was written (by one flusher thread per renderer
+waiting on a deadline, so the tail of a burst shows up even while the stream
+is quiet), and always when a non-text event arrives or the stream ends.
+
+    renderer = StreamRenderer()
+    renderer.consume(client.beta.threads.runs.create(..., stream=True))
+    renderer.text, renderer.run, renderer.ttft
+
+Async streams (AsyncOpenAI) go through aconsume; PrefixedLineWriter lets
+several concurrent streams share one terminal without mixing their lines.
+"""
+
+import sys
+import time
+import threading
+
+# A flusher thread with nothing to do for this long exits; the next write starts another
+FLUSHER_IDLE_TIMEOUT = 1.0
+
+TERMINAL_RUN_EVENTS = (
+    "thread.run.completed",
+    "thread.run.failed",
+    "thread.run.cancelled",
+    "thread.run.expired",
+    "thread.run.incomplete",
+    "thread.run.requires_action",
+)
+
+
+class StreamRenderer:
+    def __init__(self, out=sys.stdout, flush_interval=0.05, flush_bytes=4096, clock=time.perf_counter):
+        self.out = out
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.clock = clock
+
+        self.run = None
+        self.started_at = clock()
+        self.first_token_at = None
+        self.run_steps = []
+        self.messages = []
+        self._parts = []
+        self._pending = []
+        self._pending_size = 0
+        self._last_flush = self.started_at
+        # The flusher thread writes too; it sleeps on _wake until _deadline
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._deadline = None
+        self._flusher = None
+
+        self._handlers = {
+            "thread.message.delta": self._on_message_delta,
+            "thread.run.step.completed": self.run_steps.append,
+            "thread.message.completed": self.messages.append,
+        }
+        for name in TERMINAL_RUN_EVENTS:
+            self._handlers[name] = self._on_run_finished
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    @property
+    def ttft(self):
+        """Seconds from the renderer's creation to the first text delta."""
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    def handle(self, event):
+        handler = self._handlers.get(event.event)
+        if handler is not None:
+            handler(event.data)
+        elif self._pending:
+            # Lifecycle events arrive between bursts of text; a good moment to show it
+            self.flush()
+
+    def consume(self, stream):
+        """Render every event in a stream; returns the final run (or None)."""
+        handle = self.handle
+        try:
+            for event in stream:
+                handle(event)
+        finally:
+            self.close()
+        return self.run
+
+    async def aconsume(self, stream):
+        """consume() for async streams."""
+        handle = self.handle
+        try:
+            async for event in stream:
+                handle(event)
+        finally:
+            self.close()
+        return self.run
+
+    def write(self, text):
+        with self._lock:
+            self._pending.append(text)
+            self._pending_size += len(text)
+            # flush_interval=None leaves flushing to size and events only
+            wait = None if self.flush_interval is None else self.flush_interval - (self.clock() - self._last_flush)
+            if self._pending_size >= self.flush_bytes or (wait is not None and wait <= 0):
+                self._flush()
+            elif wait is not None and self._deadline is None:
+                self._deadline = time.monotonic() + wait
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run_flusher, name="stream-flusher", daemon=True)
+                    self._flusher.start()
+                else:
+                    self._wake.notify()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and stop the flusher thread; a later write starts a new one."""
+        with self._lock:
+            self._flush()
+            self._flusher = None
+            self._wake.notify()
+
+    def _run_flusher(self):
+        me = threading.current_thread()
+        with self._lock:
+            while self._flusher is me:
+                if self._deadline is None:
+                    if not self._wake.wait(FLUSHER_IDLE_TIMEOUT) and self._deadline is None:
+                        self._flusher = None
+                elif self._deadline > time.monotonic():
+                    self._wake.wait(self._deadline - time.monotonic())
+                else:
+                    self._flush()
+
+    def _flush(self):
+        # Any flush covers the text the pending deadline was for
+        self._deadline = None
+        if self._pending:
+            self.out.write("".join(self._pending))
+            self._pending.clear()
+            self._pending_size = 0
+        self.out.flush()
+        self._last_flush = self.clock()
+
+    def _on_message_delta(self, data):
+        for block in data.delta.content or ():
+            if block.type != "text" or block.text is None or not block.text.value:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = self.clock()
+            self._parts.append(block.text.value)
+            self.write(block.text.value)
+
+    def _on_run_finished(self, run):
+        self.run = run
+        self.flush()
+
+
+class PrefixedLineWriter:
+    """File-like wrapper that writes only whole lines, each tagged with a prefix."""
+
+    def __init__(self, prefix, out=sys.stdout):
+        self.prefix = prefix
+        self.out = out
+        self._partial = ""
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        if lines:
+            self.out.write("".join(f"{self.prefix}{line}\n" for line in lines))
+
+    def flush(self):
+        self.out.flush()
+
+    def close(self):
+        if self._partial:
+            self.out.write(f"{self.prefix}{self._partial}\n")
+            self._partial = ""
+        self.out.flush()
@@ -0,0 +1,98 @@
+"""
+Local function-tool execution for runs that reach requires_action.
+
+Python functions are registered with their JSON schema. When a run asks for
+several tool calls at once they execute concurrently in a thread pool, and
+the outputs go back through the streaming submit-tool-outputs endpoint, so a
+multi-tool turn takes as long as its slowest tool. Runs and their tool
+output submissions hold a slot in the shared run scheduler while they stream,
+and stream_run reports each finished run to the run metrics.
+
+Docs: https://platform.openai.com/docs/assistants/tools/function-calling
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lab_common.run_metrics import METRICS, count_tool_calls
+from lab_common.run_scheduler import SCHEDULER
+
+
+class ToolDispatcher:
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._functions = {}
+        self._schemas = {}
+
+    def register(self, schema, function):
+        """Register a local function under the name in its function schema."""
+        name = schema["name"]
+        self._functions[name] = function
+        self._schemas[name] = schema
+        return function
+
+    @property
+    def tools(self):
+        """Function tool definitions for the registered functions."""
+        return [{"type": "function", "function": schema} for schema in self._schemas.values()]
+
+    def _call(self, tool_call):
+        name = tool_call.function.name
+        try:
+            if name not in self._functions:
+                raise KeyError(f"Unknown tool: {name}")
+            arguments = json.loads(tool_call.function.arguments or "{}")
+            result = self._functions[name](**arguments)
+            output = result if isinstance(result, str) else json.dumps(result)
+        except Exception as e:
+            # Errors go back to the model as tool output instead of failing the run
+            output = json.dumps({"error": f"{type(e).__name__}: {e}"})
+        return {"tool_call_id": tool_call.id, "output": output}
+
+    def execute(self, tool_calls):
+        """Run every requested tool call concurrently and collect the outputs."""
+        tool_calls = list(tool_calls)
+        if len(tool_calls) == 1:
+            return [self._call(tool_calls[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tool_calls))) as executor:
+            return list(executor.map(self._call, tool_calls))
+
+    def resolve(self, client, thread_id, run, priority="interactive"):
+        """Satisfy requires_action runs until the run reaches a terminal state."""
+        while run.status == "requires_action":
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            print(f"🔧 Executing {len(tool_calls)} tool call(s): "
+                  f"{', '.join(tc.function.name for tc in tool_calls)}")
+            tool_outputs = self.execute(tool_calls)
+
+            with SCHEDULER.slot(priority), client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs
+            ) as stream:
+                stream.until_done()
+                run = stream.get_final_run()
+        return run
+
+    def stream_run(self, client, thread_id, assistant_id, priority="interactive", **run_kwargs):
+        """Start a streaming run and service its tool calls; returns the final run."""
+        # One slot for the whole run; the submissions in resolve() reuse it
+        with SCHEDULER.slot(priority):
+            # Scheduler wait is reported separately, not as client overhead
+            start = time.perf_counter()
+            try:
+                with client.beta.threads.runs.stream(
+                    thread_id=thread_id,
+                    assistant_id=assistant_id,
+                    **run_kwargs
+                ) as stream:
+                    stream.until_done()
+                    run = stream.get_final_run()
+                run = self.resolve(client, thread_id, run, priority)
+            except Exception as e:
+                METRICS.observe_exception(assistant_id, e, run_kwargs.get("model"))
+                raise
+            wall = time.perf_counter() - start
+        METRICS.observe_run(run, wall, count_tool_calls(client, thread_id, run.id) if METRICS.enabled else None)
+        return run
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+from openai import NotFoundError
+
+import assistant_variants
+from assistant_variants import get_assistant_variant
+from lab_common.state_store import StateStore
+
+CONFIG = {"name": "Sweep", "model": "gpt-4o-mini", "tools": [{"type": "file_search"}]}
+
+
+class FakeAssistants:
+    def __init__(self, existing=(), prefix="asst"):
+        self.existing = set(existing)
+        self.prefix = prefix
+        self.created = 0
+
+    def retrieve(self, assistant_id):
+        if assistant_id not in self.existing:
+            raise NotFoundError("No assistant found", response=SimpleNamespace(
+                request=None, status_code=404, headers={}), body=None)
+        return SimpleNamespace(id=assistant_id)
+
+    def list(self, limit=100):
+        return []
+
+    def create(self, **kwargs):
+        self.created += 1
+        assistant_id = f"{self.prefix}_{self.created}"
+        self.existing.add(assistant_id)
+        return SimpleNamespace(id=assistant_id)
+
+
+@pytest.fixture(autouse=True)
+def fresh_process(monkeypatch):
+    monkeypatch.setattr(assistant_variants, "_verified", set())
+
+
+def client_with(assistants):
+    return SimpleNamespace(beta=SimpleNamespace(assistants=assistants))
+
+
+def test_recorded_variant_is_reused_and_checked_once(tmp_path):
+    store = StateStore(tmp_path / "state.json")
+    first = get_assistant_variant(client_with(FakeAssistants()), CONFIG, store)
+
+    assistant_variants._verified.clear()
+    assistants = FakeAssistants(existing={first})
+    assert get_assistant_variant(client_with(assistants), CONFIG, store) == first
+    assert get_assistant_variant(client_with(assistants), CONFIG, store) == first
+    assert assistants.created == 0
+
+
+def test_deleted_variant_is_recreated(tmp_path):
+    store = StateStore(tmp_path / "state.json")
+    stale = get_assistant_variant(client_with(FakeAssistants(prefix="asst_old")), CONFIG, store)
+
+    assistant_variants._verified.clear()
+    assistants = FakeAssistants()
+    replacement = get_assistant_variant(client_with(assistants), CONFIG, store)
+    assert replacement != stale and assistants.created == 1
+    assert get_assistant_variant(client_with(assistants), CONFIG, store) == replacement
@@ -0,0 +1,54 @@
+import json
+import importlib
+from types import SimpleNamespace
+
+cleanup = importlib.import_module("99_cleanup")
+
+MB = 1024 ** 2
+
+
+def store(store_id, usage_mb, last_active_at=None, created_at=0, name=None):
+    return SimpleNamespace(id=store_id, name=name, usage_bytes=int(usage_mb * MB),
+                           last_active_at=last_active_at, created_at=created_at)
+
+
+def test_evicts_least_recently_used_until_within_budget():
+    stores = [store("vs_recent", 40, last_active_at=300), store("vs_oldest", 30, last_active_at=100),
+              store("vs_middle", 20, last_active_at=200), store("vs_never_queried", 10, created_at=150)]
+
+    to_evict, total, remaining = cleanup.plan_lru_eviction(stores, budget_bytes=55 * MB)
+
+    # Oldest first, a never-queried store by its creation time; stops once 100 MB fits in 55 MB
+    assert [vs.id for vs in to_evict] == ["vs_oldest", "vs_never_queried", "vs_middle"]
+    assert (total, remaining) == (100 * MB, 40 * MB)
+
+
+def test_skips_pinned_and_empty_stores():
+    stores = [store("vs_pinned_id", 50, last_active_at=1), store("vs_named", 50, last_active_at=2, name="handbook"),
+              store("vs_empty", 0, last_active_at=3), store("vs_idle", 50, last_active_at=4)]
+
+    to_evict, total, remaining = cleanup.plan_lru_eviction(stores, 0, pinned={"vs_pinned_id", "handbook"})
+
+    assert [vs.id for vs in to_evict] == ["vs_idle"]
+    assert (total, remaining) == (150 * MB, 100 * MB)
+
+
+def test_within_budget_evicts_nothing():
+    assert cleanup.plan_lru_eviction([store("vs_1", 10)], 10 * MB) == ([], 10 * MB, 10 * MB)
+
+
+def test_stores_in_either_labs_state_are_pinned(tmp_path, monkeypatch):
+    monkeypatch.setenv("LAB_PINNED_VECTOR_STORES", "prod-handbook")
+    hw_labs, practice = tmp_path / "hw.json", tmp_path / "practice.json"
+    hw_labs.write_text(json.dumps({"default": {"vector_store_id": "vs_knowledge_base"},
+                                   "staging": {"vector_store_id": "vs_staging"}}))
+    practice.write_text(json.dumps({"default": {"vector_store_id": "vs_rag", "assistant_id": "asst_1"}}))
+
+    pinned = cleanup.pinned_vector_stores(["vs_cli"], state_files=[hw_labs, practice, tmp_path / "missing.json"])
+
+    assert pinned == {"vs_cli", "prod-handbook", "vs_knowledge_base", "vs_staging", "vs_rag"}
+
+
+def test_storage_cost_excludes_the_free_gigabyte():
+    assert cleanup.storage_cost_per_day(512 * MB) == 0
+    assert cleanup.storage_cost_per_day(3 * 1024 * MB) == 2 * cleanup.PRICE_PER_GB_DAY
@@ -0,0 +1,170 @@
+import io
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from stream_renderer import StreamRenderer, PrefixedLineWriter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingOut(io.StringIO):
+    """Counts flushes and signals each one, so tests can wait for the flusher thread."""
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+        self.flushed = threading.Event()
+
+    def flush(self):
+        self.flushes += 1
+        self.flushed.set()
+
+
+def event(name, data=None):
+    return SimpleNamespace(event=name, data=data)
+
+
+def delta(*values, kind="text"):
+    blocks = [SimpleNamespace(type=kind, text=SimpleNamespace(value=value) if value is not None else None)
+              for value in values]
+    return event("thread.message.delta", SimpleNamespace(delta=SimpleNamespace(content=blocks)))
+
+
+def run(status):
+    return SimpleNamespace(id="run_1", status=status)
+
+
+def test_events_are_dispatched_by_name():
+    clock, out = FakeClock(), RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=None, clock=clock)
+    step, message = SimpleNamespace(id="step_1"), SimpleNamespace(id="msg_1")
+
+    renderer.handle(event("thread.run.created", run("queued")))
+    clock.now = 0.4
+    renderer.handle(delta("HRV ", None, ""))
+    renderer.handle(delta("image", kind="image_file"))
+    renderer.handle(delta("measures"))
+    renderer.handle(event("thread.run.step.completed", step))
+    renderer.handle(event("thread.message.completed", message))
+    renderer.handle(event("thread.run.completed", run("completed")))
+
+    assert renderer.text == "HRV measures"
+    assert renderer.ttft == 0.4
+    assert renderer.run_steps == [step] and renderer.messages == [message]
+    assert renderer.run.status == "completed"
+    assert out.getvalue() == "HRV measures"
+
+
+@pytest.mark.parametrize("name", ["thread.run.requires_action", "thread.run.failed", "thread.run.incomplete"])
+def test_every_terminal_run_event_records_the_run_and_flushes(name):
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=None, clock=FakeClock())
+    renderer.handle(delta("partial"))
+    assert out.getvalue() == ""
+
+    renderer.handle(event(name, run(name.rsplit(".", 1)[1])))
+    assert renderer.run.status == name.rsplit(".", 1)[1]
+    assert out.getvalue() == "partial"
+
+
+def test_text_is_batched_until_size_or_a_lifecycle_event():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=None, flush_bytes=8, clock=FakeClock())
+
+    renderer.handle(delta("abc"))
+    renderer.handle(delta("def"))
+    assert out.getvalue() == ""
+    renderer.handle(delta("gh"))
+    assert out.getvalue() == "abcdefgh"
+
+    renderer.handle(delta("ij"))
+    renderer.handle(event("thread.run.step.created"))
+    assert out.getvalue() == "abcdefghij"
+
+
+def test_interval_flushes_pending_text_without_another_event():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=0.05)
+    renderer.flush()
+    out.flushed.clear()
+
+    renderer.handle(delta("tail of a burst"))
+    # The stream goes quiet here; the flusher thread still shows what arrived
+    assert out.flushed.wait(2)
+    assert out.getvalue() == "tail of a burst"
+
+
+def test_an_explicit_flush_clears_the_deadline():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=0.05)
+    renderer.flush()
+    renderer.handle(delta("a"))
+    renderer.flush()
+    flushes = out.flushes
+
+    threading.Event().wait(0.15)
+    assert out.flushes == flushes and out.getvalue() == "a"
+
+
+def test_one_flusher_thread_serves_every_window_and_stops_with_the_stream():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=0.01)
+    renderer.flush()
+    flushers = set()
+
+    def stream():
+        for i in range(5):
+            out.flushed.clear()
+            yield delta(f"burst {i} ")
+            assert out.flushed.wait(2)
+            flushers.add(renderer._flusher)
+
+    renderer.consume(stream())
+    assert out.getvalue() == "burst 0 burst 1 burst 2 burst 3 burst 4 "
+    (flusher,) = flushers
+    flusher.join(2)
+    assert not flusher.is_alive() and renderer._flusher is None
+
+
+def test_consume_flushes_at_the_end_even_when_the_stream_fails():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=None, clock=FakeClock())
+
+    def broken_stream():
+        yield delta("half an answer")
+        raise ConnectionError("stream dropped")
+
+    with pytest.raises(ConnectionError):
+        renderer.consume(broken_stream())
+    assert out.getvalue() == "half an answer"
+
+
+def test_aconsume_renders_async_streams():
+    out = RecordingOut()
+    renderer = StreamRenderer(out=out, flush_interval=None, clock=FakeClock())
+
+    async def stream():
+        for item in (delta("HRV"), event("thread.run.completed", run("completed"))):
+            yield item
+
+    assert asyncio.run(renderer.aconsume(stream())).status == "completed"
+    assert out.getvalue() == "HRV"
+
+
+def test_prefixed_line_writer_only_writes_whole_lines():
+    out = io.StringIO()
+    writer = PrefixedLineWriter("[q1] ", out=out)
+    writer.write("first li")
+    assert out.getvalue() == ""
+    writer.write("ne\nsecond")
+    writer.close()
+    assert out.getvalue() == "[q1] first line\n[q1] second\n"
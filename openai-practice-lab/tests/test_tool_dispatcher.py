@@ -0,0 +1,116 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from lab_common.run_metrics import METRICS
+from tool_dispatcher import ToolDispatcher
+
+
+def tool_call(call_id, name, **arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def requires_action(run_id, *tool_calls):
+    return SimpleNamespace(id=run_id, status="requires_action", required_action=SimpleNamespace(
+        submit_tool_outputs=SimpleNamespace(tool_calls=list(tool_calls))))
+
+
+class FakeSubmitStream:
+    def __init__(self, run):
+        self.run = run
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def until_done(self):
+        pass
+
+    def get_final_run(self):
+        return self.run
+
+
+class FakeRuns:
+    def __init__(self, *next_runs):
+        self.next_runs = list(next_runs)
+        self.submitted = []
+
+    def stream(self, thread_id, assistant_id, **kwargs):
+        if isinstance(self.next_runs[0], Exception):
+            raise self.next_runs.pop(0)
+        return FakeSubmitStream(self.next_runs.pop(0))
+
+    def submit_tool_outputs_stream(self, thread_id, run_id, tool_outputs):
+        self.submitted.append((thread_id, run_id, tool_outputs))
+        return FakeSubmitStream(self.next_runs.pop(0))
+
+
+def test_tool_calls_run_concurrently_and_keep_their_order():
+    # Both calls must be inside their function at once to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    dispatcher = ToolDispatcher()
+
+    def lookup(term):
+        barrier.wait()
+        return {"term": term}
+
+    def echo(text):
+        barrier.wait()
+        return text
+
+    dispatcher.register({"name": "lookup"}, lookup)
+    dispatcher.register({"name": "echo"}, echo)
+    outputs = dispatcher.execute([tool_call("call_1", "lookup", term="HRV"), tool_call("call_2", "echo", text="hi")])
+
+    assert outputs == [{"tool_call_id": "call_1", "output": '{"term": "HRV"}'},
+                       {"tool_call_id": "call_2", "output": "hi"}]
+    assert [tool["function"]["name"] for tool in dispatcher.tools] == ["lookup", "echo"]
+
+
+def test_failures_go_back_to_the_model_as_output():
+    dispatcher = ToolDispatcher()
+    dispatcher.register({"name": "divide"}, lambda a, b: a / b)
+    outputs = dispatcher.execute([tool_call("call_1", "divide", a=1, b=0), tool_call("call_2", "missing")])
+
+    errors = [json.loads(output["output"])["error"] for output in outputs]
+    assert errors[0].startswith("ZeroDivisionError")
+    assert errors[1] == "KeyError: 'Unknown tool: missing'"
+
+
+def test_resolve_submits_outputs_until_the_run_finishes():
+    dispatcher = ToolDispatcher()
+    dispatcher.register({"name": "add"}, lambda a, b: a + b)
+    completed = SimpleNamespace(id="run_1", status="completed")
+    runs = FakeRuns(requires_action("run_1", tool_call("call_2", "add", a=2, b=3)), completed)
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+
+    run = dispatcher.resolve(client, "thread_1", requires_action("run_1", tool_call("call_1", "add", a=1, b=1)))
+
+    assert run is completed
+    assert runs.submitted == [
+        ("thread_1", "run_1", [{"tool_call_id": "call_1", "output": "2"}]),
+        ("thread_1", "run_1", [{"tool_call_id": "call_2", "output": "5"}]),
+    ]
+
+
+def test_stream_run_reports_the_finished_run_and_failures_to_metrics():
+    dispatcher = ToolDispatcher()
+    dispatcher.register({"name": "add"}, lambda a, b: a + b)
+    completed = SimpleNamespace(id="run_1", status="completed", assistant_id="asst_dispatch", model="gpt-4o-mini",
+                                created_at=10, started_at=11, completed_at=13, usage=None)
+    runs = FakeRuns(requires_action("run_1", tool_call("call_1", "add", a=1, b=1)), completed,
+                    ConnectionError("connection dropped"))
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    labels = {"assistant": "asst_dispatch", "model": "gpt-4o-mini"}
+
+    assert dispatcher.stream_run(client, "thread_1", "asst_dispatch") is completed
+    assert METRICS.runs.value(status="completed", **labels) == 1
+    assert METRICS.phase_seconds.count(phase="execution", **labels) == 1
+
+    with pytest.raises(ConnectionError):
+        dispatcher.stream_run(client, "thread_1", "asst_dispatch")
+    assert METRICS.errors.value(assistant="asst_dispatch", model="unknown", reason="ConnectionError") == 1